@@ -12,6 +12,20 @@ let pinComponentId = null;
 let activeEditorForAI = null;
 let geminiApiKey = "";
 
+// --- AIME SERVER ---
+// Generations go through the AIME server's /api/generate gateway (see script/global-ui.js, which this
+// standalone page does not load), so the key travels in a header instead of a googleapis.com URL.
+const AIME_SERVER_URL = window.AIME_SERVER_URL || '';
+
+async function sgGenerate(prompt) {
+    const response = await fetch(`${AIME_SERVER_URL}/api/generate`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-AIME-API-Key': geminiApiKey },
+        body: JSON.stringify({ task: 'scenario', inputs: { prompt }, model: 'gemini-2.0-flash' })
+    });
+    return response.json();
+}
+
 // --- DOM ELEMENTS (initialized in initializeDOMElements) ---
 let mainApp, mainContent, projectHeader, mainPanelHeader, loadFileInput, componentImageInput,
     tocPanel, tocList, tocFilterInput, projectTitleDisplay, undoButton, settingsButton,
@@ -1376,18 +1390,7 @@ document.addEventListener('DOMContentLoaded', initializeApp);
         aiGenerateButton.disabled = true;
 
         try {
-            let chatHistory = [];
-            chatHistory.push({ role: "user", parts: [{ text: prompt }] });
-            const payload = { contents: chatHistory };
-            const apiUrl = `https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key=${geminiApiKey}`;
-
-            const response = await fetch(apiUrl, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(payload)
-            });
-
-            const result = await response.json();
+            const result = await sgGenerate(prompt);
 
             if (result.candidates && result.candidates.length > 0 &&
                 result.candidates[0].content && result.candidates[0].content.parts &&
@@ -2011,18 +2014,7 @@ function setupEventListeners() {
         aiGenerateButton.disabled = true;
 
         try {
-            let chatHistory = [];
-            chatHistory.push({ role: "user", parts: [{ text: prompt }] });
-            const payload = { contents: chatHistory };
-            const apiUrl = `https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key=${geminiApiKey}`;
-
-            const response = await fetch(apiUrl, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(payload)
-            });
-
-            const result = await response.json();
+            const result = await sgGenerate(prompt);
 
             if (result.candidates && result.candidates.length > 0 &&
                 result.candidates[0].content && result.candidates[0].content.parts &&
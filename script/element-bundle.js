@@ -488,38 +488,13 @@ async function generateElementContent(button) {
             <p class="loading-text">AIME is forging your Element...</p>
         </div>`;
 
-    const superPrompt = craftSuperPrompt(elementType);
-
     // This is the model the frontend wants to use.
     const model = 'gemini-2.5-flash-lite'; // UPDATED to cost-effective model
-    const apiUrl = `https://generativelanguage.googleapis.com/v1beta/models/${model}:generateContent?key=${userApiKey}`;
-
-    const payload = {
-        contents: [{
-            parts: [{
-                text: superPrompt
-            }]
-        }]
-    };
-
-    const headers = {
-        'Content-Type': 'application/json'
-    };
 
     try {
-        const response = await fetch(apiUrl, {
-            method: 'POST',
-            headers: headers,
-            body: JSON.stringify(payload)
-        });
-
-        const result = await response.json();
-
-        if (!response.ok) {
-            const errorDetails = result.error || { message: `API request failed with status ${response.status}` };
-            console.error("API Error Response:", errorDetails);
-            throw new Error(`API Error: ${errorDetails.message}`);
-        }
+        const elementInputs = await gatherElementInputs(elementType);
+        // Routed through the AIME server's generation gateway (see global-ui.js)
+        const result = await aimeGenerate('element', elementInputs, { model });
 
         const text = result.candidates?.[0]?.content?.parts?.[0]?.text;
 
@@ -548,7 +523,7 @@ async function generateElementContent(button) {
     } catch (error) {
         console.error('Error generating content:', error);
         if (error instanceof TypeError) {
-            responseContainer.innerHTML = `<p class="error-text">Error: A network error occurred. Please check your internet connection and ensure you can access the Google API.</p>`;
+            responseContainer.innerHTML = `<p class="error-text">Error: A network error occurred. Please check your internet connection and ensure the AIME server is running.</p>`;
         } else {
             responseContainer.innerHTML = `<p class="error-text">An error occurred: ${error.message}</p>`;
         }
@@ -558,102 +533,30 @@ async function generateElementContent(button) {
     }
 }
 
-function craftSuperPrompt(elementType, iterationData = null) {
-    const creativeInstructions = {
-        'PERSONA': `Write a compelling character persona. Focus on bringing the character to life through vivid descriptions of their personality, appearance, and backstory. The goal is to create a believable and engaging individual for a story.`,
-        'WORLD': `Describe a unique and imaginative world. Focus on its core concept, history, and the societies that inhabit it. Create a rich tapestry of lore that feels both expansive and detailed.`,
-        'SETTING': `Paint a picture of a specific setting within a larger world. Use sensory details to evoke the atmosphere, architecture, and mood of the location. Make it feel like a real place the reader can step into.`,
-        'SCENE': `Write a complete and engaging scene. Use the provided context, characters, and setting to build a narrative moment with a clear beginning, middle, and end. Focus on action, dialogue, and emotional progression.`,
-        'SPECIES': `Create a unique and believable species. Describe their biology, culture, societal structure, and role within their world. Give them distinct traits that make them memorable and consistent.`,
-        'TECHNOLOGY': `Detail a piece of technology, explaining its function, appearance, and impact on the world. Write it from the perspective of an in-world document, like a technical manual, historical entry, or user review, as guided by the user.`,
-        'PHILOSOPHY': `Flesh out a philosophy or belief system. Explain its core tenets, history, organization, and influence on its followers and the world. Make it feel like a genuine and coherent ideology.`,
-        'UNIVERSE': `Create the foundational lore for an entire universe. Define its core genre, cosmic scope, and the fundamental rules that govern it, such as its magic or technology systems. Establish a consistent tone and history.`,
-        'FACTION': `Describe a faction or organization. Detail its goals, methods, structure, and public perception. Give it a clear identity and purpose within the larger world.`,
-        'DEFAULT': `Generate rich, detailed, and creative content for the specified element, using all provided context to inform the output.`
-    };
-
-    let instruction;
-    let prompt;
+// The super-prompt itself is assembled by the AIME server (server/prompts.py) from these inputs.
+async function gatherElementInputs(elementType, iterationData = null) {
+    const inputs = { elementType, fields: {} };
 
     if (iterationData) {
-        instruction = `Your task is to revise and improve the following content based *only* on the new instructions provided. Do not repeat the old content unless it is being modified. Focus on integrating the changes smoothly.`;
-        prompt = `You are AIME, an AI world-building assistant. You are in an iteration loop.\n\n--- YOUR TASK ---\n${instruction}\n\n`;
-        prompt += `--- PREVIOUS CONTENT ---\n${iterationData.existingContent}\n\n`;
-        prompt += `--- USER'S UPDATE INSTRUCTIONS ---\n${iterationData.updateInstructions}\n\n`;
+        inputs.iteration = iterationData;
     } else {
-        instruction = creativeInstructions[elementType] || creativeInstructions['DEFAULT'];
-        prompt = `You are AIME, an AI world-building assistant. Your task is to act as a creative partner and generate content based on the user's request.\n\n--- YOUR TASK ---\n${instruction}\n\nDo not describe the element itself in a meta way; instead, create the content *for* the element. Use the following information to guide your writing:\n\n`;
-
-        // --- 1. Current Element's Traits ---
-        prompt += "--- PRIMARY ELEMENT: " + elementType + " ---\n";
-        const inputs = document.querySelectorAll('.form-section .input-field');
-        let hasPrimaryTraits = false;
-        inputs.forEach(input => {
+        document.querySelectorAll('.form-section .input-field').forEach(input => {
             if (input.id === 'custom-notes') return;
-            const label = input.previousElementSibling ? input.previousElementSibling.textContent : input.id;
-            if (input.value.trim()) {
-                prompt += `${label}: ${input.value.trim()}\n`;
-                hasPrimaryTraits = true;
-            }
-        });
-        if (!hasPrimaryTraits) {
-            prompt += "No specific traits provided for this element. Please generate creatively.\n";
-        }
-
-        // --- 1.5. Custom Notes ---
-        const customNotes = document.getElementById('custom-notes');
-        if (customNotes && customNotes.value.trim()) {
-            prompt += "\n--- CUSTOM NOTES ---\n";
-            prompt += customNotes.value.trim() + '\n';
-        }
-    }
-
-    // --- 2. Guidance Gems (Applied in both initial and iteration) ---
-    let guidancePrompt = "";
-    Object.values(selectedGems).forEach(gemsArray => {
-        gemsArray.forEach(gem => {
-            guidancePrompt += `- ${gem}\n`;
+            inputs.fields[input.id] = input.value;
         });
-    });
-
-    if (guidancePrompt) {
-        prompt += "\n--- GUIDANCE GEMS (STYLISTIC DIRECTION) ---\n";
-        prompt += guidancePrompt;
     }
 
-    // --- 3. Contextual Assets (Applied in both initial and iteration for context) ---
-    const contextualAssets = loadedAssets.filter(asset => asset.type === 'text' || asset.type === 'json');
-    if (contextualAssets.length > 0) {
-        prompt += "\n--- CONTEXTUAL ASSETS (REFERENCE LORE) ---\n";
-        contextualAssets.forEach(asset => {
-            if (asset.importance === 'Non-Informative') return;
-
-            let assetEntry = '';
-            if (asset.type === 'json') {
-                try {
-                    const parsedContent = JSON.parse(asset.content);
-                    const assetType = parsedContent.assetType || 'JSON Data';
-                    assetEntry += `\n[Reference Asset: ${assetType} | Importance: ${asset.importance}]\n`;
-                    if (asset.annotation) assetEntry += `  - Director's Note: ${asset.annotation}\n`;
-                    assetEntry += JSON.stringify(parsedContent, null, 2) + '\n';
-                } catch (e) {
-                    console.error(`Skipping malformed JSON asset ${asset.fileName} in super prompt:`, e);
-                    return;
-                }
-            } else {
-                assetEntry += `\n[Reference Asset: Text File | Importance: ${asset.importance}]\n`;
-                assetEntry += `- Filename: ${asset.fileName}\n`;
-                if (asset.annotation) assetEntry += `  - Director's Note: ${asset.annotation}\n`;
-                assetEntry += `--- Text Content ---\n${asset.content}\n--- End Content ---\n`;
-            }
-            prompt += assetEntry;
-        });
-    }
+    // Custom notes get their own prompt section
+    const customNotes = document.getElementById('custom-notes');
+    if (customNotes) inputs.notes = customNotes.value;
 
-    prompt += `\n--- FINAL INSTRUCTION ---\nGenerate the content as requested. The output MUST be well-structured Markdown. Use headings (#), subheadings (##), bold text (**text**), italics (*text*), and lists (- item) to organize the information for clarity and readability.`;
+    inputs.gems = Object.values(selectedGems).flat();
+    // Sent by reference; see aimeAssetReferences in global-ui.js
+    inputs.assets = await aimeAssetReferences(loadedAssets.filter(asset => asset.type === 'text' || asset.type === 'json'));
+    // Larger libraries are narrowed to the assets relevant to this prompt (server/retrieval.py)
+    if (inputs.assets.length > 8) inputs.retrieve = true;
 
-    console.log("Super Prompt:", prompt);
-    return prompt;
+    return inputs;
 }
 
 // --- Asset Saving Logic ---
@@ -962,27 +865,11 @@ async function iterateElementContent(button) {
         updateInstructions: updateInstructions.value
     };
 
-    const superPrompt = craftSuperPrompt(elementType, iterationData);
     const model = 'gemini-2.5-flash-lite';
-    const apiUrl = `https://generativelanguage.googleapis.com/v1beta/models/${model}:generateContent?key=${userApiKey}`;
-
-    const payload = {
-        contents: [{ parts: [{ text: superPrompt }] }]
-    };
 
     try {
-        const response = await fetch(apiUrl, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
-        });
-
-        const result = await response.json();
-
-        if (!response.ok) {
-            const errorDetails = result.error || { message: `API request failed with status ${response.status}` };
-            throw new Error(`API Error: ${errorDetails.message}`);
-        }
+        const elementInputs = await gatherElementInputs(elementType, iterationData);
+        const result = await aimeGenerate('element', elementInputs, { model });
 
         const text = result.candidates?.[0]?.content?.parts?.[0]?.text;
         if (text) {
@@ -1155,7 +1042,7 @@ function initializeEditToggles() {
     });
 }
 
-async function generateContent(prompt) {
+async function generateContent(task, inputs) {
     const userApiKey = localStorage.getItem('AIME_API_KEY');
     const model = 'gemini-2.5-flash-lite';
 
@@ -1164,32 +1051,8 @@ async function generateContent(prompt) {
         return "Error: API key not found.";
     }
 
-    const apiUrl = `https://generativelanguage.googleapis.com/v1beta/models/${model}:generateContent?key=${userApiKey}`;
-
-    const payload = {
-        contents: [{
-            parts: [{
-                text: prompt
-            }]
-        }],
-    };
-
     try {
-        const response = await fetch(apiUrl, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(payload)
-        });
-
-        const result = await response.json();
-
-        if (!response.ok) {
-            const errorDetails = result.error || { message: `API request failed with status ${response.status}` };
-            console.error("API Error Response:", errorDetails);
-            throw new Error(`API Error: ${errorDetails.message} (Code: ${errorDetails.code || 'N/A'})`);
-        }
+        const result = await aimeGenerate(task, inputs, { model });
 
         const candidate = result.candidates?.[0];
         if (candidate && candidate.content?.parts?.[0]?.text) {
@@ -1203,7 +1066,7 @@ async function generateContent(prompt) {
     } catch (error) {
         console.error("Error generating content:", error);
         if (error instanceof TypeError) { // Network or CORS errors
-            return "Error: A network error occurred. Please check your internet connection and ensure you can access the Google API.";
+            return "Error: A network error occurred. Please check your internet connection and ensure the AIME server is running.";
         }
         return `Error: ${error.message}`;
     }
@@ -1219,29 +1082,14 @@ async function handleTextTool(action, selection, customPrompt = '') {
     const toolbar = document.getElementById('text-toolbar');
     toolbar.classList.add('hidden'); // Hide toolbar during processing
 
-    let prompt = '';
-    switch (action) {
-        case 'rephrase':
-            prompt = `Rephrase the following text to be clearer and more engaging, while maintaining the original meaning:\n\n"${selectedText}"`;
-            break;
-        case 'shorten':
-            prompt = `Shorten the following text, keeping the core meaning concise:\n\n"${selectedText}"`;
-            break;
-        case 'expand':
-            prompt = `Expand upon the following text, adding more detail and description:\n\n"${selectedText}"`;
-            break;
-        case 'custom':
-            if (customPrompt.trim() === '') {
-                alert("Please enter a custom instruction.");
-                return;
-            }
-            prompt = `Apply the following instruction to the text below:\n\nInstruction: "${customPrompt}"\n\nText: "${selectedText}"`;
-            break;
-        default:
-             return;
+    if (!['rephrase', 'shorten', 'expand', 'custom'].includes(action)) return;
+    if (action === 'custom' && customPrompt.trim() === '') {
+        alert("Please enter a custom instruction.");
+        return;
     }
 
-    const aiResponse = await generateContent(prompt);
+    // The server builds the instruction prompt for each action (see server/tasks.py)
+    const aiResponse = await generateContent('text-tool', { action, text: selectedText, instruction: customPrompt });
 
     if (aiResponse.startsWith("Error:")) {
         alert(aiResponse);
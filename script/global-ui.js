@@ -21,6 +21,166 @@ function showToast(message, type = 'success') {
 }
 
 
+// --- AIME Server ---
+// Every AI request goes through the AIME server so it can cache, pool, rate-limit and measure it. The server
+// also serves the pages, so requests stay same-origin; set window.AIME_SERVER_URL to use another host.
+const AIME_SERVER_URL = window.AIME_SERVER_URL || '';
+
+// Runs a generation task through the server's /api/generate gateway and returns the generateContent JSON.
+// Throws an Error carrying the server's message when the request fails.
+async function aimeGenerate(task, inputs, options = {}, isRetry = false) {
+    const response = await fetch(`${AIME_SERVER_URL}/api/generate`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-AIME-API-Key': localStorage.getItem('AIME_API_KEY') || '',
+        },
+        body: JSON.stringify({ task, inputs, ...options }),
+    });
+
+    const result = await response.json();
+
+    // The server does not have some referenced assets yet: upload them once and send the same request again
+    const missing = (result.missingAssets || []).map(ref => aimeAssetsByRef.get(ref)).filter(Boolean);
+    if (!response.ok && missing.length && !isRetry) {
+        await aimeUploadAssets(missing);
+        return aimeGenerate(task, inputs, options, true);
+    }
+
+    if (!response.ok) {
+        const message = typeof result.error === 'string' ? result.error : result.error?.message;
+        throw new Error(`API Error: ${message || `API request failed with status ${response.status}`}`);
+    }
+
+    // Element prompts are packed into a token budget on the server; tell the user when lore did not fit
+    const context = JSON.parse(response.headers.get('X-AIME-Context') || 'null');
+    if (context && (context.truncated.length || context.dropped.length)) {
+        showToast(`Context budget reached: ${context.truncated.length} asset(s) shortened, ${context.dropped.length} left out.`, 'error');
+    }
+    return result;
+}
+
+
+// --- Context Assets ---
+// Lore assets are stored on the server by the SHA-256 of their text and sent as { ref } instead of their
+// content. The hash is computed locally, so an asset is only uploaded when the server reports it missing.
+const aimeAssetsByRef = new Map();
+
+async function aimeAssetRef(asset) {
+    if (!asset.ref) {
+        if (window.crypto?.subtle) {
+            const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(asset.content));
+            asset.ref = Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+        } else {
+            // No WebCrypto outside secure contexts: let the server hash it
+            await aimeUploadAssets([asset]);
+        }
+        aimeAssetsByRef.set(asset.ref, asset);
+    }
+    return asset.ref;
+}
+
+async function aimeUploadAssets(assets) {
+    const response = await fetch(`${AIME_SERVER_URL}/api/assets`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-AIME-API-Key': localStorage.getItem('AIME_API_KEY') || '',
+        },
+        body: JSON.stringify({ assets: assets.map(({ type, content }) => ({ type, content })) }),
+    });
+    const result = await response.json();
+    if (!response.ok) {
+        throw new Error(`API Error: ${result.error || `Asset upload failed with status ${response.status}`}`);
+    }
+    result.assets.forEach(({ ref }, index) => {
+        assets[index].ref = ref;
+        aimeAssetsByRef.set(ref, assets[index]);
+    });
+}
+
+// The { type, fileName, ref, importance, annotation } entries element prompts reference their assets with
+async function aimeAssetReferences(assets) {
+    return Promise.all(assets.map(async asset => ({
+        type: asset.type,
+        fileName: asset.fileName,
+        ref: await aimeAssetRef(asset),
+        importance: asset.importance,
+        annotation: asset.annotation,
+    })));
+}
+
+// Runs several generation jobs ({ id, task, inputs, ... }) in one /api/batch request. The server runs them
+// concurrently and onResult(record) is called for each job as soon as it finishes; failed jobs arrive as
+// records with an `error`. Resolves with the final summary record.
+async function aimeGenerateBatch(jobs, onResult, options = {}) {
+    const response = await fetch(`${AIME_SERVER_URL}/api/batch`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-AIME-API-Key': localStorage.getItem('AIME_API_KEY') || '',
+        },
+        body: JSON.stringify({ jobs, ...options }),
+    });
+
+    if (!response.ok) {
+        const result = await response.json();
+        throw new Error(`API Error: ${result.error || `API request failed with status ${response.status}`}`);
+    }
+
+    // Newline-delimited JSON: one record per line, the last one being the summary
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let summary = null;
+    while (true) {
+        const { value, done } = await reader.read();
+        buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const record = JSON.parse(line);
+            if (record.done) summary = record;
+            else onResult(record);
+        }
+        if (done) break;
+    }
+    return summary;
+}
+
+// Reads a server-sent event stream from a fetch response, calling onEvent(event, data) for each event as it
+// arrives ("message" when the event has no name). Resolves when the stream ends; an error thrown by
+// onEvent cancels the stream and rejects.
+async function aimeReadEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    try {
+        while (true) {
+            const { value, done } = await reader.read();
+            buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const events = buffered.split(/\r?\n\r?\n/);
+            buffered = done ? '' : events.pop();
+            for (const block of events) {
+                let event = 'message';
+                const data = [];
+                for (const line of block.split(/\r?\n/)) {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+                }
+                if (data.length) onEvent(event, JSON.parse(data.join('\n')));
+            }
+            if (done) break;
+        }
+    } catch (error) {
+        // Stop the download (and with it the generation on the server) when a handler gives up
+        reader.cancel().catch(() => {});
+        throw error;
+    }
+}
+
+
 // This function checks for the API key and updates the settings button's class for styling.
 function checkApiKeyStatus() {
     const settingsBtn = document.getElementById('settings-btn');
@@ -303,9 +463,15 @@ function initializeAimeChatbot() {
         return;
     }
 
+    // The reply being streamed, if any; closing the chat stops it (the server then stops generating too)
+    let activeReply = null;
+
     // --- Modal Visibility ---
     chatBtn.addEventListener('click', () => modal.classList.remove('hidden'));
-    closeBtn.addEventListener('click', () => modal.classList.add('hidden'));
+    closeBtn.addEventListener('click', () => {
+        modal.classList.add('hidden');
+        if (activeReply) activeReply.abort();
+    });
 
     // --- Draggable Modal ---
     let isDragging = false;
@@ -342,15 +508,21 @@ function initializeAimeChatbot() {
 
         const context = gatherPageContext();
         const apiKey = localStorage.getItem('AIME_API_KEY');
+        activeReply = new AbortController();
+        let replyElement = null;
+        let reply = '';
 
         try {
-            const response = await fetch('http://127.0.0.1:5001/api/chat', {
+            const response = await fetch(`${AIME_SERVER_URL}/api/chat`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                     'X-AIME-API-Key': apiKey || '',
                 },
-                body: JSON.stringify({ message, context }),
+                // The server keeps the conversation (summarised as it grows) under this tab's session id,
+                // and streams the reply as it is generated
+                body: JSON.stringify({ message, context, session: sessionStorage.getItem('AIME_CHAT_SESSION') || true, stream: true }),
+                signal: activeReply.signal,
             });
 
             if (!response.ok) {
@@ -358,17 +530,36 @@ function initializeAimeChatbot() {
                 throw new Error(errorData.error || 'Failed to get a response.');
             }
 
-            const data = await response.json();
-            addMessage(data.reply, 'aime');
+            await aimeReadEvents(response, (event, data) => {
+                if (event === 'error') throw new Error(data.error || 'The response was interrupted.');
+                if (event === 'done') {
+                    if (data.session) sessionStorage.setItem('AIME_CHAT_SESSION', data.session);
+                    // The server no longer had this tab's conversation, so the reply started a new one
+                    if (data.sessionReset) showToast('Your earlier chat had expired, so AIME started a new conversation.', 'error');
+                    return;
+                }
+                if (!data.reply) return;
+                // The first words replace the "thinking" indicator; later ones extend the same message
+                if (!replyElement) {
+                    removeLoadingMessage();
+                    replyElement = addMessage('', 'aime');
+                }
+                reply += data.reply;
+                renderMessage(replyElement, reply);
+            });
+            if (!replyElement) addMessage('Sorry, I could not generate a response.', 'aime');
 
         } catch (error) {
-            // Check for a specific API key error message from the server
-            if (error.message && error.message.toLowerCase().includes('api key')) {
+            if (error.name === 'AbortError') {
+                // Closed by the user: keep whatever had arrived
+            } else if (error.message && error.message.toLowerCase().includes('api key')) {
+                // Check for a specific API key error message from the server
                 addMessage('Error: API Key is missing, invalid, or not configured on the server. Please add a valid key in the Settings menu.', 'error');
             } else {
                 addMessage(`Error: ${error.message}`, 'error');
             }
         } finally {
+            activeReply = null;
             setLoadingState(false);
         }
     };
@@ -385,26 +576,36 @@ function initializeAimeChatbot() {
     function addMessage(text, sender) {
         const messageElement = document.createElement('div');
         messageElement.className = `aime-chat-message ${sender}`;
+        messagesContainer.appendChild(messageElement);
+        renderMessage(messageElement, text);
+        return messageElement;
+    }
+
+    // Re-rendered as a streamed reply grows, so formatting applies once its closing marker arrives
+    function renderMessage(messageElement, text) {
         // Basic markdown-to-HTML conversion
         let formattedText = text.replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>'); // Bold
         formattedText = formattedText.replace(/\*([^\*]+)\*/g, '<em>$1</em>');     // Italics
         formattedText = formattedText.replace(/```([\s\S]*?)```/g, '<pre><code>$1</code></pre>'); // Code blocks
         formattedText = formattedText.replace(/`([^`]+)`/g, '<code>$1</code>'); // Inline code
         messageElement.innerHTML = formattedText;
-        messagesContainer.appendChild(messageElement);
         messagesContainer.scrollTop = messagesContainer.scrollHeight; // Auto-scroll
     }
 
+    function removeLoadingMessage() {
+        const loadingMessage = messagesContainer.querySelector('.loading');
+        if (loadingMessage) {
+            loadingMessage.remove();
+        }
+    }
+
     function setLoadingState(isLoading) {
         sendBtn.disabled = isLoading;
         input.disabled = isLoading;
         if (isLoading) {
             addMessage('AIME is thinking...', 'loading');
         } else {
-            const loadingMessage = messagesContainer.querySelector('.loading');
-            if (loadingMessage) {
-                loadingMessage.remove();
-            }
+            removeLoadingMessage();
         }
     }
 
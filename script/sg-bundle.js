@@ -463,37 +463,12 @@ async function generateElementContent(button) {
             <p class="loading-text">AIME is forging your Element...</p>
         </div>`;
 
-    const superPrompt = craftSuperPrompt(elementType);
-
     const model = 'gemini-2.5-flash-lite';
-    const apiUrl = `https://generativelanguage.googleapis.com/v1beta/models/${model}:generateContent?key=${userApiKey}`;
-
-    const payload = {
-        contents: [{
-            parts: [{
-                text: superPrompt
-            }]
-        }]
-    };
-
-    const headers = {
-        'Content-Type': 'application/json'
-    };
 
     try {
-        const response = await fetch(apiUrl, {
-            method: 'POST',
-            headers: headers,
-            body: JSON.stringify(payload)
-        });
-
-        const result = await response.json();
-
-        if (!response.ok) {
-            const errorDetails = result.error || { message: `API request failed with status ${response.status}` };
-            console.error("API Error Response:", errorDetails);
-            throw new Error(`API Error: ${errorDetails.message}`);
-        }
+        const elementInputs = await gatherElementInputs(elementType);
+        // Routed through the AIME server's generation gateway (see global-ui.js)
+        const result = await aimeGenerate('scenario', elementInputs, { model });
 
         const text = result.candidates?.[0]?.content?.parts?.[0]?.text;
 
@@ -521,7 +496,7 @@ async function generateElementContent(button) {
     } catch (error) {
         console.error('Error generating content:', error);
         if (error instanceof TypeError) {
-            responseContainer.innerHTML = `<p class="error-text">Error: A network error occurred. Please check your internet connection and ensure you can access the Google API.</p>`;
+            responseContainer.innerHTML = `<p class="error-text">Error: A network error occurred. Please check your internet connection and ensure the AIME server is running.</p>`;
         } else {
             responseContainer.innerHTML = `<p class="error-text">An error occurred: ${error.message}</p>`;
         }
@@ -531,92 +506,25 @@ async function generateElementContent(button) {
     }
 }
 
-function craftSuperPrompt(elementType, iterationData = null) {
-    const creativeInstructions = {
-        'STORYARC': `Write a compelling story arc. Focus on the narrative progression, key plot points, and the ultimate resolution. The goal is to create a satisfying and engaging storyline.`,
-        'ADVENTURE': `Describe a self-contained adventure. Detail the hook that draws players in, the primary goal, the stakes involved, and potential resolutions. Make it feel like a complete and exciting scenario.`,
-        'NPC': `Create a memorable non-player character. Describe their role in the story, their appearance, motivations, and any secrets they might have. Give them a distinct personality.`,
-        'LOCATION': `Describe a vivid location. Use sensory details to establish the atmosphere, key sights, and potential encounters. Make it feel like a real place with a purpose.`,
-        'GROUP': `Detail a faction or organization. Explain their goals, ideology, key members, and available resources. Give them a clear identity and purpose within the larger world.`,
-        'ENCOUNTER': `Design an engaging encounter. Specify the type (combat, social, puzzle), the setup, potential resolutions, and any special mechanics involved.`,
-        'ITEM': `Create a unique item. Describe its appearance, rarity, properties, and any special mechanics or history associated with it.`,
-        'CLUE': `Detail a clue for an investigation. Explain what information it reveals, where it can be found, and what conclusions it might lead to.`,
-        'MAP': `Describe a map. Explain its purpose, what it depicts, and any points of interest or secrets it might contain.`,
-        'HANDOUT': `Create the content for a player handout. Write the text and describe any imagery that might be included. Ensure it serves a clear purpose in the story.`,
-        'DEFAULT': `Generate rich, detailed, and creative content for the specified element, using all provided context to inform the output.`
-    };
-
-    let instruction;
-    let prompt;
+// The super-prompt itself is assembled by the AIME server (server/prompts.py) from these inputs.
+async function gatherElementInputs(elementType, iterationData = null) {
+    const inputs = { elementType, fields: {} };
 
     if (iterationData) {
-        instruction = `Your task is to revise and improve the following content based *only* on the new instructions provided. Do not repeat the old content unless it is being modified. Focus on integrating the changes smoothly.`;
-        prompt = `You are AIME, an AI world-building assistant for tabletop RPGs. You are in an iteration loop.\n\n--- YOUR TASK ---\n${instruction}\n\n`;
-        prompt += `--- PREVIOUS CONTENT ---\n${iterationData.existingContent}\n\n`;
-        prompt += `--- USER'S UPDATE INSTRUCTIONS ---\n${iterationData.updateInstructions}\n\n`;
+        inputs.iteration = iterationData;
     } else {
-        instruction = creativeInstructions[elementType] || creativeInstructions['DEFAULT'];
-        prompt = `You are AIME, an AI world-building assistant for tabletop RPGs. Your task is to act as a creative partner and generate content based on the user's request.\n\n--- YOUR TASK ---\n${instruction}\n\nDo not describe the element itself in a meta way; instead, create the content *for* the element. Use the following information to guide your writing:\n\n`;
-
-        prompt += "--- PRIMARY ELEMENT: " + elementType + " ---\n";
-        const inputs = document.querySelectorAll('.form-section .input-field');
-        let hasPrimaryTraits = false;
-        inputs.forEach(input => {
-            const label = input.previousElementSibling ? input.previousElementSibling.textContent : input.id;
-            if (input.value.trim()) {
-                prompt += `${label}: ${input.value.trim()}\n`;
-                hasPrimaryTraits = true;
-            }
-        });
-        if (!hasPrimaryTraits) {
-            prompt += "No specific traits provided for this element. Please generate creatively.\n";
-        }
-    }
-
-    let guidancePrompt = "";
-    Object.values(selectedGems).forEach(gemsArray => {
-        gemsArray.forEach(gem => {
-            guidancePrompt += `- ${gem}\n`;
+        document.querySelectorAll('.form-section .input-field').forEach(input => {
+            inputs.fields[input.id] = input.value;
         });
-    });
-
-    if (guidancePrompt) {
-        prompt += "\n--- GUIDANCE GEMS (STYLISTIC DIRECTION) ---\n";
-        prompt += guidancePrompt;
     }
 
-    const contextualAssets = loadedAssets.filter(asset => asset.type === 'text' || asset.type === 'json');
-    if (contextualAssets.length > 0) {
-        prompt += "\n--- CONTEXTUAL ASSETS (REFERENCE LORE) ---\n";
-        contextualAssets.forEach(asset => {
-            if (asset.importance === 'Non-Informative') return;
-
-            let assetEntry = '';
-            if (asset.type === 'json') {
-                try {
-                    const parsedContent = JSON.parse(asset.content);
-                    const assetType = parsedContent.assetType || 'JSON Data';
-                    assetEntry += `\n[Reference Asset: ${assetType} | Importance: ${asset.importance}]\n`;
-                    if (asset.annotation) assetEntry += `  - Director's Note: ${asset.annotation}\n`;
-                    assetEntry += JSON.stringify(parsedContent, null, 2) + '\n';
-                } catch (e) {
-                    console.error(`Skipping malformed JSON asset ${asset.fileName} in super prompt:`, e);
-                    return;
-                }
-            } else {
-                assetEntry += `\n[Reference Asset: Text File | Importance: ${asset.importance}]\n`;
-                assetEntry += `- Filename: ${asset.fileName}\n`;
-                if (asset.annotation) assetEntry += `  - Director's Note: ${asset.annotation}\n`;
-                assetEntry += `--- Text Content ---\n${asset.content}\n--- End Content ---\n`;
-            }
-            prompt += assetEntry;
-        });
-    }
+    inputs.gems = Object.values(selectedGems).flat();
+    // Sent by reference; see aimeAssetReferences in global-ui.js
+    inputs.assets = await aimeAssetReferences(loadedAssets.filter(asset => asset.type === 'text' || asset.type === 'json'));
+    // Larger libraries are narrowed to the assets relevant to this prompt (server/retrieval.py)
+    if (inputs.assets.length > 8) inputs.retrieve = true;
 
-    prompt += `\n--- FINAL INSTRUCTION ---\nGenerate the content as requested. The output MUST be well-structured Markdown. Use headings (#), subheadings (##), bold text (**text**), italics (*text*), and lists (- item) to organize the information for clarity and readability.`;
-
-    console.log("Super Prompt:", prompt);
-    return prompt;
+    return inputs;
 }
 
 // --- Asset Saving Logic ---
@@ -888,27 +796,11 @@ async function iterateElementContent(button) {
         updateInstructions: updateInstructions.value
     };
 
-    const superPrompt = craftSuperPrompt(elementType, iterationData);
     const model = 'gemini-2.5-flash-lite';
-    const apiUrl = `https://generativelanguage.googleapis.com/v1beta/models/${model}:generateContent?key=${userApiKey}`;
-
-    const payload = {
-        contents: [{ parts: [{ text: superPrompt }] }]
-    };
 
     try {
-        const response = await fetch(apiUrl, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
-        });
-
-        const result = await response.json();
-
-        if (!response.ok) {
-            const errorDetails = result.error || { message: `API request failed with status ${response.status}` };
-            throw new Error(`API Error: ${errorDetails.message}`);
-        }
+        const elementInputs = await gatherElementInputs(elementType, iterationData);
+        const result = await aimeGenerate('scenario', elementInputs, { model });
 
         const text = result.candidates?.[0]?.content?.parts?.[0]?.text;
         if (text) {
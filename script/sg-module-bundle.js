@@ -317,22 +317,16 @@ function initializeTabs() {
     });
 }
 
-async function generateContent(prompt) {
+async function generateContent(task, inputs) {
     const userApiKey = localStorage.getItem('AIME_API_KEY');
     if (!userApiKey) {
         alert("API key not found. Please set it in the settings modal.");
         return "Error: API key not found.";
     }
     const model = 'gemini-2.5-flash-lite';
-    const apiUrl = `https://generativelanguage.googleapis.com/v1beta/models/${model}:generateContent?key=${userApiKey}`;
-    const payload = { contents: [{ parts: [{ text: prompt }] }] };
     try {
-        const response = await fetch(apiUrl, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
-        const result = await response.json();
-        if (!response.ok) {
-            const errorDetails = result.error || { message: `API request failed with status ${response.status}` };
-            throw new Error(`API Error: ${errorDetails.message}`);
-        }
+        // Routed through the AIME server's generation gateway (see global-ui.js)
+        const result = await aimeGenerate(task, inputs, { model });
         const candidate = result.candidates?.[0];
         if (candidate && candidate.content?.parts?.[0]?.text) {
             return candidate.content.parts[0].text;
@@ -430,7 +424,7 @@ async function handleGeneration(activeTab) {
             break;
     }
 
-    const aiResponse = await generateContent(superPrompt);
+    const aiResponse = await generateContent('module', { prompt: superPrompt });
 
     if (aiResponse.startsWith("Error:")) {
         responseContainer.innerHTML = `<p class="error-text">${aiResponse}</p>`;
@@ -501,7 +495,7 @@ function initializeIteration() {
         }
 
         const superPrompt = craftSuperPrompt(activeTab, { existingContent, updateInstructions });
-        const aiResponse = await generateContent(superPrompt);
+        const aiResponse = await generateContent('module', { prompt: superPrompt });
 
         if (!aiResponse.startsWith("Error:")) {
             if (activeTab === 'treatment') {
@@ -243,22 +243,16 @@ function initializeTabs() {
     });
 }
 
-async function generateContent(prompt) {
+async function generateContent(task, inputs) {
     const userApiKey = localStorage.getItem('AIME_API_KEY');
     if (!userApiKey) {
         alert("API key not found. Please set it in the settings modal.");
         return "Error: API key not found.";
     }
     const model = 'gemini-2.5-flash-lite';
-    const apiUrl = `https://generativelanguage.googleapis.com/v1beta/models/${model}:generateContent?key=${userApiKey}`;
-    const payload = { contents: [{ parts: [{ text: prompt }] }] };
     try {
-        const response = await fetch(apiUrl, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
-        const result = await response.json();
-        if (!response.ok) {
-            const errorDetails = result.error || { message: `API request failed with status ${response.status}` };
-            throw new Error(`API Error: ${errorDetails.message}`);
-        }
+        // Routed through the AIME server's generation gateway (see global-ui.js)
+        const result = await aimeGenerate(task, inputs, { model });
         const candidate = result.candidates?.[0];
         if (candidate && candidate.content?.parts?.[0]?.text) {
             return candidate.content.parts[0].text;
@@ -336,7 +330,7 @@ async function handleGeneration(activeTab) {
             break;
     }
 
-    const aiResponse = await generateContent(superPrompt);
+    const aiResponse = await generateContent('writer', { prompt: superPrompt });
 
     if (aiResponse.startsWith("Error:")) {
         responseContainer.innerHTML = `<p class="error-text">${aiResponse}</p>`;
@@ -407,7 +401,7 @@ function initializeIteration() {
         }
 
         const superPrompt = craftSuperPrompt(activeTab, { existingContent, updateInstructions });
-        const aiResponse = await generateContent(superPrompt);
+        const aiResponse = await generateContent('writer', { prompt: superPrompt });
 
         if (!aiResponse.startsWith("Error:")) {
             if (activeTab === 'treatment') {
@@ -426,8 +420,7 @@ async function generateOutline(concept) {
     const outlineList = document.getElementById('outline-list');
     if (!outlineList) return;
     outlineList.innerHTML = '<div class="loading-indicator"><div class="loading-spinner"></div></div>';
-    const prompt = `You are AIME, a master storyteller. Based on the following concept, generate a detailed 5-step plot outline. For each step, provide a "Title:" and a "Description:".\n\n--- CONCEPT ---\n${concept}`;
-    const aiResponse = await generateContent(prompt);
+    const aiResponse = await generateContent('outline', { concept });
     if (aiResponse.startsWith("Error:")) {
         outlineList.innerHTML = `<p class="error-text">${aiResponse}</p>`;
     } else {
@@ -452,8 +445,7 @@ async function generateTreatment() {
     if (!treatmentCanvas) return;
     treatmentCanvas.innerHTML = '<div class="loading-indicator"><div class="loading-spinner"></div></div>';
     const outlineItems = Array.from(document.querySelectorAll('#outline-list .outline-item')).map(item => item.innerText).join('\n\n');
-    const prompt = `You are AIME, a master storyteller. Based on the following outline, write a detailed story treatment. Expand on the plot points, describe character emotions, and flesh out the scenes.\n\n--- OUTLINE ---\n${outlineItems}`;
-    const aiResponse = await generateContent(prompt);
+    const aiResponse = await generateContent('treatment', { outline: outlineItems });
     if (aiResponse.startsWith("Error:")) {
         treatmentCanvas.innerHTML = `<p class="error-text">${aiResponse}</p>`;
     } else {
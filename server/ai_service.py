@@ -0,0 +1,137 @@
+import json
+import os
+
+# Request building and response shaping shared by the Flask app (app.py) and the asyncio app (asgi.py),
+# so both serving modes keep the same JSON contracts.
+
+# The target URL for the AI service, allowing for dynamic model selection
+AI_API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models/"
+DEFAULT_PROXY_MODEL = 'gemini-1.5-flash-latest'
+CHAT_MODEL = "gemini-1.5-flash-latest"
+IMAGE_SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+CHAT_FALLBACK_REPLY = 'Sorry, I could not generate a response.'
+# Keep proxies (nginx and friends) from buffering server-sent events
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def resolve_api_key(headers):
+    # Use the user's key if provided, otherwise use the default key from the environment
+    return headers.get('X-AIME-API-Key') or os.getenv('API_KEY')
+
+
+def proxy_target(model):
+    # Imagen models use the predict endpoint, everything else generates content
+    endpoint = 'predict' if 'imagen' in model else 'generateContent'
+    return f"{AI_API_BASE_URL}{model}:{endpoint}"
+
+
+def stream_target(model):
+    return f"{AI_API_BASE_URL}{model}:streamGenerateContent"
+
+
+def cached_contents_target(name='cachedContents'):
+    # cachedContents live next to models/ on the same API version
+    return f"{AI_API_BASE_URL.rsplit('models/', 1)[0]}{name}"
+
+
+def build_chat_prompt(message, context):
+    return f"""
+You are AIME, an AI co-author. Your goal is to assist a user in their creative writing project.
+You must be helpful, encouraging, and provide insightful suggestions.
+The user is currently working on the following part of their project:
+---
+{context}
+---
+The user's message is: "{message}"
+Please provide a helpful and context-aware response.
+"""
+
+
+def build_session_payload(summary, turns, message, context):
+    """
+    The chat payload for a message in a session: AIME's role, the current page and the summary of earlier
+    conversation as the system instruction, then the turns kept verbatim and the new message.
+    """
+    system = ("You are AIME, an AI co-author. Your goal is to assist a user in their creative writing project.\n"
+              "You must be helpful, encouraging, and provide insightful suggestions.\n"
+              f"The user is currently working on the following part of their project:\n---\n{context or ''}\n---\n")
+    if summary:
+        system += f"Summary of the conversation so far:\n---\n{summary}\n---\n"
+    contents = [{"role": role, "parts": [{"text": text}]} for role, text in turns]
+    contents.append({"role": "user", "parts": [{"text": message}]})
+    return {"systemInstruction": {"parts": [{"text": system}]}, "contents": contents}
+
+
+def build_summary_prompt(summary, turns):
+    transcript = '\n'.join(f"{'User' if role == 'user' else 'AIME'}: {text}" for role, text in turns)
+    return f"""
+You maintain the running summary of a conversation between a writer and AIME, their AI co-author.
+Rewrite the summary so it also covers the new exchanges. Keep names, decisions, open questions and the
+writer's stated preferences; drop pleasantries. Answer with the summary only, in at most 200 words.
+--- CURRENT SUMMARY ---
+{summary or '(none yet)'}
+--- NEW EXCHANGES ---
+{transcript}
+"""
+
+
+def build_chat_payload(prompt):
+    return {
+        "contents": [{
+            "parts": [{"text": prompt}]
+        }]
+    }
+
+
+def extract_chat_reply(ai_response):
+    # The structure is response['candidates'][0]['content']['parts'][0]['text']
+    return ai_response.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', CHAT_FALLBACK_REPLY)
+
+
+def extract_chat_delta(chunk):
+    # A streamed chunk carries only the newly generated text, possibly split across parts
+    parts = chunk.get('candidates', [{}])[0].get('content', {}).get('parts', [])
+    return ''.join(part.get('text', '') for part in parts)
+
+
+def parse_sse_data(line):
+    # Returns the JSON payload of an SSE "data:" line, or None for blank lines, comments and other fields
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    if not line.startswith('data:'):
+        return None
+    return json.loads(line[5:].strip())
+
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def craft_image_superprompt(prompt, gems, assets):
+    superprompt = prompt
+    if gems:
+        superprompt += ", " + ", ".join(gems)
+    asset_info = [asset.get('fileName', 'unnamed asset') for asset in assets]
+    if asset_info:
+        superprompt += ", featuring elements from: " + ", ".join(asset_info)
+    return ", ".join(filter(None, [s.strip() for s in superprompt.split(',')]))
+
+
+def image_api_url(project_id):
+    return f"https://us-central1-aiplatform.googleapis.com/v1/projects/{project_id}/locations/us-central1/publishers/google/models/imagen@006:predict"
+
+
+def build_image_payload(superprompt):
+    return {
+        "instances": [{"prompt": superprompt}],
+        "parameters": {"sampleCount": 1}
+    }
+
+
+def upstream_error_message(response, default):
+    # Try to get more specific error info from the response if available
+    try:
+        return response.json().get("error", {}).get("message", default)
+    except (ValueError, AttributeError):
+        return default # No JSON in response, stick with the original error.
@@ -0,0 +1,437 @@
+import base64
+import binascii
+import json
+import os
+import time
+from collections import namedtuple
+
+from ai_service import (
+    CHAT_FALLBACK_REPLY, CHAT_MODEL, DEFAULT_PROXY_MODEL,
+    build_chat_payload, build_chat_prompt, build_image_payload, build_session_payload, build_summary_prompt,
+    craft_image_superprompt, extract_chat_delta, extract_chat_reply, image_api_url, parse_sse_data,
+    resolve_api_key, sse_event, upstream_error_message,
+)
+from assets import AssetError, get_asset_store
+from batch import BatchError, ndjson_line, parse_batch
+from blobstore import get_blob_store
+from cache import cache_key, get_response_cache, is_deterministic
+from chat_sessions import SessionError, UnknownSession, get_session_store
+from compression import choose_encoding, compress_bytes, parse_accept_encoding
+from context import context_summary
+from context_cache import get_context_cache
+from credentials import get_credential_manager
+from ratelimit import get_rate_limiter
+from request_log import logger, phase
+from resilience import get_resilience
+from retrieval import get_lore_index
+from static_assets import get_static_site
+from tasks import TaskError, build_task_request
+from vectors import get_vector_index
+
+# The API routes apart from their transport: request parsing, task building and response shaping shared by
+# the Flask app (app.py) and the asyncio app (asgi.py). The apps only make the upstream calls, blocking or
+# awaited, and turn what these functions return (or the ApiError they raise) into Flask or Quart responses.
+
+# Headers the browser may read on cross-origin /api/ responses
+EXPOSE_HEADERS = ['X-AIME-Cache', 'X-AIME-Context', 'Retry-After', 'X-Request-ID', 'Server-Timing']
+JSON_HEADERS = {'Content-Type': 'application/json'}
+MISSING_API_KEY = "API key is not configured on the server and was not provided by the user."
+
+
+class ApiError(Exception):
+    """
+    An error answer of an API route: the JSON {"error": message, **details} with `status` and `headers`.
+    Both apps register a handler that sends it.
+    """
+
+    def __init__(self, message, status=400, details=None, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.details = details or {}
+        self.headers = headers or {}
+
+    def to_json(self):
+        return {"error": str(self), **self.details}
+
+
+def require_api_key(headers, message=MISSING_API_KEY):
+    api_key = resolve_api_key(headers)
+    if not api_key:
+        raise ApiError(message, 500)
+    return api_key
+
+
+def rate_limit_error(e):
+    """The 429 for a request the rate limiter turned away (ratelimit.RateLimited)."""
+    return ApiError(e.reason, 429, headers={'Retry-After': str(e.retry_after)})
+
+
+def upstream_error(e, status=None):
+    """
+    The ApiError for a failed upstream call (a requests or httpx exception): the upstream's status and error
+    message when it answered, otherwise `status` (default 500) and the transport error. Errors that carry a
+    status of their own (upstream.PoolExhausted: 503) keep it, with a Retry-After.
+    """
+    response = getattr(e, 'response', None)
+    message = upstream_error_message(response, f"Failed to connect to AI service: {e}")
+    if response is None and getattr(e, 'status_code', None):
+        return ApiError(message, e.status_code, headers={'Retry-After': '1'})
+    return ApiError(message, getattr(response, 'status_code', None) or status or 500)
+
+
+def upstream_params(api_key):
+    return {'key': api_key}
+
+
+def is_cacheable(body, opt_in=False):
+    # Deterministic requests (temperature 0) are cached; {"cache": true} opts any other request in
+    return get_response_cache().enabled and (bool(opt_in) or is_deterministic(body))
+
+
+def generation_key(model, body, api_key):
+    # Keyed under 'proxy' so /api/proxy, /api/generate and /api/batch share entries for identical bodies
+    return cache_key('proxy', model, body, api_key)
+
+
+def stream_error_event(e):
+    # A failure once a stream has started can only be reported in-band
+    return sse_event({"error": f"Failed to connect to AI service: {e}"}, event='error')
+
+
+def check_streamable(model, stream):
+    if stream and 'imagen' in model:
+        raise ApiError("Streaming is only available for generateContent models.")
+
+
+def _object(data):
+    # Route bodies are JSON objects; anything else (absent, a list, a number) reads as an empty one
+    return data if isinstance(data, dict) else {}
+
+
+# --- /api/proxy ---
+
+ProxyRequest = namedtuple('ProxyRequest', ['api_key', 'model', 'body', 'stream', 'cache'])
+
+
+def parse_proxy(headers, data):
+    """A /api/proxy call: a generateContent body plus "model" and the "stream" and "cache" options."""
+    api_key = require_api_key(headers)
+    body = dict(_object(data))
+    model = body.pop('model', DEFAULT_PROXY_MODEL)
+    # Opt-in streaming: {"stream": true} relays streamGenerateContent chunks as server-sent events
+    stream = body.pop('stream', False)
+    cache_opt_in = body.pop('cache', False)
+    return ProxyRequest(api_key, model, body, stream, cache_opt_in)
+
+
+# --- /api/generate and /api/batch ---
+
+GenerateRequest = namedtuple('GenerateRequest', ['api_key', 'task', 'stream', 'cache'])
+
+
+def build_task(job):
+    """The TaskRequest (see tasks.py) of a gateway request or batch job: task, inputs, model, generationConfig."""
+    job = _object(job)
+    try:
+        with phase('prompt'):
+            return build_task_request(job.get('task'), job.get('inputs') or {}, job.get('model'), job.get('generationConfig'))
+    except TaskError as e:
+        raise ApiError(str(e), 400, e.details)
+
+
+def parse_generate(headers, data):
+    """A /api/generate call, its prompt built (element prompts read referenced assets from disk)."""
+    api_key = require_api_key(headers)
+    data = _object(data)
+    return GenerateRequest(api_key, build_task(data), data.get('stream', False), data.get('cache', False))
+
+
+def context_header(task):
+    # Which element assets were cut down or left out to fit the context budget (indices into inputs.assets)
+    if not task.context:
+        return None
+    return json.dumps(context_summary(task.context), separators=(',', ':'))
+
+
+def parse_batch_request(headers, data):
+    """(API key, jobs, parallelism) of a /api/batch call."""
+    api_key = require_api_key(headers)
+    try:
+        jobs, parallelism = parse_batch(data)
+    except BatchError as e:
+        raise ApiError(str(e))
+    return api_key, jobs, parallelism
+
+
+def job_outcome(task, entry, cache_state):
+    """The outcome of a batch job whose generation succeeded."""
+    try:
+        outcome = {"status": entry.status, "cache": cache_state, "result": json.loads(entry.body)}
+    except ValueError:
+        return {"status": 502, "error": "Failed to parse AI response."}
+    if task.context:
+        outcome["context"] = context_summary(task.context)
+    return outcome
+
+
+def failed_outcome(error):
+    """The outcome of a batch job that failed with an ApiError, reported in-band like its HTTP answer."""
+    outcome = {"status": error.status, **error.to_json()}
+    if 'Retry-After' in error.headers:
+        outcome["retryAfter"] = int(error.headers['Retry-After'])
+    return outcome
+
+
+def batch_summary(started, succeeded, total):
+    # The last NDJSON record of a batch; `started` is a time.monotonic() reading
+    return ndjson_line({"done": True, "succeeded": succeeded, "failed": total - succeeded,
+                        "elapsed": round(time.monotonic() - started, 3)})
+
+
+# --- /api/chat ---
+
+ChatRequest = namedtuple('ChatRequest', ['api_key', 'message', 'context', 'session', 'stream', 'cache'])
+
+
+def parse_chat(headers, data):
+    """
+    A /api/chat message. With {"session": true | id} the conversation is kept on the server (see
+    chat_sessions.py); without it every message stands alone.
+    """
+    data = _object(data)
+    message = data.get('message')
+    if not message:
+        raise ApiError("Message is required.")
+    api_key = require_api_key(headers, "API key not configured.")
+    return ChatRequest(api_key, message, data.get('context'), data.get('session'),
+                       bool(data.get('stream')), bool(data.get('cache')))
+
+
+def open_chat_session(chat):
+    """
+    The chat's server-side session, or None for a message that stands alone. A session the server no longer
+    has (expired, evicted, or after a restart) is replaced by a new one, reported by session_fields.
+    """
+    if not chat.session:
+        return None
+    store = get_session_store()
+    try:
+        return store.open(chat.session, chat.api_key)
+    except UnknownSession:
+        return store.open(True, chat.api_key)
+    except SessionError as e:
+        raise ApiError(str(e))
+
+
+def session_fields(chat, session):
+    # The id the widget sends next time, and "sessionReset" when the conversation it named was not found
+    fields = {"session": session.id}
+    if isinstance(chat.session, str) and chat.session != session.id:
+        fields["sessionReset"] = True
+    return fields
+
+
+def chat_payload(chat, session):
+    with phase('prompt'):
+        if session is None:
+            return build_chat_payload(build_chat_prompt(chat.message, chat.context))
+        return build_session_payload(*session.snapshot(), chat.message, chat.context)
+
+
+def chat_key(payload, api_key):
+    return cache_key('chat', CHAT_MODEL, payload, api_key)
+
+
+def chat_result(chat, session, body):
+    """The /api/chat JSON for a buffered upstream answer, which is recorded in the session."""
+    with phase('serialize'):
+        try:
+            reply = extract_chat_reply(json.loads(body))
+        except (KeyError, IndexError, ValueError):
+            raise ApiError("Failed to parse AI response.", 500)
+        result = {"reply": reply}
+        if session is not None:
+            session.record(chat.message, reply)
+            result.update(session_fields(chat, session))
+    return result
+
+
+class ChatReplyEvents:
+    """
+    Turns the upstream SSE lines of a streamed chat into the events for the widget: {"reply": <new text>}
+    per chunk, mirroring the non-streaming contract, and a final "done" event. The whole reply is recorded
+    in the session once the stream has ended.
+    """
+
+    def __init__(self, chat=None, session=None):
+        self.chat = chat
+        self.session = session
+        self.reply = []
+
+    def event(self, line):
+        """The event for one upstream line, or None when it carries no new text."""
+        chunk = parse_sse_data(line)
+        text = extract_chat_delta(chunk) if chunk else ''
+        if not text:
+            return None
+        self.reply.append(text)
+        return sse_event({"reply": text})
+
+    def done(self):
+        if self.session is None:
+            return sse_event({}, event='done')
+        self.session.record(self.chat.message, ''.join(self.reply))
+        return sse_event(session_fields(self.chat, self.session), event='done')
+
+
+def compaction_payload(session):
+    """
+    (folded turns, summary request payload) when the session's history is over the threshold, else None.
+    The transport makes the call and hands its answer to finish_compaction.
+    """
+    folded = session.due_for_compaction()
+    if not folded:
+        return None
+    return folded, build_chat_payload(build_summary_prompt(session.snapshot()[0], folded))
+
+
+def finish_compaction(session, folded, body):
+    """Rolls the folded turns into the session summary, given the summary call's body (None: it failed)."""
+    summary = None
+    if body is not None:
+        try:
+            summary = extract_chat_reply(json.loads(body))
+        except (KeyError, IndexError, ValueError):
+            pass
+    succeeded = summary is not None and summary != CHAT_FALLBACK_REPLY
+    if not succeeded:
+        # The turns are rolled out all the same, so prompts stay bounded; the summary just misses them
+        summary = session.snapshot()[0]
+    session.compact(folded, summary)
+    get_session_store().compacted(succeeded)
+
+
+# --- /api/image ---
+
+def parse_image(data):
+    """The Imagen superprompt of a /api/image call: the prompt, enriched with the gems and asset names."""
+    data = _object(data)
+    if not isinstance(data.get('prompt'), str):
+        raise ApiError("Prompt is required.")
+    with phase('prompt'):
+        superprompt = craft_image_superprompt(data['prompt'], data.get('gems') or [], data.get('assets') or [])
+    logger.debug("Crafted image superprompt", extra={"fields": {"superprompt": superprompt}})
+    return superprompt
+
+
+def image_auth_error():
+    return ApiError("Google Cloud authentication failed. Please configure Application Default Credentials.", 500)
+
+
+def image_call(access_token, project_id_from_auth, superprompt):
+    """(url, headers, payload) of the Imagen predict call."""
+    project_id = os.getenv('GOOGLE_PROJECT_ID') or project_id_from_auth
+    if not project_id:
+        raise ApiError("GOOGLE_PROJECT_ID is not configured on the server or found in credentials.", 500)
+    headers = {'Authorization': f'Bearer {access_token}', **JSON_HEADERS}
+    return image_api_url(project_id), headers, build_image_payload(superprompt)
+
+
+def image_result(result, superprompt):
+    """
+    Stores the image of an Imagen answer in the blob store and returns the /api/image JSON, a short
+    cacheable URL instead of an inline data URL. Decodes and writes megabytes: asgi.py runs it off the loop.
+    """
+    # Vertex AI sometimes reports an error with a success status code
+    if 'error' in result:
+        raise ApiError(result['error'].get('message', 'Unknown API error'), 500)
+    try:
+        prediction = result.get('predictions', [{}])[0]
+        base64_image = prediction.get('bytesBase64Encoded')
+        if not base64_image:
+            raise KeyError("Could not find 'bytesBase64Encoded' in API response.")
+        data = base64.b64decode(base64_image)
+    except (KeyError, IndexError, binascii.Error) as e:
+        raise ApiError(f"Failed to parse AI response: {e}", 500)
+    store = get_blob_store()
+    with phase('store'):
+        name = store.put(data, prediction.get('mimeType', 'image/png'))
+    return {"imageUrl": store.url(name), "revisedPrompt": superprompt}
+
+
+# --- /api/assets ---
+
+def parse_assets(data):
+    assets = _object(data).get('assets')
+    if not isinstance(assets, list) or not all(isinstance(asset, dict) for asset in assets):
+        raise ApiError("An \"assets\" list of {type, content} objects is required.")
+    return assets
+
+
+def store_assets(assets):
+    """The /api/assets JSON: the references of the stored assets (see assets.py)."""
+    try:
+        return {"assets": [get_asset_store().put(asset) for asset in assets]}
+    except AssetError as e:
+        raise ApiError(str(e))
+
+
+# --- Response shaping ---
+
+def buffered_body(entry, cache_state, accept_encoding):
+    """(body, headers) to send a stored upstream answer with, compressed for the client when worthwhile."""
+    body = entry.body
+    headers = {'Vary': 'Accept-Encoding', 'X-AIME-Cache': cache_state}
+    encoding = choose_encoding(accept_encoding, len(body))
+    if encoding:
+        with phase('serialize'):
+            body = compress_bytes(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return body, headers
+
+
+def passthrough_plan(accept_encoding, upstream_headers):
+    """
+    How to relay an upstream body without decoding it into Python objects: (raw, encoding, headers). With
+    `raw` the upstream already compressed the body in a coding the browser accepts and its bytes are
+    forwarded; otherwise the decoded bytes are sent, compressed on the fly in `encoding` when it is set.
+    """
+    upstream_encoding = upstream_headers.get('Content-Encoding', 'identity').lower()
+    length = upstream_headers.get('Content-Length')
+    headers = {'Vary': 'Accept-Encoding'}
+    if upstream_encoding != 'identity' and upstream_encoding in parse_accept_encoding(accept_encoding):
+        headers['Content-Encoding'] = upstream_encoding
+        if length:
+            headers['Content-Length'] = length
+        return True, None, headers
+    size = int(length) if upstream_encoding == 'identity' and length else None
+    encoding = choose_encoding(accept_encoding, size)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    elif size is not None:
+        headers['Content-Length'] = str(size)
+    return False, encoding, headers
+
+
+def server_stats(upstream, singleflight):
+    """
+    The /api/stats numbers, given the app's upstream client and request coalescing group: connection pool
+    usage (for sizing AIME_UPSTREAM_POOL_SIZE against AIME_THREADS), cache hit rates, upstream calls
+    saved by request coalescing, and the state of every other component.
+    """
+    vector_index = get_vector_index()
+    return {
+        "upstream": upstream.stats(),
+        "cache": get_response_cache().stats(),
+        "singleflight": singleflight.stats(),
+        "ratelimit": get_rate_limiter().stats(),
+        "resilience": get_resilience().stats(),
+        "credentials": get_credential_manager().stats(),
+        "blobs": get_blob_store().stats(),
+        "assets": get_asset_store().stats(),
+        "retrieval": get_lore_index().stats(),
+        "chat_sessions": get_session_store().stats(),
+        "vectors": vector_index.stats() if vector_index else None,
+        "context_cache": get_context_cache().stats(),
+        "static": get_static_site().stats(),
+    }
@@ -1,228 +1,486 @@
-import os
+import logging
+import time
+from functools import partial, wraps
+
 import requests
-from flask import Flask, request, jsonify
+from flask import Flask, Response, abort, g, request, jsonify, make_response, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 import google.auth
-import google.auth.transport.requests
+
+from ai_service import CHAT_MODEL, SSE_HEADERS, proxy_target, resolve_api_key, stream_target
+from api import (
+    EXPOSE_HEADERS, JSON_HEADERS, ApiError, ChatReplyEvents,
+    build_task, buffered_body, chat_key, chat_payload, chat_result, check_streamable, compaction_payload,
+    context_header, failed_outcome, finish_compaction, generation_key, image_auth_error, image_call, image_result,
+    is_cacheable, job_outcome, open_chat_session, parse_assets, parse_batch_request, batch_summary, parse_chat,
+    parse_generate, parse_image, parse_proxy, passthrough_plan, rate_limit_error, server_stats, store_assets,
+    stream_error_event, upstream_error, upstream_params,
+)
+from batch import NDJSON_HEADERS, job_result, ndjson_line, run_batch
+from blobstore import BLOB_MAX_AGE, get_blob_store
+from cache import CachedResponse, get_response_cache
+from compression import compress_stream
+from context_cache import get_context_cache, lost_cached_content
+from credentials import get_credential_manager
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, get_metrics, metered_stream, register_stats
+from ratelimit import RateLimited, estimate_tokens, get_rate_limiter
+from request_log import REQUEST_ID_HEADER, configure_logging, log_level, log_request, phase, start_request, telemetry_headers
+from singleflight import flight_key, get_flight_group
+from static_assets import get_static_site
+from upstream import get_client, resilient_post
 
 load_dotenv()
 
-# Serve static files from the project root directory (one level up from /server)
-app = Flask(__name__, static_folder='..', static_url_path='')
+# The front end is served by static_assets.py (fingerprinted, precompressed), not Flask's static folder
+app = Flask(__name__, static_folder=None)
 # Apply CORS to all routes, allowing all origins for the /api/ path
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=EXPOSE_HEADERS)
+
+# Request parsing, task building and response shaping live in api.py, shared with the asyncio app (asgi.py);
+# this module makes the blocking upstream calls and the Flask responses.
+
+@app.errorhandler(ApiError)
+def api_error(e):
+    response = jsonify(e.to_json())
+    response.status_code = e.status
+    response.headers.update(e.headers)
+    return response
+
+@app.before_request
+def start_request_telemetry():
+    g.request_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.request_timings = start_request(request.headers.get(REQUEST_ID_HEADER))
+    g.metrics_started = get_metrics().request_started(g.request_route)
+    if request.is_json:
+        # Parsed once here (Flask keeps the result) so the time it takes is its own phase
+        with phase('parse'):
+            request.get_json(silent=True)
+
+@app.after_request
+def finish_request_telemetry(response):
+    route = g.pop('request_route', None)
+    if route is None:
+        return response
+    timings, started, method, status = g.request_timings, g.metrics_started, request.method, response.status_code
+    level = log_level(request.path)
+    response.headers.update(telemetry_headers(timings, request.path))
+
+    def finished():
+        # Once the body has been sent, so streamed generations are timed to their last chunk
+        get_metrics().request_finished(route, method, status, started)
+        log_request(timings, method, route, status, level, cache=response.headers.get('X-AIME-Cache'))
+
+    response.call_on_close(finished)
+    return response
+
+@app.teardown_request
+def abandon_request_telemetry(error=None):
+    # A request that failed before a response was made is still counted, and leaves the in-flight gauge
+    route = g.pop('request_route', None)
+    if route is not None:
+        get_metrics().request_finished(route, request.method, 500, g.metrics_started)
+        log_request(g.request_timings, request.method, route, 500, logging.ERROR, error=repr(error) if error else None)
+
+def rate_limited(view=None, *, tokens=estimate_tokens):
+    """
+    Admits a request through the per-key rate limiter (see ratelimit.py) before running the view.
+    The concurrency slot is held until the response has been sent, which for streams is when they end.
+    `tokens` estimates the request's token cost from its JSON body; None charges the request alone.
+    """
+    if view is None:
+        return partial(rate_limited, tokens=tokens)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method == 'OPTIONS':
+            return view(*args, **kwargs)
+
+        try:
+            with phase('ratelimit'):
+                cost = tokens(request.get_json(silent=True)) if tokens else 0
+                lease = get_rate_limiter().acquire(resolve_api_key(request.headers), cost)
+        except RateLimited as e:
+            raise rate_limit_error(e)
+
+        if lease is None:
+            return view(*args, **kwargs)
+        try:
+            response = make_response(view(*args, **kwargs))
+        except BaseException:
+            lease.release()
+            raise
+        response.call_on_close(lease.release)
+        return response
+
+    return wrapper
+
+def stream_generation(route, api_url, params, payload, events=None):
+    """
+    Calls streamGenerateContent and relays the chunks to the browser as server-sent events while they
+    arrive, without buffering the body. `events` (api.ChatReplyEvents) turns the upstream SSE lines into
+    the events to send; without it the upstream bytes are passed through untouched.
+    """
+    try:
+        response = resilient_post(route, api_url, params={**params, 'alt': 'sse'}, headers=JSON_HEADERS, json=payload, stream=True)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise upstream_error(e)
+
+    def generate():
+        try:
+            if events is None:
+                yield from metered_stream(api_url, response.iter_content(chunk_size=None))
+            else:
+                for line in metered_stream(api_url, response.iter_lines()):
+                    event = events.event(line)
+                    if event:
+                        yield event
+                yield events.done()
+        except requests.exceptions.RequestException as e:
+            # The stream has already started, so the failure is reported in-band
+            yield stream_error_event(e)
+        finally:
+            # Runs on completion and when the browser disconnects, releasing the upstream connection
+            response.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+# Bytes read from the upstream per chunk when relaying a response body
+PASSTHROUGH_CHUNK_SIZE = 64 * 1024
+
+def passthrough_response(upstream):
+    """Relays an upstream response body to the browser as it arrives (see api.passthrough_plan)."""
+    raw, encoding, headers = passthrough_plan(request.headers.get('Accept-Encoding', ''), upstream.headers)
+    if raw:
+        body = upstream.raw.stream(PASSTHROUGH_CHUNK_SIZE, decode_content=False)
+    else:
+        body = upstream.iter_content(PASSTHROUGH_CHUNK_SIZE)
+        if encoding:
+            body = compress_stream(body, encoding)
+
+    def generate():
+        try:
+            yield from body
+        finally:
+            upstream.close()
+
+    return Response(generate(), status=upstream.status_code,
+                    content_type=upstream.headers.get('Content-Type', 'application/json'), headers=headers)
+
+def fetch_upstream(route, key, api_url, params, payload, store=False, task=None):
+    """
+    Makes a buffered upstream call, retried and hedged under the route's deadline. Identical requests
+    already in flight (same content address and API key) share that call's result instead of paying
+    for their own; `store` saves it in the cache. For a gateway `task` the call sends its lore through
+    the context cache (see with_task_body), so only the request making the call registers it.
+    """
+    def post(body):
+        response = resilient_post(route, api_url, hedge=True, params=params, headers=JSON_HEADERS, json=body)
+        response.raise_for_status()
+        return response
+
+    def post_task_body(body):
+        try:
+            return post(body)
+        except requests.exceptions.RequestException as e:
+            raise upstream_error(e)
+
+    def call():
+        response = post(payload) if task is None else with_task_body(params['key'], task, post_task_body)
+        entry = CachedResponse(response.status_code, response.headers.get('Content-Type', 'application/json'), response.content)
+        if store:
+            get_response_cache().set(key, entry)
+        return entry
+
+    # A request coalesced onto another's call spends the wait in the upstream phase as well
+    with phase('upstream'):
+        entry, _ = get_flight_group().do(flight_key(key, params.get('key')), call)
+    return entry
+
+def fetch_cached(route, key, api_url, params, payload, task=None):
+    """
+    Returns the upstream response for a cacheable call and whether it was a cache 'HIT' or 'MISS'.
+    Only successful responses are stored; errors raise like a direct upstream call.
+    """
+    with phase('cache'):
+        entry = get_response_cache().get(key)
+    if entry is not None:
+        return entry, 'HIT'
+    return fetch_upstream(route, key, api_url, params, payload, store=True, task=task), 'MISS'
+
+def buffered_response(entry, cache_state):
+    body, headers = buffered_body(entry, cache_state, request.headers.get('Accept-Encoding', ''))
+    return Response(body, status=entry.status, content_type=entry.content_type, headers=headers)
+
+def compact_session(session, api_key):
+    """Rolls the oldest turns of a chat session into its summary once its history is over the threshold."""
+    due = compaction_payload(session)
+    if due is None:
+        return
+    folded, payload = due
+    try:
+        body = fetch_upstream('chat', chat_key(payload, api_key), proxy_target(CHAT_MODEL), upstream_params(api_key), payload).body
+    except requests.exceptions.RequestException:
+        body = None
+    finish_compaction(session, folded, body)
+
+def generate_buffered(route, api_key, model, request_data, cacheable, task=None):
+    """
+    Runs one buffered generation: from the cache when `cacheable`, otherwise through request coalescing.
+    Returns the upstream response and its cache state ('HIT', 'MISS' or 'BYPASS'); failures raise ApiError.
+    The cache and coalescing keys are those of `request_data`, the full prompt, even when a gateway
+    `task` goes upstream referencing its cached lore.
+    """
+    api_url, params, key = proxy_target(model), upstream_params(api_key), generation_key(model, request_data, api_key)
+    try:
+        if cacheable:
+            return fetch_cached(route, key, api_url, params, request_data, task)
+        return fetch_upstream(route, key, api_url, params, request_data, task=task), 'BYPASS'
+    except requests.exceptions.RequestException as e:
+        raise upstream_error(e)
+
+def relay_generation(route, api_key, model, request_data, stream=False, cache_opt_in=False, task=None):
+    """
+    Sends a generateContent (or Imagen predict) body upstream through the full pipeline: SSE streaming
+    when asked for, the response cache for deterministic or opted-in requests, request coalescing for
+    buffered text generations and a streamed passthrough for large Imagen bodies. A gateway `task`
+    (whose body is `request_data`) has its lore sent through the context cache.
+    """
+    check_streamable(model, stream)
+    if stream:
+        def send(body):
+            return stream_generation(route, stream_target(model), upstream_params(api_key), body)
+        return send(request_data) if task is None else with_task_body(api_key, task, send)
+
+    cacheable = is_cacheable(request_data, cache_opt_in)
+    if cacheable or 'imagen' not in model:
+        # Text generations are small, so they are buffered and identical in-flight requests share one call
+        return buffered_response(*generate_buffered(route, api_key, model, request_data, cacheable, task))
 
-# The target URL for the AI service, allowing for dynamic model selection
-AI_API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models/"
+    try:
+        # Imagen predict bodies run to megabytes, so they are streamed through without re-parsing them
+        response = resilient_post(route, proxy_target(model), params=upstream_params(api_key), headers=JSON_HEADERS,
+                                  json=request_data, stream=True)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise upstream_error(e)
+    relayed = passthrough_response(response)
+    relayed.headers['X-AIME-Cache'] = 'BYPASS'
+    return relayed
+
+def with_task_body(api_key, task, generation):
+    """
+    Runs `generation(body)` for a gateway task with its repeated lore in the upstream context cache (see
+    context_cache.py). A call the upstream rejects because it lost the cached lore is made again with the
+    full prompt.
+    """
+    # Buffered generations get here from inside their upstream call, after the response cache and request
+    # coalescing were keyed on the full prompt, so requests answered by those never touch cached lore
+    with phase('context_cache'):
+        body = get_context_cache().prepare(api_key, task.model, task.body, task.lore, task.instructions)
+    try:
+        return generation(body)
+    except ApiError as e:
+        if body is task.body or not lost_cached_content(e.status, str(e)):
+            raise
+    get_context_cache().invalidate(api_key, task.model, task.lore)
+    return generation(task.body)
+
+def run_batch_job(api_key, job):
+    """
+    Runs one /api/batch job (a gateway request: task, inputs and options) and returns its outcome.
+    Each job is admitted by the rate limiter on its own, and every failure is reported in the outcome.
+    """
+    try:
+        task = build_task(job)
+        try:
+            lease = get_rate_limiter().acquire(api_key, estimate_tokens(task.body))
+        except RateLimited as e:
+            raise rate_limit_error(e)
+        try:
+            cacheable = is_cacheable(task.body, job.get('cache', False))
+            entry, cache_state = generate_buffered('generate', api_key, task.model, task.body, cacheable, task)
+        finally:
+            if lease is not None:
+                lease.release()
+    except ApiError as e:
+        return failed_outcome(e)
+    return job_outcome(task, entry, cache_state)
 
 @app.route('/api/proxy', methods=['POST', 'OPTIONS'])
+@rate_limited
 def proxy():
     if request.method == 'OPTIONS':
         # Handle preflight request
         return '', 200
 
-    # Get the user's API key from the request header, if it exists
-    user_api_key = request.headers.get('X-AIME-API-Key')
-
-    # Get the default API key from environment variables
-    default_api_key = os.getenv('API_KEY')
-
-    # Use the user's key if provided, otherwise use the default key
-    api_key_to_use = user_api_key or default_api_key
-
-    if not api_key_to_use:
-        return jsonify({"error": "API key is not configured on the server and was not provided by the user."}), 500
-
-    # Get the JSON body from the incoming request
-    request_data = request.get_json()
-
-    # Extract the model from the request data, with a fallback
-    model = request_data.pop('model', 'gemini-1.5-flash-latest')
-
-    # Determine the correct endpoint based on the model name
-    if 'imagen' in model:
-        endpoint = 'predict'
-    else:
-        endpoint = 'generateContent'
-
-    api_url = f"{AI_API_BASE_URL}{model}:{endpoint}"
-
+    call = parse_proxy(request.headers, request.get_json(silent=True))
+    return relay_generation('proxy', call.api_key, call.model, call.body, call.stream, call.cache)
+
+@app.route('/api/generate', methods=['POST', 'OPTIONS'])
+@rate_limited
+def generate():
+    """
+    The generation gateway used by every front-end bundle: {"task": ..., "inputs": {...}} is turned into
+    a generateContent request server-side (see tasks.py) and answered with the upstream JSON, like /api/proxy.
+    Optional "model", "generationConfig", "stream" and "cache" behave as they do on /api/proxy.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
 
-    # Set up the headers for the request to the AI service
-    headers = {
-        'Content-Type': 'application/json',
-    }
+    call = parse_generate(request.headers, request.get_json(silent=True))
+    task = call.task
+    response = make_response(relay_generation('generate', call.api_key, task.model, task.body, call.stream, call.cache, task))
+    if task.context:
+        response.headers['X-AIME-Context'] = context_header(task)
+    return response
+
+@app.route('/api/assets', methods=['POST', 'OPTIONS'])
+@rate_limited(tokens=None)
+def upload_assets():
+    """
+    Stores context assets ({"assets": [{"type": "text"|"json", "content": ...}]}) in the shared asset store and
+    returns their references. Generation requests then send {"ref": ...} instead of the asset text; a request
+    naming an asset the store lacks fails with "missingAssets", and the client uploads those and retries.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
 
-    # Set up the query parameters, including the API key
-    params = {
-        'key': api_key_to_use
-    }
+    return jsonify(store_assets(parse_assets(request.get_json(silent=True))))
 
-    try:
-        # Forward the request to the AI service
-        response = requests.post(api_url, params=params, headers=headers, json=request_data)
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+@app.route('/api/batch', methods=['POST', 'OPTIONS'])
+def batch():
+    """
+    Runs several gateway jobs concurrently ({"jobs": [...], "parallelism": n}) and streams one NDJSON
+    record per job as it completes. A failed job is reported in its own record and never fails the batch;
+    the last record is a summary.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
 
-        # Return the JSON response from the AI service to the client
-        return jsonify(response.json()), response.status_code
+    api_key, jobs, parallelism = parse_batch_request(request.headers, request.get_json(silent=True))
 
-    except requests.exceptions.RequestException as e:
-        # Handle network errors or bad responses from the AI service
-        error_message = f"Failed to connect to AI service: {e}"
-        # Try to get more specific error info from the response if available
-        try:
-            error_details = e.response.json()
-            error_message = error_details.get("error", {}).get("message", error_message)
-        except (ValueError, AttributeError):
-            pass # No JSON in response, stick with the original error.
+    def generate():
+        started = time.monotonic()
+        succeeded = 0
+        for index, outcome in run_batch(jobs, lambda job: run_batch_job(api_key, job), parallelism):
+            succeeded += outcome["status"] < 400
+            yield ndjson_line(job_result(index, jobs[index], outcome))
+        yield batch_summary(started, succeeded, len(jobs))
 
-        return jsonify({"error": error_message}), getattr(e.response, 'status_code', 500)
+    # Not compressed: each record must reach the browser as soon as its job finishes
+    return Response(generate(), mimetype='application/x-ndjson', headers=NDJSON_HEADERS)
 
 @app.route('/api/chat', methods=['POST', 'OPTIONS'])
+@rate_limited
 def chat():
     if request.method == 'OPTIONS':
         # Handle preflight request
         return '', 200
 
-    data = request.get_json()
-    message = data.get('message')
-    context = data.get('context')
-
-    if not message:
-        return jsonify({"error": "Message is required."}), 400
-
-    # Construct a more sophisticated prompt
-    prompt = f"""
-You are AIME, an AI co-author. Your goal is to assist a user in their creative writing project.
-You must be helpful, encouraging, and provide insightful suggestions.
-The user is currently working on the following part of their project:
----
-{context}
----
-The user's message is: "{message}"
-Please provide a helpful and context-aware response.
-"""
-
-    # Get the user's API key from the request header, if it exists
-    user_api_key = request.headers.get('X-AIME-API-Key')
-    default_api_key = os.getenv('API_KEY')
-    api_key_to_use = user_api_key or default_api_key
-
-    if not api_key_to_use:
-        return jsonify({"error": "API key not configured."}), 500
-
-    # Use the latest gemini-1.5-flash model for chat
-    model = "gemini-1.5-flash-latest"
-    api_url = f"{AI_API_BASE_URL}{model}:generateContent"
-
-    headers = {'Content-Type': 'application/json'}
-    params = {'key': api_key_to_use}
-
-    # Structure the request body for the AI service
-    payload = {
-        "contents": [{
-            "parts": [{"text": prompt}]
-        }]
-    }
-
-    try:
-        response = requests.post(api_url, params=params, headers=headers, json=payload)
-        response.raise_for_status()
-
-        ai_response = response.json()
-
-        # Extract the text from the response
-        # The structure is response['candidates'][0]['content']['parts'][0]['text']
-        chat_content = ai_response.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', 'Sorry, I could not generate a response.')
+    call = parse_chat(request.headers, request.get_json(silent=True))
+    session = open_chat_session(call)
+    if session is not None:
+        compact_session(session, call.api_key)
+    payload = chat_payload(call, session)
+    params = upstream_params(call.api_key)
 
-        return jsonify({"reply": chat_content})
+    if call.stream:
+        return stream_generation('chat', stream_target(CHAT_MODEL), params, payload, events=ChatReplyEvents(call, session))
 
+    try:
+        # Chat replies are sampled, so they are only cached when the client opts in with {"cache": true}
+        if call.cache and get_response_cache().enabled:
+            entry, cache_state = fetch_cached('chat', chat_key(payload, call.api_key), proxy_target(CHAT_MODEL), params, payload)
+        else:
+            entry, cache_state = fetch_upstream('chat', chat_key(payload, call.api_key), proxy_target(CHAT_MODEL), params, payload), 'BYPASS'
     except requests.exceptions.RequestException as e:
-        error_message = f"Failed to connect to AI service: {e}"
-        return jsonify({"error": error_message}), 500
-    except (KeyError, IndexError) as e:
-        return jsonify({"error": "Failed to parse AI response."}), 500
+        raise upstream_error(e)
+
+    reply = jsonify(chat_result(call, session, entry.body))
+    reply.headers['X-AIME-Cache'] = cache_state
+    return reply
 
 @app.route('/api/image', methods=['POST', 'OPTIONS'])
+@rate_limited
 def image():
     if request.method == 'OPTIONS':
         return '', 200
 
-    data = request.get_json()
-    prompt = data.get('prompt')
-    gems = data.get('gems', [])
-    assets = data.get('assets', [])
-
-    # --- Superprompt Crafting ---
-    superprompt = prompt
-    if gems:
-        superprompt += ", " + ", ".join(gems)
-    asset_info = [asset.get('fileName', 'unnamed asset') for asset in assets]
-    if asset_info:
-        superprompt += ", featuring elements from: " + ", ".join(asset_info)
-    superprompt = ", ".join(filter(None, [s.strip() for s in superprompt.split(',')]))
-
-    print(f"Crafted Superprompt for ImageGen: {superprompt}")
+    superprompt = parse_image(request.get_json(silent=True))
 
-    # --- Authentication using google-auth ---
+    # The access token is cached process-wide and refreshed in the background (see credentials.py)
     try:
-        credentials, project_id_from_auth = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-        auth_req = google.auth.transport.requests.Request()
-        credentials.refresh(auth_req)
-        access_token = credentials.token
-    except google.auth.exceptions.DefaultCredentialsError:
-        return jsonify({"error": "Google Cloud authentication failed. Please configure Application Default Credentials."}), 500
-
-    # --- Image Model API Call ---
-    project_id = os.getenv('GOOGLE_PROJECT_ID') or project_id_from_auth
-    if not project_id:
-        return jsonify({"error": "GOOGLE_PROJECT_ID is not configured on the server or found in credentials."}), 500
-
-    api_url = f"https://us-central1-aiplatform.googleapis.com/v1/projects/{project_id}/locations/us-central1/publishers/google/models/imagen@006:predict"
-
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
-    payload = {
-        "instances": [{"prompt": superprompt}],
-        "parameters": {"sampleCount": 1}
-    }
+        with phase('auth'):
+            access_token, project_id_from_auth = get_credential_manager().get_token()
+    except google.auth.exceptions.GoogleAuthError:
+        raise image_auth_error()
 
+    api_url, headers, payload = image_call(access_token, project_id_from_auth, superprompt)
     try:
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = resilient_post('image', api_url, headers=headers, json=payload)
         response.raise_for_status()
-        result = response.json()
-
-        # Check for the 'error' key in the response, which Vertex AI sometimes sends on success status codes
-        if 'error' in result:
-             raise requests.exceptions.RequestException(result['error'].get('message', 'Unknown API error'))
-
-        base64_image = result.get('predictions', [{}])[0].get('bytesBase64Encoded')
-
-        if not base64_image:
-            raise KeyError("Could not find 'bytesBase64Encoded' in API response.")
-
-        image_url = f"data:image/png;base64,{base64_image}"
-
-        return jsonify({
-            "imageUrl": image_url,
-            "revisedPrompt": superprompt
-        })
-
+        with phase('serialize'):
+            result = response.json()
     except requests.exceptions.RequestException as e:
-        error_message = f"Failed to connect to AI service: {e}"
-        try:
-            # Attempt to parse a more specific error from the JSON response body
-            error_details = response.json()
-            error_message = error_details.get("error", {}).get("message", str(e))
-        except (ValueError, AttributeError):
-            # If parsing fails or response is not set, use the original exception message
-             error_message = str(e)
-        return jsonify({"error": error_message}), getattr(e, 'response', {}).get('status_code', 500)
-    except (KeyError, IndexError) as e:
-        return jsonify({"error": f"Failed to parse AI response: {e}"}), 500
+        raise upstream_error(e)
+    except ValueError:
+        raise ApiError("Failed to parse AI response.", 500)
+    return jsonify(image_result(result, superprompt))
+
+@app.route('/blobs/<name>', methods=['GET'])
+def blob(name):
+    """
+    Serves a stored blob. The name is the SHA-256 of the content, so the ETag is strong, the response
+    may be cached forever and Range / If-None-Match requests are answered by send_file.
+    """
+    found = get_blob_store().open(name)
+    if found is None:
+        abort(404)
+    path, digest, content_type = found
+    response = send_file(path, mimetype=content_type, conditional=True, etag=digest, max_age=BLOB_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/', methods=['GET'])
+@app.route('/<path:path>', methods=['GET'])
+def static_asset(path=''):
+    """Serves the front end: pages, and scripts and styles under their fingerprinted names (see static_assets.py)."""
+    found = get_static_site().respond(path, request.headers.get('Accept-Encoding', ''),
+                                      request.headers.get('If-None-Match', ''))
+    if found is None:
+        abort(404)
+    status, headers, body = found
+    return Response(body, status=status, headers=headers)
+
+def stats_source():
+    return server_stats(get_client(), get_flight_group())
+
+register_stats(stats_source)
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    return jsonify(stats_source())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics of every worker process (see metrics.py)."""
+    return Response(get_metrics().render(stats_source), content_type=METRICS_CONTENT_TYPE)
+
+def create_app(config=None):
+    """
+    The app factory for WSGI servers (wsgi.py, gunicorn.conf.py): the app configured from the environment,
+    plus `config` overrides. Under a preloading server it runs once in the master before the workers fork,
+    so it creates nothing per-process; clients, caches and threads are made on first use in each worker.
+    The static site is the exception: it is only data, so it is built here once and shared by the workers.
+    """
+    if config:
+        app.config.update(config)
+    configure_logging()
+    get_static_site()
+    return app
 
 if __name__ == '__main__':
-    app.run(port=5001, debug=True)
\ No newline at end of file
+    # Development server (debugger and reloader); see gunicorn.conf.py for production
+    create_app().run(port=5001, debug=True)
@@ -0,0 +1,643 @@
+import asyncio
+import os
+import time
+from functools import partial, wraps
+
+import google.auth
+import httpx
+from dotenv import load_dotenv
+from quart import Quart, Response, abort, request, jsonify, make_response, send_file
+
+from ai_service import CHAT_MODEL, SSE_HEADERS, proxy_target, resolve_api_key, stream_target
+from api import (
+    EXPOSE_HEADERS, JSON_HEADERS, ApiError, ChatReplyEvents,
+    build_task, buffered_body, chat_key, chat_payload, chat_result, check_streamable, compaction_payload,
+    context_header, failed_outcome, finish_compaction, generation_key, image_auth_error, image_call, image_result,
+    is_cacheable, job_outcome, open_chat_session, parse_assets, parse_batch_request, batch_summary, parse_chat,
+    parse_generate, parse_image, parse_proxy, passthrough_plan, rate_limit_error, server_stats, store_assets,
+    stream_error_event, upstream_error, upstream_params,
+)
+from batch import NDJSON_HEADERS, job_result, ndjson_line
+from blobstore import BLOB_MAX_AGE, get_blob_store
+from cache import CachedResponse, get_response_cache
+from compression import compress_async_stream
+from context_cache import get_context_cache, lost_cached_content
+from credentials import get_credential_manager
+from metrics import (CONTENT_TYPE as METRICS_CONTENT_TYPE, get_metrics, metered_async_stream, model_label,
+                     register_stats)
+from ratelimit import RateLimited, estimate_tokens, get_rate_limiter, verify_accepted_key
+from request_log import (REQUEST_ID_HEADER, annotate, configure_logging, log_level, log_request, phase,
+                         start_request, telemetry_headers)
+from resilience import CONNECT_TIMEOUT, get_resilience
+from singleflight import AsyncSingleFlight, flight_key
+from static_assets import get_static_site
+
+load_dotenv()
+
+# --- Async Upstream Configuration ---
+# Upper bound on simultaneous upstream connections held by this process
+MAX_CONNECTIONS = int(os.getenv('AIME_ASYNC_MAX_CONNECTIONS', '1000'))
+# Idle connections kept alive for reuse, and how long they may sit idle
+MAX_KEEPALIVE = int(os.getenv('AIME_ASYNC_MAX_KEEPALIVE', '100'))
+KEEPALIVE_EXPIRY = float(os.getenv('AIME_ASYNC_KEEPALIVE_EXPIRY', '60'))
+# Generations routinely take 5-40 s, so the read timeout has to be generous
+UPSTREAM_TIMEOUT = float(os.getenv('AIME_ASYNC_UPSTREAM_TIMEOUT', '120'))
+
+# The asyncio serving mode: the routes of app.py with the same JSON contracts, but an in-flight generation
+# only costs a suspended coroutine instead of a worker thread. Request parsing, task building and response
+# shaping are shared through api.py; this module makes the awaited upstream calls and the Quart responses.
+# Run with: cd server && hypercorn --config hypercorn.toml "asgi:create_app()"
+app = Quart(__name__, static_folder=None)
+# Streamed generations can outlive Quart's default 60 s response timeout
+app.config['RESPONSE_TIMEOUT'] = None
+
+
+class AsyncUpstreamClient:
+    """
+    The asyncio counterpart of upstream.UpstreamClient: one non-blocking httpx client per process,
+    pooling keep-alive connections per host for all routes.
+    """
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_keepalive=MAX_KEEPALIVE,
+                 keepalive_expiry=KEEPALIVE_EXPIRY, timeout=UPSTREAM_TIMEOUT):
+        self.max_connections = max_connections
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(timeout, connect=10.0),
+        )
+        self.in_flight = 0
+
+    async def post(self, url, **kwargs):
+        self.in_flight += 1
+        started = get_metrics().upstream_started(url)
+        status = body = None
+        try:
+            response = await self.client.post(url, **kwargs)
+            status, body = response.status_code, response.content
+            verify_accepted_key(kwargs.get('params'), status)
+            return response
+        finally:
+            self.in_flight -= 1
+            get_metrics().upstream_finished(url, status, started, body)
+
+    async def open_stream(self, url, **kwargs):
+        # The caller must hand the response back to close_stream() once it has been relayed
+        self.in_flight += 1
+        started = get_metrics().upstream_started(url)
+        try:
+            response = await self.client.send(self.client.build_request('POST', url, **kwargs), stream=True)
+        except BaseException:
+            self.in_flight -= 1
+            get_metrics().upstream_finished(url, None, started)
+            raise
+        get_metrics().upstream_finished(url, response.status_code, started)
+        verify_accepted_key(kwargs.get('params'), response.status_code)
+        return response
+
+    async def close_stream(self, response):
+        await response.aclose()
+        self.in_flight -= 1
+
+    def stats(self):
+        # httpx does not expose its pool, so idle connections are read from the transport when available
+        pool = getattr(getattr(self.client, '_transport', None), '_pool', None)
+        connections = list(getattr(pool, 'connections', []))
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "max_connections": self.max_connections,
+            "in_use": min(self.in_flight, self.max_connections),
+            "waiting": max(0, self.in_flight - self.max_connections),
+            "idle": idle,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+@app.before_serving
+async def open_upstream_client():
+    app.upstream = AsyncUpstreamClient()
+    app.inflight = AsyncSingleFlight()
+
+
+@app.after_serving
+async def close_upstream_client():
+    await app.upstream.aclose()
+
+
+class RequestTelemetryMiddleware:
+    """
+    Counts, times and logs every HTTP request up to the end of its response body (streams included).
+    The route is known once Quart has matched the URL, so start_request_telemetry records it in the scope.
+    """
+
+    def __init__(self, asgi_app):
+        self.asgi_app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.asgi_app(scope, receive, send)
+        status, cache_state = 500, None
+
+        async def send_status(message):
+            nonlocal status, cache_state
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                cache_state = next((value.decode('latin-1') for name, value in message.get('headers', ())
+                                    if name.lower() == b'x-aime-cache'), None)
+            await send(message)
+
+        try:
+            await self.asgi_app(scope, receive, send_status)
+        finally:
+            if 'aime.request' in scope:
+                route, timings, started = scope['aime.request']
+                get_metrics().request_finished(route, scope['method'], status, started)
+                log_request(timings, scope['method'], route, status, log_level(scope['path']), cache=cache_state)
+
+
+app.asgi_app = RequestTelemetryMiddleware(app.asgi_app)
+
+
+@app.errorhandler(ApiError)
+async def api_error(e):
+    response = jsonify(e.to_json())
+    response.status_code = e.status
+    response.headers.update(e.headers)
+    return response
+
+
+@app.before_request
+async def start_request_telemetry():
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    timings = start_request(request.headers.get(REQUEST_ID_HEADER))
+    request.scope['aime.request'] = (route, timings, get_metrics().request_started(route))
+    if request.is_json:
+        # Parsed once here (Quart keeps the result) so the time it takes is its own phase
+        with phase('parse'):
+            await request.get_json(silent=True)
+
+
+@app.after_request
+async def add_request_headers(response):
+    if 'aime.request' in request.scope:
+        response.headers.update(telemetry_headers(request.scope['aime.request'][1], request.path))
+    return response
+
+
+@app.after_request
+async def add_cors_headers(response):
+    # Mirrors the flask_cors setup in app.py: all origins for the /api/ path
+    if request.path.startswith('/api/'):
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Expose-Headers'] = ', '.join(EXPOSE_HEADERS)
+        if request.method == 'OPTIONS':
+            response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+            requested_headers = request.headers.get('Access-Control-Request-Headers')
+            if requested_headers:
+                response.headers['Access-Control-Allow-Headers'] = requested_headers
+    return response
+
+
+def _attempt_timeout(remaining):
+    remaining = max(remaining, 0.001)
+    return httpx.Timeout(remaining, connect=min(CONNECT_TIMEOUT, remaining))
+
+
+async def resilient_post(route, url, hedge=False, **kwargs):
+    # Async counterpart of upstream.resilient_post: deadline, retries and hedging around one POST
+    async def send(remaining):
+        return await app.upstream.post(url, timeout=_attempt_timeout(remaining), **kwargs)
+
+    annotate(model=model_label(url))
+    with phase('upstream'):
+        return await get_resilience().call_async(route, send, retry_exceptions=(httpx.TransportError,),
+                                                 hedge=hedge, latency_key=url)
+
+
+async def open_upstream_stream(route, url, **kwargs):
+    """
+    Opens a streamed upstream call under the route's resilience policy. An error status raises like a
+    buffered call, with the upstream's message read from its body.
+    """
+    async def send(remaining):
+        return await app.upstream.open_stream(url, timeout=_attempt_timeout(remaining), **kwargs)
+
+    annotate(model=model_label(url))
+    try:
+        with phase('upstream'):
+            response = await get_resilience().call_async(route, send, discard=app.upstream.close_stream,
+                                                         retry_exceptions=(httpx.TransportError,), latency_key=url)
+    except httpx.HTTPError as e:
+        raise upstream_error(e)
+    if response.is_error:
+        await response.aread()
+        await app.upstream.close_stream(response)
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise upstream_error(e)
+    return response
+
+
+class _ReleasingBody:
+    # Wraps a Quart response body so the rate-limit lease is released once the body has been sent
+    def __init__(self, body, release):
+        self._body = body
+        self._release = release
+
+    async def __aenter__(self):
+        return await self._body.__aenter__()
+
+    async def __aexit__(self, *exc):
+        try:
+            return await self._body.__aexit__(*exc)
+        finally:
+            self._release()
+
+
+def rate_limited(view=None, *, tokens=estimate_tokens):
+    # Async counterpart of app.rate_limited: waiting for capacity suspends the coroutine, not a thread
+    if view is None:
+        return partial(rate_limited, tokens=tokens)
+
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        if request.method == 'OPTIONS':
+            return await view(*args, **kwargs)
+
+        try:
+            with phase('ratelimit'):
+                cost = tokens(await request.get_json(silent=True)) if tokens else 0
+                lease = await get_rate_limiter().acquire_async(resolve_api_key(request.headers), cost)
+        except RateLimited as e:
+            raise rate_limit_error(e)
+
+        if lease is None:
+            return await view(*args, **kwargs)
+        try:
+            response = await make_response(await view(*args, **kwargs))
+        except BaseException:
+            lease.release()
+            raise
+        response.response = _ReleasingBody(response.response, lease.release)
+        return response
+
+    return wrapper
+
+
+async def stream_generation(route, api_url, params, payload, events=None):
+    """
+    Async counterpart of app.stream_generation: relays streamGenerateContent chunks as server-sent events
+    as they arrive. Without `events` the upstream bytes are passed through untouched.
+    """
+    response = await open_upstream_stream(route, api_url, params={**params, 'alt': 'sse'}, headers=JSON_HEADERS, json=payload)
+
+    async def generate():
+        try:
+            if events is None:
+                async for chunk in metered_async_stream(api_url, response.aiter_bytes()):
+                    yield chunk
+            else:
+                async for line in metered_async_stream(api_url, response.aiter_lines()):
+                    event = events.event(line)
+                    if event:
+                        yield event
+                yield events.done()
+        except httpx.HTTPError as e:
+            yield stream_error_event(e)
+        finally:
+            # Runs on completion and when the browser disconnects, releasing the upstream connection
+            await app.upstream.close_stream(response)
+
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+
+async def passthrough_response(upstream):
+    """Async counterpart of app.passthrough_response (see api.passthrough_plan)."""
+    raw, encoding, headers = passthrough_plan(request.headers.get('Accept-Encoding', ''), upstream.headers)
+    if raw:
+        body = upstream.aiter_raw()
+    else:
+        body = upstream.aiter_bytes()
+        if encoding:
+            body = compress_async_stream(body, encoding)
+
+    async def generate():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            await app.upstream.close_stream(upstream)
+
+    return Response(generate(), status=upstream.status_code,
+                    content_type=upstream.headers.get('Content-Type', 'application/json'), headers=headers)
+
+
+async def fetch_upstream(route, key, api_url, params, payload, store=False, task=None):
+    # Async counterpart of app.fetch_upstream: identical in-flight requests share one resilient upstream call
+    async def post(body):
+        response = await resilient_post(route, api_url, hedge=True, params=params, headers=JSON_HEADERS, json=body)
+        response.raise_for_status()
+        return response
+
+    async def post_task_body(body):
+        try:
+            return await post(body)
+        except httpx.HTTPError as e:
+            raise upstream_error(e)
+
+    async def call():
+        response = await (post(payload) if task is None else with_task_body(params['key'], task, post_task_body))
+        entry = CachedResponse(response.status_code, response.headers.get('Content-Type', 'application/json'), response.content)
+        if store:
+            await asyncio.to_thread(get_response_cache().set, key, entry)
+        return entry
+
+    with phase('upstream'):
+        entry, _ = await app.inflight.do(flight_key(key, params.get('key')), call)
+    return entry
+
+
+async def fetch_cached(route, key, api_url, params, payload, task=None):
+    # Async counterpart of app.fetch_cached; the disk tier is consulted off the event loop
+    with phase('cache'):
+        entry = await asyncio.to_thread(get_response_cache().get, key)
+    if entry is not None:
+        return entry, 'HIT'
+    return await fetch_upstream(route, key, api_url, params, payload, store=True, task=task), 'MISS'
+
+
+def buffered_response(entry, cache_state):
+    body, headers = buffered_body(entry, cache_state, request.headers.get('Accept-Encoding', ''))
+    return Response(body, status=entry.status, content_type=entry.content_type, headers=headers)
+
+
+async def compact_session(session, api_key):
+    """The asyncio counterpart of app.compact_session."""
+    due = compaction_payload(session)
+    if due is None:
+        return
+    folded, payload = due
+    try:
+        body = (await fetch_upstream('chat', chat_key(payload, api_key), proxy_target(CHAT_MODEL), upstream_params(api_key), payload)).body
+    except httpx.HTTPError:
+        body = None
+    finish_compaction(session, folded, body)
+
+
+async def generate_buffered(route, api_key, model, request_data, cacheable, task=None):
+    """The asyncio counterpart of app.generate_buffered: returns (response, cache state)."""
+    api_url, params, key = proxy_target(model), upstream_params(api_key), generation_key(model, request_data, api_key)
+    try:
+        if cacheable:
+            return await fetch_cached(route, key, api_url, params, request_data, task)
+        return await fetch_upstream(route, key, api_url, params, request_data, task=task), 'BYPASS'
+    except httpx.HTTPError as e:
+        raise upstream_error(e)
+
+
+async def relay_generation(route, api_key, model, request_data, stream=False, cache_opt_in=False, task=None):
+    """The asyncio counterpart of app.relay_generation: stream, cache, coalesce or pass through."""
+    check_streamable(model, stream)
+    if stream:
+        async def send(body):
+            return await stream_generation(route, stream_target(model), upstream_params(api_key), body)
+        return await (send(request_data) if task is None else with_task_body(api_key, task, send))
+
+    cacheable = is_cacheable(request_data, cache_opt_in)
+    if cacheable or 'imagen' not in model:
+        # Text generations are buffered so identical in-flight requests can share one call
+        return buffered_response(*await generate_buffered(route, api_key, model, request_data, cacheable, task))
+
+    response = await open_upstream_stream(route, proxy_target(model), params=upstream_params(api_key),
+                                          headers=JSON_HEADERS, json=request_data)
+    relayed = await passthrough_response(response)
+    relayed.headers['X-AIME-Cache'] = 'BYPASS'
+    return relayed
+
+
+async def with_task_body(api_key, task, generation):
+    """The asyncio counterpart of app.with_task_body; `generation(body)` is a coroutine function."""
+    # Registering or extending cached lore is an upstream call of its own, made off the event loop
+    with phase('context_cache'):
+        body = await asyncio.to_thread(get_context_cache().prepare, api_key, task.model, task.body, task.lore, task.instructions)
+    try:
+        return await generation(body)
+    except ApiError as e:
+        if body is task.body or not lost_cached_content(e.status, str(e)):
+            raise
+    get_context_cache().invalidate(api_key, task.model, task.lore)
+    return await generation(task.body)
+
+
+async def run_batch_job(api_key, job):
+    """The asyncio counterpart of app.run_batch_job."""
+    try:
+        task = await asyncio.to_thread(build_task, job)
+        try:
+            lease = await get_rate_limiter().acquire_async(api_key, estimate_tokens(task.body))
+        except RateLimited as e:
+            raise rate_limit_error(e)
+        try:
+            cacheable = is_cacheable(task.body, job.get('cache', False))
+            entry, cache_state = await generate_buffered('generate', api_key, task.model, task.body, cacheable, task)
+        finally:
+            if lease is not None:
+                lease.release()
+    except ApiError as e:
+        return failed_outcome(e)
+    return job_outcome(task, entry, cache_state)
+
+
+@app.route('/api/proxy', methods=['POST', 'OPTIONS'])
+@rate_limited
+async def proxy():
+    if request.method == 'OPTIONS':
+        # Handle preflight request
+        return '', 200
+
+    call = parse_proxy(request.headers, await request.get_json(silent=True))
+    return await relay_generation('proxy', call.api_key, call.model, call.body, call.stream, call.cache)
+
+
+@app.route('/api/generate', methods=['POST', 'OPTIONS'])
+@rate_limited
+async def generate():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    # Off the event loop: element prompts read referenced assets from disk
+    call = await asyncio.to_thread(parse_generate, request.headers, await request.get_json(silent=True))
+    task = call.task
+    response = await make_response(await relay_generation(
+        'generate', call.api_key, task.model, task.body, call.stream, call.cache, task))
+    if task.context:
+        response.headers['X-AIME-Context'] = context_header(task)
+    return response
+
+
+@app.route('/api/assets', methods=['POST', 'OPTIONS'])
+@rate_limited(tokens=None)
+async def upload_assets():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    assets = parse_assets(await request.get_json(silent=True))
+    return jsonify(await asyncio.to_thread(store_assets, assets))
+
+
+@app.route('/api/batch', methods=['POST', 'OPTIONS'])
+async def batch():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    api_key, jobs, parallelism = parse_batch_request(request.headers, await request.get_json(silent=True))
+
+    async def generate():
+        started = time.monotonic()
+        slots = asyncio.Semaphore(parallelism)
+
+        async def run(index, job):
+            async with slots:
+                try:
+                    return index, await run_batch_job(api_key, job)
+                except Exception as e:
+                    return index, {"status": 500, "error": f"Job failed: {e}"}
+
+        tasks = [asyncio.ensure_future(run(index, job)) for index, job in enumerate(jobs)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, outcome = await next_done
+                succeeded += outcome["status"] < 400
+                yield ndjson_line(job_result(index, jobs[index], outcome))
+            yield batch_summary(started, succeeded, len(jobs))
+        finally:
+            # The browser went away: jobs still waiting for a slot are not started
+            for task in tasks:
+                task.cancel()
+
+    return Response(generate(), mimetype='application/x-ndjson', headers=NDJSON_HEADERS)
+
+
+@app.route('/api/chat', methods=['POST', 'OPTIONS'])
+@rate_limited
+async def chat():
+    if request.method == 'OPTIONS':
+        # Handle preflight request
+        return '', 200
+
+    call = parse_chat(request.headers, await request.get_json(silent=True))
+    session = open_chat_session(call)
+    if session is not None:
+        await compact_session(session, call.api_key)
+    payload = chat_payload(call, session)
+    params = upstream_params(call.api_key)
+
+    if call.stream:
+        return await stream_generation('chat', stream_target(CHAT_MODEL), params, payload, events=ChatReplyEvents(call, session))
+
+    try:
+        if call.cache and get_response_cache().enabled:
+            entry, cache_state = await fetch_cached('chat', chat_key(payload, call.api_key), proxy_target(CHAT_MODEL), params, payload)
+        else:
+            entry, cache_state = await fetch_upstream('chat', chat_key(payload, call.api_key), proxy_target(CHAT_MODEL), params, payload), 'BYPASS'
+    except httpx.HTTPError as e:
+        raise upstream_error(e)
+
+    reply = jsonify(chat_result(call, session, entry.body))
+    reply.headers['X-AIME-Cache'] = cache_state
+    return reply
+
+
+@app.route('/api/image', methods=['POST', 'OPTIONS'])
+@rate_limited
+async def image():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    superprompt = parse_image(await request.get_json(silent=True))
+
+    # A cached token is used directly; only a missing or expired one is fetched, off the event loop
+    credential_manager = get_credential_manager()
+    try:
+        with phase('auth'):
+            access_token, project_id_from_auth = credential_manager.cached_token() or await asyncio.to_thread(credential_manager.get_token)
+    except google.auth.exceptions.GoogleAuthError:
+        raise image_auth_error()
+
+    api_url, headers, payload = image_call(access_token, project_id_from_auth, superprompt)
+    try:
+        response = await resilient_post('image', api_url, headers=headers, json=payload)
+        response.raise_for_status()
+        with phase('serialize'):
+            result = response.json()
+    except httpx.HTTPError as e:
+        raise upstream_error(e)
+    except ValueError:
+        raise ApiError("Failed to parse AI response.", 500)
+    # Decoding and writing a multi-megabyte image is kept off the event loop
+    return jsonify(await asyncio.to_thread(image_result, result, superprompt))
+
+
+@app.route('/blobs/<name>', methods=['GET'])
+async def blob(name):
+    found = get_blob_store().open(name)
+    if found is None:
+        abort(404)
+    path, digest, content_type = found
+    response = await send_file(path, mimetype=content_type, add_etags=False, cache_timeout=BLOB_MAX_AGE)
+    response.set_etag(digest)
+    response.cache_control.immutable = True
+    await response.make_conditional(request, accept_ranges=True, complete_length=os.path.getsize(path))
+    return response
+
+
+@app.route('/', methods=['GET'])
+@app.route('/<path:path>', methods=['GET'])
+async def static_asset(path=''):
+    site = get_static_site()
+    arguments = (path, request.headers.get('Accept-Encoding', ''), request.headers.get('If-None-Match', ''))
+    # The site is built in create_app; only watch mode (development) reads files while serving
+    found = await asyncio.to_thread(site.respond, *arguments) if site.watch else site.respond(*arguments)
+    if found is None:
+        abort(404)
+    status, headers, body = found
+    return Response(body, status=status, headers=headers)
+
+
+def stats_source():
+    return server_stats(app.upstream, app.inflight)
+
+
+register_stats(stats_source)
+
+
+@app.route('/api/stats', methods=['GET'])
+async def stats():
+    # Opening the vector index may load an embedding model, so the stats are gathered off the event loop
+    return jsonify(await asyncio.to_thread(stats_source))
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    # Reads the other workers' metrics files
+    return Response(await asyncio.to_thread(get_metrics().render, stats_source), content_type=METRICS_CONTENT_TYPE)
+
+
+def create_app(config=None):
+    """The app factory for ASGI servers (hypercorn.toml); the counterpart of app.create_app."""
+    if config:
+        app.config.update(config)
+    configure_logging()
+    get_static_site()
+    return app
+
+
+if __name__ == '__main__':
+    create_app().run(port=5001)
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from blobstore import BlobStore
+from retrieval import get_lore_index
+
+# --- Context Asset Store Configuration ---
+# Lore assets (.world, .persona, text files, ...) uploaded once and referenced by SHA-256 afterwards
+ASSET_DIR = os.getenv('AIME_ASSET_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'assets'))
+ASSET_MAX_BYTES = int(os.getenv('AIME_ASSET_MAX_BYTES', str(2 * 1024 * 1024)))
+# Total size of the store; past it the least recently used assets are removed (clients upload them again)
+ASSET_MAX_TOTAL_BYTES = int(os.getenv('AIME_ASSET_MAX_TOTAL_BYTES', str(256 * 1024 * 1024)))
+
+# Asset type (as sent by the pages) -> stored content type
+ASSET_CONTENT_TYPES = {
+    'text': 'text/plain; charset=utf-8',
+    'json': 'application/json',
+}
+ASSET_EXTENSIONS = {'text': 'txt', 'json': 'json'}
+
+ASSET_REF = re.compile(r'^[0-9a-f]{64}$')
+
+
+class AssetError(ValueError):
+    """Raised for an asset that cannot be stored or referenced."""
+
+
+class MissingAssets(AssetError):
+    """Raised when referenced assets are not in the store; the client uploads them and retries."""
+
+    def __init__(self, refs):
+        super().__init__(f"Unknown asset reference(s): {', '.join(refs)}.")
+        self.refs = refs
+
+
+def asset_ref(content):
+    """The reference of an asset: the SHA-256 of its UTF-8 text, which browsers can compute before uploading."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _content_text(asset):
+    content = asset.get('content')
+    if asset.get('type') == 'json' and not isinstance(content, str):
+        # Structured clients may send the parsed object instead of the file text
+        content = json.dumps(content, ensure_ascii=False)
+    if not isinstance(content, str):
+        raise AssetError("Asset content must be a string.")
+    return content
+
+
+class AssetStore:
+    """
+    Content-addressed store for context assets, shared by every user and project: the same lore file is
+    stored once however often it is uploaded, and generation requests carry its reference, not its text.
+    """
+
+    def __init__(self, root=ASSET_DIR, max_bytes=ASSET_MAX_BYTES, max_total_bytes=ASSET_MAX_TOTAL_BYTES):
+        self.blobs = BlobStore(root, max_total_bytes)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.resolved = 0
+        self.missing = 0
+
+    def put(self, asset):
+        """Stores one {type, content} asset and returns {ref, bytes, created}."""
+        asset_type = asset.get('type')
+        if asset_type not in ASSET_CONTENT_TYPES:
+            raise AssetError(f"Unsupported asset type: {asset_type}.")
+        content = _content_text(asset)
+        data = content.encode('utf-8')
+        if len(data) > self.max_bytes:
+            raise AssetError(f"Assets may be at most {self.max_bytes} bytes.")
+        ref = asset_ref(content)
+        existed = self.blobs.open(f"{ref}.{ASSET_EXTENSIONS[asset_type]}") is not None
+        self.blobs.put(data, ASSET_CONTENT_TYPES[asset_type])
+        # Uploads keep the retrieval index current; an edited asset arrives as a new reference
+        get_lore_index().add(ref, asset_type, content)
+        return {"ref": ref, "bytes": len(data), "created": not existed}
+
+    def get(self, asset_type, ref):
+        """Returns the text of a stored asset, or None when the store does not have it."""
+        if asset_type not in ASSET_EXTENSIONS or not ASSET_REF.match(ref or ''):
+            raise AssetError(f"Invalid asset reference: {ref}.")
+        data = self.blobs.read(f"{ref}.{ASSET_EXTENSIONS[asset_type]}")
+        return None if data is None else data.decode('utf-8')
+
+    def resolve(self, assets):
+        """
+        Returns `assets` with every {"ref": ...} entry expanded to its stored content. Entries that carry
+        their content inline pass through unchanged. Raises MissingAssets listing every unknown reference.
+        """
+        if not isinstance(assets or [], list):
+            raise AssetError("Assets must be a list.")
+        resolved, found, missing = [], 0, []
+        for asset in assets or []:
+            if not isinstance(asset, dict) or 'ref' not in asset or 'content' in asset:
+                resolved.append(asset)
+                continue
+            content = self.get(asset.get('type'), asset['ref'])
+            if content is None:
+                missing.append(asset['ref'])
+            else:
+                found += 1
+            resolved.append({**asset, "content": content})
+        with self._lock:
+            self.resolved += found
+            self.missing += len(missing)
+        if missing:
+            raise MissingAssets(missing)
+        return resolved
+
+    def stats(self):
+        blobs = self.blobs.stats()
+        with self._lock:
+            return {"stored": blobs["writes"], "deduplicated": blobs["duplicates"], "evicted": blobs["evictions"],
+                    "resolved": self.resolved, "missing": self.missing}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_asset_store():
+    """Returns the process-wide AssetStore."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AssetStore()
+    return _store
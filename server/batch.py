@@ -0,0 +1,67 @@
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# --- Batch Configuration ---
+# Jobs of one batch run at most this many at a time; a batch may ask for fewer with "parallelism"
+BATCH_PARALLELISM = int(os.getenv('AIME_BATCH_PARALLELISM', '4'))
+BATCH_MAX_JOBS = int(os.getenv('AIME_BATCH_MAX_JOBS', '32'))
+# Keep proxies from buffering the records, which must reach the browser as each job finishes
+NDJSON_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+class BatchError(ValueError):
+    """Raised when a batch request is malformed as a whole (individual jobs fail in-band instead)."""
+
+
+def parse_batch(data):
+    """Returns (jobs, parallelism) from a /api/batch body, or raises BatchError."""
+    if not isinstance(data, dict):
+        raise BatchError("A batch must be a JSON object.")
+    jobs = data.get('jobs')
+    if not isinstance(jobs, list) or not jobs:
+        raise BatchError("A batch needs a non-empty \"jobs\" list.")
+    if len(jobs) > BATCH_MAX_JOBS:
+        raise BatchError(f"A batch may contain at most {BATCH_MAX_JOBS} jobs.")
+    if not all(isinstance(job, dict) for job in jobs):
+        raise BatchError("Every job must be an object.")
+    try:
+        parallelism = int(data.get('parallelism') or BATCH_PARALLELISM)
+    except (TypeError, ValueError):
+        raise BatchError("\"parallelism\" must be a number.")
+    return jobs, max(1, min(parallelism, BATCH_PARALLELISM, len(jobs)))
+
+
+def job_result(index, job, outcome):
+    # One NDJSON record: the job's position and id (when given) followed by its outcome
+    record = {"index": index}
+    if 'id' in job:
+        record["id"] = job['id']
+    record.update(outcome)
+    return record
+
+
+def ndjson_line(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def run_batch(jobs, run_job, parallelism):
+    """
+    Runs `run_job(job)` for every job on at most `parallelism` threads and yields (index, outcome) in
+    completion order. `run_job` reports failures in its outcome; an unexpected exception becomes a 500
+    outcome for that job only. Closing the generator early (client gone) cancels jobs not yet started.
+    """
+    executor = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='aime-batch')
+    pending = {executor.submit(run_job, job): index for index, job in enumerate(jobs)}
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = {"status": 500, "error": f"Job failed: {e}"}
+                yield index, outcome
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
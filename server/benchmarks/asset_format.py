@@ -0,0 +1,73 @@
+"""
+Compares the two JSON asset formats of prompts.py: bytes and estimated tokens of a rendered asset entry,
+pretty (indented JSON, as the browser embedded it) against compact (flattened key: value lines).
+
+    python server/benchmarks/asset_format.py [--json] [asset files...]
+
+Without files it renders one saved element per element type, with every field of its form filled in except
+every third one (saved forms are rarely complete), plus the World file the usability workflow uploads.
+"""
+import json
+import os
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from context import estimate_tokens  # noqa: E402
+from element_fields import ELEMENT_FIELDS, SCENARIO_FIELDS  # noqa: E402
+from prompts import render_asset  # noqa: E402
+
+USABILITY_WORLD = os.path.join(SERVER_DIR, '..', 'tests', 'usability', 'test_world.world')
+
+
+def sample_assets():
+    """(name, JSON text) for a saved element of every type."""
+    samples = []
+    for element_type, fields in {**ELEMENT_FIELDS, **SCENARIO_FIELDS}.items():
+        traits = {field_id: '' if position % 3 == 2 else f"Sample {label.lower()} for the benchmark."
+                  for position, (field_id, label) in enumerate(fields)}
+        saved = {"assetType": element_type, "timestamp": "2025-09-30T10:00:00.000Z", "traits": traits}
+        samples.append((element_type, json.dumps(saved)))
+    if os.path.exists(USABILITY_WORLD):
+        with open(USABILITY_WORLD, encoding='utf-8') as f:
+            samples.append(('test_world.world', f.read()))
+    return samples
+
+
+def measure(name, content):
+    pretty = render_asset('json', name, content, 'Typical', '', 'pretty')
+    compact = render_asset('json', name, content, 'Typical', '', 'compact')
+    row = {"asset": name}
+    for fmt, text in (('pretty', pretty), ('compact', compact)):
+        row[f"{fmt}Bytes"] = len(text.encode('utf-8'))
+        row[f"{fmt}Tokens"] = estimate_tokens(text)
+    row["tokensSaved"] = row["prettyTokens"] - row["compactTokens"]
+    row["saved"] = round(100 * row["tokensSaved"] / row["prettyTokens"], 1) if row["prettyTokens"] else 0.0
+    return row
+
+
+def main(argv):
+    as_json = '--json' in argv
+    paths = [arg for arg in argv if arg != '--json']
+    samples = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            samples.append((os.path.basename(path), f.read()))
+    rows = [measure(name, content) for name, content in samples or sample_assets()]
+
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'asset':<20}{'pretty B':>10}{'compact B':>11}{'pretty tok':>12}{'compact tok':>13}{'saved':>8}")
+    for row in rows:
+        print(f"{row['asset']:<20}{row['prettyBytes']:>10}{row['compactBytes']:>11}"
+              f"{row['prettyTokens']:>12}{row['compactTokens']:>13}{row['saved']:>7}%")
+    pretty, compact = sum(row['prettyTokens'] for row in rows), sum(row['compactTokens'] for row in rows)
+    print(f"{'total':<20}{sum(row['prettyBytes'] for row in rows):>10}{sum(row['compactBytes'] for row in rows):>11}"
+          f"{pretty:>12}{compact:>13}{round(100 * (pretty - compact) / pretty, 1) if pretty else 0.0:>7}%")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,70 @@
+"""
+Times the semantic lore index of vectors.py on a synthetic library: embedding and storing the elements,
+then top-k queries over the whole library and over the 50 assets a request typically brings along.
+
+    python server/benchmarks/vector_search.py [elements] [--embedder hashing|local]
+
+Defaults to 10000 elements with the model-free hashing embedder; the index lives in a temporary directory.
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+import vectors  # noqa: E402
+
+ROLES = ["insurgent commander", "cathedral archivist", "dock smuggler", "void cartographer", "guild assassin",
+         "orbital engineer", "plague doctor", "storm priest", "merchant prince", "exiled duelist"]
+PLACES = ["the flooded docks", "the glass cathedral", "the iron spire", "the ash wastes", "the lunar archive"]
+QUERIES = ["the rebel leader hiding in the docks", "who keeps the records of the cathedral",
+           "a killer for hire from the guilds", "engineers who repair the orbital rings"]
+
+
+def library(size, seed=7):
+    rng = random.Random(seed)
+    for number in range(size):
+        traits = {"persona-name": f"Persona {number}", "persona-role": rng.choice(ROLES),
+                  "persona-home": rng.choice(PLACES), "persona-notes": f"Known for deed {rng.randrange(1000)}."}
+        yield f"ref-{number}", json.dumps({"assetType": "PERSONA", "traits": traits})
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(argv):
+    size = next((int(arg) for arg in argv if arg.isdigit()), 10000)
+    kind = argv[argv.index('--embedder') + 1] if '--embedder' in argv else 'hashing'
+    embedder = vectors.make_embedder(kind)
+    with tempfile.TemporaryDirectory() as root:
+        index = vectors.VectorIndex(root, embedder)
+        start = time.perf_counter()
+        for ref, content in library(size):
+            index.add(ref, 'json', content)
+        build = time.perf_counter() - start
+        stats = index.stats()
+        print(f"{stats['embedder']}: {size} elements, {stats['chunks']} chunks, built in {build:.1f}s")
+
+        candidates = {f"ref-{number}" for number in random.Random(1).sample(range(size), min(50, size))}
+        for query in QUERIES:
+            full = timed(lambda: index.search(query, k=8), 20)
+            narrowed = timed(lambda: index.search(query, candidates=candidates, k=8), 20)
+            print(f"  {query!r}: whole library {full:.2f} ms, 50 candidates {narrowed:.2f} ms")
+        reopen = timed(lambda: vectors.VectorIndex(root, embedder), 3)
+        print(f"  reopening the index (memory map + ID table): {reopen:.1f} ms")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
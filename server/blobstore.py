@@ -0,0 +1,174 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+# --- Blob Store Configuration ---
+# Generated images (and other binary outputs) are kept here, named by the SHA-256 of their bytes
+BLOB_DIR = os.getenv('AIME_BLOB_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'blobs'))
+# Total size the store may reach; beyond it the least recently used blobs are removed. Off (0) by default:
+# projects save generated images by their /blobs URL, so a removed blob is a broken image in a saved project
+BLOB_MAX_TOTAL_BYTES = int(os.getenv('AIME_BLOB_MAX_TOTAL_BYTES', '0'))
+# URL prefix the blobs are served under (see the /blobs route in app.py)
+BLOB_URL_PREFIX = '/blobs/'
+# Blob URLs never change content, so browsers may cache them for a year without revalidating
+BLOB_MAX_AGE = 365 * 24 * 3600
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'webp': 'image/webp',
+    'gif': 'image/gif',
+    # Context assets (see assets.py); they live in their own store and are not served under /blobs
+    'txt': 'text/plain; charset=utf-8',
+    'json': 'application/json',
+}
+EXTENSIONS = {content_type: extension for extension, content_type in CONTENT_TYPES.items()}
+
+# <sha256>.<extension>: anything else is rejected before touching the filesystem
+BLOB_NAME = re.compile(r'^([0-9a-f]{64})\.([a-z0-9]{1,8})$')
+
+
+def parse_blob_name(name):
+    """Returns (digest, extension) for a valid blob file name, otherwise None."""
+    match = BLOB_NAME.match(name or '')
+    if not match or match.group(2) not in CONTENT_TYPES:
+        return None
+    return match.group(1), match.group(2)
+
+
+class BlobStore:
+    """
+    Content-addressed store on local disk. A blob is written once under the SHA-256 of its bytes, so
+    storing the same image twice costs nothing and a blob's URL always refers to the same content.
+    With a `max_bytes` cap (0: none), the blobs least recently stored or read are removed past it.
+    """
+
+    def __init__(self, root=BLOB_DIR, max_bytes=BLOB_MAX_TOTAL_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Bytes on disk, scanned on the first write so a restart picks up the existing blobs
+        self._size = None
+        self.writes = 0
+        self.duplicates = 0
+        self.evictions = 0
+
+    def path(self, digest, extension):
+        return os.path.join(self.root, digest[:2], f"{digest}.{extension}")
+
+    def put(self, data, content_type='image/png'):
+        """Stores `data` and returns its blob name (`<sha256>.<extension>`)."""
+        extension = EXTENSIONS.get(content_type, 'png')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest, extension)
+        if self._touch(path):
+            self._count('duplicates')
+            return f"{digest}.{extension}"
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so a concurrent reader never serves a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self.writes += 1
+            self._size = self._scan_size() if self._size is None else self._size + len(data)
+            over_cap = self.max_bytes and self._size > self.max_bytes
+        if over_cap:
+            self._evict()
+        return f"{digest}.{extension}"
+
+    def open(self, name):
+        """Returns (path, digest, content_type) for a stored blob, or None when it does not exist."""
+        parsed = parse_blob_name(name)
+        if parsed is None:
+            return None
+        digest, extension = parsed
+        path = self.path(digest, extension)
+        if not self._touch(path):
+            return None
+        return path, digest, CONTENT_TYPES[extension]
+
+    def read(self, name):
+        """Returns the bytes of a stored blob, or None when it does not exist."""
+        found = self.open(name)
+        if found is None:
+            return None
+        with open(found[0], 'rb') as f:
+            return f.read()
+
+    @staticmethod
+    def url(name):
+        return f"{BLOB_URL_PREFIX}{name}"
+
+    @staticmethod
+    def _touch(path):
+        # The modification time records the last use, which orders eviction; False when the blob is gone
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _blobs(self):
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if not BLOB_NAME.match(name):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    continue
+
+    def _scan_size(self):
+        return sum(stat.st_size for _, stat in self._blobs())
+
+    def _evict(self):
+        # Remove the least recently used blobs until back under 90% of the cap
+        blobs = sorted(self._blobs(), key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _, stat in blobs)
+        target, evicted = self.max_bytes * 0.9, 0
+        for path, stat in blobs:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= stat.st_size
+            evicted += 1
+        with self._lock:
+            self._size = total
+            self.evictions += evicted
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {"writes": self.writes, "duplicates": self.duplicates, "evictions": self.evictions,
+                    "bytes": self._size}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Returns the process-wide BlobStore."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BlobStore()
+    return _store
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# --- Response Cache Configuration ---
+CACHE_ENABLED = os.getenv('AIME_CACHE_ENABLED', 'true').lower() == 'true'
+# In-memory tier: bounded by entry count and total body bytes
+MEMORY_ITEMS = int(os.getenv('AIME_CACHE_MEMORY_ITEMS', '256'))
+MEMORY_BYTES = int(os.getenv('AIME_CACHE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+MEMORY_TTL = int(os.getenv('AIME_CACHE_MEMORY_TTL', '3600'))
+# On-disk tier: shared by every worker process on the host
+DISK_DIR = os.getenv('AIME_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'responses'))
+DISK_BYTES = int(os.getenv('AIME_CACHE_DISK_BYTES', str(512 * 1024 * 1024)))
+DISK_TTL = int(os.getenv('AIME_CACHE_DISK_TTL', str(7 * 24 * 3600)))
+
+# A cached upstream response: status code, content type and the raw body bytes
+CachedResponse = namedtuple('CachedResponse', ['status', 'content_type', 'body'])
+
+
+def cache_key(route, model, body, api_key=None):
+    """
+    Content address of an upstream call: a SHA-256 over the canonical JSON of route, model, body and the
+    fingerprint of the API key it is made with. An entry is only served to callers of the same key, so a
+    cache hit never answers a key the upstream has not accepted for that request.
+    """
+    credential = hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()
+    canonical = json.dumps({"route": route, "model": model, "body": body, "credential": credential},
+                           sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def is_deterministic(body):
+    # Only greedy decoding gives the same answer twice; any other temperature must opt in explicitly
+    config = body.get('generationConfig') if isinstance(body, dict) else None
+    return isinstance(config, dict) and config.get('temperature') == 0
+
+
+class ResponseCache:
+    """
+    Two-tier cache of upstream responses keyed by cache_key(): a small LRU in memory in front of a
+    size-capped directory on disk. Both tiers expire entries after their TTL.
+    """
+
+    def __init__(self, enabled=CACHE_ENABLED, memory_items=MEMORY_ITEMS, memory_bytes=MEMORY_BYTES,
+                 memory_ttl=MEMORY_TTL, disk_dir=DISK_DIR, disk_bytes=DISK_BYTES, disk_ttl=DISK_TTL):
+        self.enabled = enabled
+        self.memory_items = memory_items
+        self.memory_bytes = memory_bytes
+        self.memory_ttl = memory_ttl
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.disk_ttl = disk_ttl
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = None
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    # --- Public API ---
+
+    def get(self, key):
+        entry = self._memory_get(key)
+        if entry is not None:
+            self._count('memory')
+            return entry
+        if self.disk_dir:
+            entry = self._disk_get(key)
+            if entry is not None:
+                self._memory_set(key, entry)
+                self._count('disk')
+                return entry
+        self._count(None)
+        return None
+
+    def set(self, key, entry):
+        self._memory_set(key, entry)
+        if self.disk_dir:
+            self._disk_set(key, entry)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits["memory"] + self.hits["disk"] + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_bytes": self._disk_size,
+            }
+
+    def _count(self, tier):
+        with self._lock:
+            if tier is None:
+                self.misses += 1
+            else:
+                self.hits[tier] += 1
+
+    # --- Memory Tier ---
+
+    def _memory_get(self, key):
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.time():
+                self._memory_pop(key)
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    def _memory_set(self, key, entry):
+        size = len(entry.body)
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory_pop(key)
+            self._memory[key] = (time.time() + self.memory_ttl, entry)
+            self._memory_size += size
+            while len(self._memory) > self.memory_items or self._memory_size > self.memory_bytes:
+                self._memory_pop(next(iter(self._memory)))
+
+    def _memory_pop(self, key):
+        _, entry = self._memory.pop(key)
+        self._memory_size -= len(entry.body)
+
+    # --- Disk Tier ---
+    # Each entry is one file: a JSON header line followed by the raw body bytes.
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _disk_get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if header.get('created', 0) + self.disk_ttl < time.time():
+            self._remove(path)
+            return None
+        # Touch the file so the size-cap eviction drops the least recently used entries first
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return CachedResponse(header['status'], header['content_type'], body)
+
+    def _disk_set(self, key, entry):
+        path = self._path(key)
+        header = json.dumps({"status": entry.status, "content_type": entry.content_type, "created": time.time()})
+        try:
+            # An entry written again (expired, or by two requests at once) replaces the old file's bytes
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file and rename, so concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header.encode('utf-8') + b'\n')
+                f.write(entry.body)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = self._scan_disk_size()
+            else:
+                self._disk_size += len(header) + 1 + len(entry.body) - replaced
+            over_cap = self._disk_size > self.disk_bytes
+        if over_cap:
+            self._evict_disk()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat
+
+    def _scan_disk_size(self):
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def _evict_disk(self):
+        # Drop expired entries, then the least recently used ones until back under 90% of the cap
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _, stat in entries)
+        target = self.disk_bytes * 0.9
+        for path, stat in entries:
+            if total <= target and stat.st_mtime + self.disk_ttl >= now:
+                continue
+            self._remove(path)
+            total -= stat.st_size
+        with self._lock:
+            self._disk_size = total
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Returns the process-wide ResponseCache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
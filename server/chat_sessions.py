@@ -0,0 +1,156 @@
+import hashlib
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from context import estimate_tokens
+
+# --- Chat Session Configuration ---
+# Sessions idle for longer than this are forgotten; the least recently used go first beyond the limit
+CHAT_SESSION_TTL = int(os.getenv('AIME_CHAT_SESSION_TTL', '3600'))
+CHAT_MAX_SESSIONS = int(os.getenv('AIME_CHAT_MAX_SESSIONS', '1000'))
+# Once the turns kept verbatim exceed this many tokens, the oldest are rolled into the session summary...
+CHAT_HISTORY_TOKENS = int(os.getenv('AIME_CHAT_HISTORY_TOKENS', '4000'))
+# ... until what is left fits in this many
+CHAT_KEEP_TOKENS = int(os.getenv('AIME_CHAT_KEEP_TOKENS', '1500'))
+
+SESSION_ID = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+class SessionError(ValueError):
+    """Raised for a malformed session id."""
+
+
+class UnknownSession(SessionError):
+    """Raised for a session id the store does not have (never opened, expired or evicted, or another key's)."""
+
+
+class ChatSession:
+    """
+    One conversation with the chat widget: the turns kept verbatim, as (role, text) with role "user" or
+    "model", and a running summary of the turns rolled out of them.
+    """
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.summary = ''
+        self.turns = []
+        self.touched = time.time()
+        self._lock = threading.Lock()
+
+    def history_tokens(self):
+        with self._lock:
+            return sum(estimate_tokens(text) for _, text in self.turns)
+
+    def snapshot(self):
+        """The summary and turns to build the next prompt from."""
+        with self._lock:
+            return self.summary, list(self.turns)
+
+    def record(self, message, reply):
+        with self._lock:
+            self.turns += [('user', message), ('model', reply)]
+            self.touched = time.time()
+
+    def due_for_compaction(self, threshold=None, keep=None):
+        """
+        The oldest turns to roll into the summary (whole exchanges, never the latest one), or [] while the
+        history is under `threshold` tokens (default CHAT_HISTORY_TOKENS, then down to CHAT_KEEP_TOKENS).
+        """
+        threshold = CHAT_HISTORY_TOKENS if threshold is None else threshold
+        keep = CHAT_KEEP_TOKENS if keep is None else keep
+        with self._lock:
+            sizes = [estimate_tokens(text) for _, text in self.turns]
+            if sum(sizes) <= threshold:
+                return []
+            count, remaining = 0, sum(sizes)
+            while count < len(self.turns) - 2 and remaining > keep:
+                remaining -= sizes[count] + sizes[count + 1]
+                count += 2
+            return self.turns[:count]
+
+    def compact(self, folded, summary):
+        """Replaces the `folded` turns (as returned by due_for_compaction) with the new running summary."""
+        with self._lock:
+            if self.turns[:len(folded)] == folded:
+                self.turns = self.turns[len(folded):]
+                self.summary = summary
+
+
+class ChatSessionStore:
+    """
+    In-memory chat sessions. Sessions belong to the API key that opened them, and ids are only ever issued
+    by the store: an id it does not know under the caller's key, including another key's, is UnknownSession.
+    """
+
+    def __init__(self, ttl=CHAT_SESSION_TTL, max_sessions=CHAT_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # (owner, id) -> ChatSession
+        self.opened = 0
+        self.expired = 0
+        self.compactions = 0
+        self.compaction_failures = 0
+
+    @staticmethod
+    def owner(api_key):
+        return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+
+    def open(self, session_id, api_key):
+        """
+        The session for `session_id`; a session id of True (or '') starts a new session under a fresh id.
+        Raises UnknownSession when the session is not (or no longer) in the store.
+        """
+        start = session_id is True or session_id == ''
+        if start:
+            session_id = secrets.token_urlsafe(18)
+        if not isinstance(session_id, str) or not SESSION_ID.match(session_id):
+            raise SessionError("session must be true or a session id of 16 to 64 letters, digits, '-' or '_'.")
+        key = (self.owner(api_key), session_id)
+        now = time.time()
+        with self._lock:
+            while self._sessions:
+                oldest_key, oldest = next(iter(self._sessions.items()))
+                if now - oldest.touched <= self.ttl and len(self._sessions) <= self.max_sessions:
+                    break
+                del self._sessions[oldest_key]
+                self.expired += 1
+            session = self._sessions.get(key)
+            if session is None:
+                if not start:
+                    raise UnknownSession(f"Unknown or expired chat session: {session_id}.")
+                session = self._sessions[key] = ChatSession(session_id)
+                self.opened += 1
+            self._sessions.move_to_end(key)
+            session.touched = now
+            return session
+
+    def compacted(self, succeeded):
+        with self._lock:
+            if succeeded:
+                self.compactions += 1
+            else:
+                self.compaction_failures += 1
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "opened": self.opened, "expired": self.expired,
+                    "compactions": self.compactions, "compactionFailures": self.compaction_failures}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Returns the process-wide ChatSessionStore."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ChatSessionStore()
+    return _store
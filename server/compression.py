@@ -0,0 +1,91 @@
+import os
+import zlib
+
+# Brotli is optional: install the `brotli` package to offer `br` to browsers that accept it.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies known to be smaller than this are not worth the compression overhead
+MIN_SIZE = int(os.getenv('AIME_COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('AIME_GZIP_LEVEL', '6'))
+# Brotli quality 4-5 is the usual sweet spot for on-the-fly compression
+BROTLI_QUALITY = int(os.getenv('AIME_BROTLI_QUALITY', '4'))
+
+
+def parse_accept_encoding(header):
+    """Returns the set of content codings the client accepts (q=0 entries excluded)."""
+    accepted = set()
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+def choose_encoding(accept_encoding_header, size=None):
+    """Picks the best coding we can produce for this client, or None to send the body as is."""
+    if size is not None and size < MIN_SIZE:
+        return None
+    accepted = parse_accept_encoding(accept_encoding_header)
+    if brotli is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+class StreamCompressor:
+    """Incremental compressor for one response body; feed chunks to compress() and end with finish()."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == 'gzip':
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self._brotli.process(chunk)
+        return self._zlib.compress(chunk)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Compresses an iterable of byte chunks incrementally, so the whole body is never held at once."""
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def compress_async_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_bytes(data, encoding):
+    return b''.join(compress_stream([data], encoding))
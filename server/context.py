@@ -0,0 +1,101 @@
+import math
+import os
+
+from ratelimit import CHARS_PER_TOKEN
+
+# --- Context Packing Configuration ---
+# Token budget for the reference lore of one element prompt (0 disables packing); requests may ask for less
+CONTEXT_TOKEN_BUDGET = int(os.getenv('AIME_CONTEXT_TOKEN_BUDGET', '32000'))
+# An asset is cut down only if at least this much of it fits; smaller remainders are dropped instead
+MIN_TRUNCATED_TOKENS = int(os.getenv('AIME_CONTEXT_MIN_TRUNCATED_TOKENS', '200'))
+
+# Asset importance levels the pages offer, most important first. Packing follows this order, retrieval
+# always keeps PINNED_IMPORTANCE assets and prompts leave SKIPPED_IMPORTANCE assets out.
+IMPORTANCE_LEVELS = ('High', 'Typical', 'Low', 'Non-Informative')
+DEFAULT_IMPORTANCE = 'Typical'
+PINNED_IMPORTANCE = ('High',)
+SKIPPED_IMPORTANCE = 'Non-Informative'
+IMPORTANCE_RANK = {level: rank for rank, level in enumerate(IMPORTANCE_LEVELS)}
+
+TRUNCATION_MARKER = "[... truncated to fit the context budget ...]\n"
+
+
+def estimate_tokens(text):
+    """A local token estimate, using the same characters-per-token ratio as the rate limiter."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def priority(asset):
+    # Importance first; a Director's Note marks an asset the user cares about within its level
+    return IMPORTANCE_RANK.get(asset.get('importance'), IMPORTANCE_RANK[DEFAULT_IMPORTANCE]), 0 if asset.get('annotation') else 1
+
+
+def truncate_entry(entry, tokens):
+    """Cuts a rendered asset entry to about `tokens`, at a line or word boundary, and marks it as truncated."""
+    limit = max(0, tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER) - 1)
+    cut = entry[:limit]
+    # Prefer ending on a whole line, unless that would throw away most of what fits
+    boundary = cut.rfind('\n') + 1
+    if boundary < limit * 0.8:
+        boundary = cut.rfind(' ') + 1 or limit
+    cut = cut[:boundary]
+    return cut + ('' if cut.endswith('\n') else '\n') + TRUNCATION_MARKER
+
+
+def pack_entries(entries, budget):
+    """
+    Packs rendered asset entries into `budget` tokens. `entries` is a list of (index, asset, text); they are
+    taken in priority order, whole while they fit, then cut down, then left out. Returns the packed texts in
+    priority order and a report: {budget, tokens, assets: [{index, fileName, importance, tokens, keptTokens,
+    status}]} with status "included", "truncated" or "dropped".
+    """
+    ordered = sorted(entries, key=lambda entry: priority(entry[1]))
+    packed, report, remaining = [], [], budget
+    for index, asset, text in ordered:
+        tokens = estimate_tokens(text)
+        if not budget or tokens <= remaining:
+            kept, status = text, 'included'
+        elif remaining >= MIN_TRUNCATED_TOKENS:
+            kept, status = truncate_entry(text, remaining), 'truncated'
+        else:
+            kept, status = '', 'dropped'
+        kept_tokens = estimate_tokens(kept)
+        remaining -= kept_tokens
+        if kept:
+            packed.append(kept)
+        report.append({
+            "index": index,
+            "fileName": asset.get('fileName'),
+            "importance": asset.get('importance'),
+            "tokens": tokens,
+            "keptTokens": kept_tokens,
+            "status": status,
+        })
+    return packed, {"budget": budget, "tokens": sum(asset["keptTokens"] for asset in report), "assets": report}
+
+
+def context_budget(requested):
+    """The budget for one request: the configured one, or less if the request asks for less."""
+    if requested in (None, ''):
+        return CONTEXT_TOKEN_BUDGET
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        raise ValueError("contextBudget must be a number of tokens.")
+    if requested <= 0:
+        raise ValueError("contextBudget must be positive.")
+    return min(requested, CONTEXT_TOKEN_BUDGET) if CONTEXT_TOKEN_BUDGET else requested
+
+
+def context_summary(report):
+    """
+    Compact form of a packing report for the X-AIME-Context header: indices of the assets cut or left out
+    for the budget, and of those retrieval found irrelevant to the prompt.
+    """
+    return {
+        "budget": report["budget"],
+        "tokens": report["tokens"],
+        "truncated": [asset["index"] for asset in report["assets"] if asset["status"] == 'truncated'],
+        "dropped": [asset["index"] for asset in report["assets"] if asset["status"] == 'dropped'],
+        "unmatched": [asset["index"] for asset in report["assets"] if asset["status"] == 'unmatched'],
+    }
@@ -0,0 +1,215 @@
+import hashlib
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import ai_service
+from context import estimate_tokens
+from resilience import CONNECT_TIMEOUT
+from upstream import get_client
+
+# --- Context Cache Configuration ---
+# "upstream" registers repeated lore with the cachedContents API, "local" uses the in-process stand-in
+# (offline development), "off" always sends full prompts
+CONTEXT_CACHE_MODE = os.getenv('AIME_CONTEXT_CACHE', 'upstream').lower()
+# Lore shorter than this is cheaper to resend than to cache (the API also has a minimum per model)
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv('AIME_CONTEXT_CACHE_MIN_TOKENS', '4096'))
+# Lore is registered the n-th time it is seen, so one-off prompts never pay for a cache entry
+CONTEXT_CACHE_MIN_USES = int(os.getenv('AIME_CONTEXT_CACHE_MIN_USES', '2'))
+# Lifetime of an upstream entry; entries in use are extended when less than the margin is left
+CONTEXT_CACHE_TTL = int(os.getenv('AIME_CONTEXT_CACHE_TTL', '900'))
+CONTEXT_CACHE_REFRESH_MARGIN = int(os.getenv('AIME_CONTEXT_CACHE_REFRESH_MARGIN', '120'))
+CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv('AIME_CONTEXT_CACHE_MAX_ENTRIES', '256'))
+CONTEXT_CACHE_TIMEOUT = float(os.getenv('AIME_CONTEXT_CACHE_TIMEOUT', '30'))
+
+
+def _lore_contents(text):
+    return [{"role": "user", "parts": [{"text": text}]}]
+
+
+class UpstreamContextBackend:
+    """cachedContents on the Generative Language API. Entries belong to the API key that created them."""
+
+    def create(self, api_key, model, text, ttl):
+        """Registers `text` for `model` and returns (name, expires_at)."""
+        response = get_client().post(
+            ai_service.cached_contents_target(), params={'key': api_key},
+            json={"model": f"models/{model}", "contents": _lore_contents(text), "ttl": f"{ttl}s"},
+            timeout=(CONNECT_TIMEOUT, CONTEXT_CACHE_TIMEOUT))
+        response.raise_for_status()
+        return response.json()['name'], time.time() + ttl
+
+    def extend(self, api_key, name, ttl):
+        """Gives an entry a fresh `ttl` and returns its new expiry."""
+        response = get_client().request(
+            'PATCH', ai_service.cached_contents_target(name), params={'key': api_key, 'updateMask': 'ttl'},
+            json={"ttl": f"{ttl}s"}, timeout=(CONNECT_TIMEOUT, CONTEXT_CACHE_TIMEOUT))
+        response.raise_for_status()
+        return time.time() + ttl
+
+
+class LocalContextBackend:
+    """
+    An in-process stand-in for cachedContents, for tests and offline development: names are handed out
+    locally and the registered text is kept in `entries` so it can be inspected.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create(self, api_key, model, text, ttl):
+        with self._lock:
+            name = f"cachedContents/local-{next(self._ids)}"
+            self.entries[name] = {"model": model, "text": text, "expires_at": time.time() + ttl}
+            return name, self.entries[name]["expires_at"]
+
+    def extend(self, api_key, name, ttl):
+        with self._lock:
+            if name not in self.entries:
+                raise KeyError(name)
+            self.entries[name]["expires_at"] = time.time() + ttl
+            return self.entries[name]["expires_at"]
+
+
+class ContextCache:
+    """
+    Keeps the lore that repeats across generations (reference assets and guidance gems) in the upstream
+    context cache. Once the same lore has been sent `min_uses` times for a key and model it is registered
+    there, and later bodies reference it with "cachedContent" and carry only their instructions. Entries
+    are extended while in use and forgotten when they expire or the upstream no longer has them.
+    """
+
+    def __init__(self, backend=None, min_tokens=CONTEXT_CACHE_MIN_TOKENS, min_uses=CONTEXT_CACHE_MIN_USES,
+                 ttl=CONTEXT_CACHE_TTL, refresh_margin=CONTEXT_CACHE_REFRESH_MARGIN, max_entries=CONTEXT_CACHE_MAX_ENTRIES):
+        if backend is None and CONTEXT_CACHE_MODE != 'off':
+            backend = LocalContextBackend() if CONTEXT_CACHE_MODE == 'local' else UpstreamContextBackend()
+        self.backend = backend
+        self.min_tokens = min_tokens
+        self.min_uses = min_uses
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> [name, expires_at]
+        self._uses = OrderedDict()     # key -> times seen without an entry
+        self._creating = set()
+        self.hits = 0
+        self.created = 0
+        self.extended = 0
+        self.invalidated = 0
+        self.failures = 0
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    @staticmethod
+    def key(api_key, model, lore):
+        return hashlib.sha256(f"{api_key}\0{model}\0{lore}".encode('utf-8')).hexdigest()
+
+    def prepare(self, api_key, model, body, lore, instructions):
+        """
+        Returns the body to send for a generation whose prompt is `lore` plus `instructions`: `body`
+        itself, or a copy that references the cached lore instead of repeating it.
+        """
+        if not self.enabled or not lore or estimate_tokens(lore) < self.min_tokens:
+            return body
+        key = self.key(api_key, model, lore)
+        name = self._lookup(api_key, key) or self._register(api_key, model, key, lore)
+        if name is None:
+            return body
+        cached = {field: value for field, value in body.items() if field != 'contents'}
+        cached["cachedContent"] = name
+        cached["contents"] = ai_service.build_chat_payload(instructions)["contents"]
+        return cached
+
+    def _lookup(self, api_key, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            name, expires_at = entry
+        if expires_at - time.time() < self.refresh_margin:
+            try:
+                expires_at = self.backend.extend(api_key, name, self.ttl)
+            except Exception:
+                # Too close to expiry to rely on: send the full prompt and register the lore again later
+                self._forget(key, count='failures')
+                return None
+            with self._lock:
+                entry[1] = expires_at
+                self.extended += 1
+        with self._lock:
+            self.hits += 1
+        return name
+
+    def _register(self, api_key, model, key, lore):
+        with self._lock:
+            uses = self._uses.pop(key, 0) + 1
+            if uses < self.min_uses or key in self._creating:
+                self._uses[key] = uses
+                while len(self._uses) > self.max_entries * 4:
+                    self._uses.popitem(last=False)
+                return None
+            self._creating.add(key)
+        try:
+            name, expires_at = self.backend.create(api_key, model, lore, self.ttl)
+        except Exception:
+            # Model without caching support, quota, network: this generation goes out uncached
+            with self._lock:
+                self.failures += 1
+            return None
+        finally:
+            with self._lock:
+                self._creating.discard(key)
+        with self._lock:
+            self._entries[key] = [name, expires_at]
+            self.created += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return name
+
+    def _forget(self, key, count='invalidated'):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                setattr(self, count, getattr(self, count) + 1)
+
+    def invalidate(self, api_key, model, lore):
+        """Forgets the entry for `lore`, e.g. after the upstream rejected it as unknown or expired."""
+        self._forget(self.key(api_key, model, lore))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "created": self.created,
+                "extended": self.extended,
+                "invalidated": self.invalidated,
+                "failures": self.failures,
+            }
+
+
+def lost_cached_content(status, message):
+    """Whether an upstream error says a referenced cachedContent is gone (expired early, deleted, other key)."""
+    return status in (400, 403, 404) and 'cache' in str(message).lower()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_context_cache():
+    """Returns the process-wide ContextCache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ContextCache()
+    return _cache
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from datetime import timezone
+
+import google.auth
+import google.auth.transport.requests
+
+from ai_service import IMAGE_SCOPES
+
+# Refresh this many seconds before the cached access token expires
+REFRESH_MARGIN = float(os.getenv('AIME_TOKEN_REFRESH_MARGIN', '300'))
+# Wait before retrying a failed background refresh
+REFRESH_RETRY = float(os.getenv('AIME_TOKEN_REFRESH_RETRY', '30'))
+# Set to use a fixed token instead of Application Default Credentials (local development and tests)
+FAKE_ACCESS_TOKEN = os.getenv('AIME_FAKE_ACCESS_TOKEN')
+# Assumed lifetime of tokens whose credentials report no expiry
+DEFAULT_TOKEN_LIFETIME = 3600
+
+
+class GoogleADCTokenSource:
+    """Loads Application Default Credentials once and refreshes them on demand."""
+
+    def __init__(self, scopes=IMAGE_SCOPES):
+        self.scopes = scopes
+        self._credentials = None
+        self._project_id = None
+
+    def fetch(self):
+        """Returns (access_token, expires_at_epoch, project_id)."""
+        if self._credentials is None:
+            self._credentials, self._project_id = google.auth.default(scopes=self.scopes)
+        self._credentials.refresh(google.auth.transport.requests.Request())
+        expiry = self._credentials.expiry
+        # google-auth reports expiry as a naive UTC datetime
+        expires_at = expiry.replace(tzinfo=timezone.utc).timestamp() if expiry else time.time() + DEFAULT_TOKEN_LIFETIME
+        return self._credentials.token, expires_at, self._project_id
+
+
+class StaticTokenSource:
+    """A local stand-in token source: hands out a fixed token with a fixed lifetime and counts fetches."""
+
+    def __init__(self, token='fake-access-token', lifetime=DEFAULT_TOKEN_LIFETIME, project_id=None):
+        self.token = token
+        self.lifetime = lifetime
+        self.project_id = project_id
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return self.token, time.time() + self.lifetime, self.project_id
+
+
+class CredentialManager:
+    """
+    Process-wide access token cache. The token is fetched once, reused until shortly before it
+    expires and refreshed by a background thread, so requests only wait on auth when no valid token
+    exists at all (the very first request, or after refreshes kept failing until expiry).
+    """
+
+    def __init__(self, source=None, refresh_margin=REFRESH_MARGIN, refresh_retry=REFRESH_RETRY, background=True):
+        self.source = source or (StaticTokenSource(FAKE_ACCESS_TOKEN) if FAKE_ACCESS_TOKEN else GoogleADCTokenSource())
+        self.refresh_margin = refresh_margin
+        self.refresh_retry = refresh_retry
+        self.background = background
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._token = None
+        self._expires_at = 0.0
+        self._project_id = None
+        self._thread = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def cached_token(self):
+        """Returns (token, project_id) when a usable token is cached, otherwise None. Never blocks on I/O."""
+        if self._token is not None and time.time() < self._expires_at:
+            if time.time() >= self._expires_at - self.refresh_margin:
+                self._wake.set()
+            return self._token, self._project_id
+        return None
+
+    def get_token(self):
+        """Returns (token, project_id), fetching synchronously only when nothing usable is cached."""
+        cached = self.cached_token()
+        if cached is not None:
+            return cached
+        with self._lock:
+            # Another request may have fetched while this one waited for the lock
+            cached = self.cached_token()
+            if cached is None:
+                self._refresh()
+                cached = self._token, self._project_id
+        self._ensure_refresher()
+        return cached
+
+    def _refresh(self):
+        token, expires_at, project_id = self.source.fetch()
+        self._token, self._expires_at, self._project_id = token, expires_at, project_id
+        self.refreshes += 1
+
+    def _ensure_refresher(self):
+        if not self.background or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._refresh_loop, name='aime-token-refresh', daemon=True)
+                self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            delay = max(0.0, self._expires_at - self.refresh_margin - time.time())
+            self._wake.wait(timeout=delay)
+            self._wake.clear()
+            if time.time() < self._expires_at - self.refresh_margin:
+                continue
+            try:
+                with self._lock:
+                    self._refresh()
+            except Exception:
+                # Keep serving the current token while it is valid and try again shortly
+                self.refresh_failures += 1
+                self._wake.wait(timeout=self.refresh_retry)
+
+    def stats(self):
+        return {
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "expires_in": max(0, round(self._expires_at - time.time())) if self._token else None,
+        }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_credential_manager():
+    """Returns the process-wide CredentialManager, created on first use (i.e. after any fork)."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = CredentialManager()
+    return _manager
@@ -0,0 +1,648 @@
+# Trait fields of every element form, in form order: (input id, label shown above the input).
+# prompts.py compiles these into the per-element super-prompt templates; the labels must match the
+# <label> text in pages/*.html, because that is what the browser used to put into the prompt.
+
+# Element pages (element-bundle.js). Custom notes have their own prompt section and are not listed.
+ELEMENT_FIELDS = {
+    'UNIVERSE': (
+        ('universe-name', 'Universe Name / Designation'),
+        ('high-concept', 'High Concept'),
+        ('ontological-premise', 'Ontological Premise'),
+        ('the-source', 'The Source / The All'),
+        ('laws-physics', 'Laws of Physics'),
+        ('laws-metaphysics', 'Laws of Metaphysics'),
+        ('nature-of-magic', 'The Nature of Magic / Exotic Forces'),
+        ('nature-of-time', 'The Nature of Time'),
+        ('nature-of-space', 'The Nature of Space'),
+        ('cosmological-model', 'Cosmological Model'),
+        ('major-planes', 'Major Planes / Dimensions / Realms'),
+        ('fabric-of-reality', 'The Fabric of Reality'),
+        ('cosmic-geography', 'Cosmic Geography'),
+        ('cosmogony-beginning', 'Cosmogony (The Beginning)'),
+        ('timeline-of-ages', 'Timeline of Cosmic Ages'),
+        ('eschatology-end', 'Eschatology (The End)'),
+        ('universal-prophecies', 'Universal Prophecies'),
+        ('cosmic-entities', 'Cosmic Entities'),
+        ('divine-order', 'The Divine Order'),
+        ('progenitor-races', 'Progenitor / First Races'),
+        ('universal-hierarchy', 'Universal Hierarchy'),
+        ('methods-of-travel', 'Methods of Travel'),
+        ('barriers-boundaries', 'Barriers & Boundaries'),
+        ('laws-of-transit', 'Laws of Transit'),
+        ('nexus-points', 'Points of Convergence / Nexus Points'),
+        ('central-question', 'Central Question'),
+        ('overall-tone', 'Overall Tone'),
+        ('narrative-potential', 'Narrative Potential'),
+    ),
+    'WORLD': (
+        ('world-name', 'World Name'),
+        ('world-premise', 'Core Premise / High Concept'),
+        ('world-cosmology', 'Cosmology'),
+        ('world-physics', 'Laws of Physics'),
+        ('magic-source', 'The Magic System: Source of Power'),
+        ('magic-rules', 'The Magic System: Rules & Limitations'),
+        ('magic-impact', 'The Magic System: Societal Impact'),
+        ('physical-stars', 'Star System'),
+        ('physical-stats', 'Planetary Statistics'),
+        ('physical-moons', 'Moons'),
+        ('physical-geography', 'Global Geography'),
+        ('physical-weather', 'Global Weather & Tectonics'),
+        ('history-creation', 'Creation Myth / Origin Story'),
+        ('history-ages', 'Timeline of Major Ages'),
+        ('history-events', 'World-Altering Events'),
+        ('history-empires', 'Fallen Empires & Precursor Races'),
+        ('history-prophecies', 'Major Prophecies & Future Lore'),
+        ('life-origin', 'Origin of Life'),
+        ('life-species', 'Major Sentient Species'),
+        ('life-factions', 'Dominant Factions & Empires'),
+        ('life-demographics', 'Global Demographics'),
+        ('life-monsters', 'Monsters & Non-Sentient Beings'),
+        ('systems-tech', 'Technology Level'),
+        ('systems-economy', 'Global Economy'),
+        ('systems-languages', 'Languages'),
+        ('systems-calendar', 'Calendar & Timekeeping'),
+        ('systems-relations', 'Interspecies / Intercultural Relations'),
+        ('meta-gods', 'Gods & Pantheons'),
+        ('meta-afterlife', 'The Afterlife'),
+        ('meta-planes', 'Other Planes of Existence'),
+        ('meta-beings', 'Cosmic Beings'),
+        ('themes-central', 'Central Themes'),
+        ('themes-tone', 'Overall Tone'),
+        ('themes-inspirations', 'Aesthetic Inspirations'),
+    ),
+    'SETTING': (
+        ('setting-name', 'Setting Name'),
+        ('setting-scale', 'Scale'),
+        ('setting-genre', 'Genre / Tech Level'),
+        ('setting-concept', 'Core Concept'),
+        ('setting-conflict', 'Primary Conflict / Tension'),
+        ('geography-cosmology', 'Cosmology & Astronomy'),
+        ('geography-climate', 'Climate & Weather Patterns'),
+        ('geography-topography', 'Topography & Terrain'),
+        ('geography-water', 'Bodies of Water'),
+        ('geography-resources', 'Natural Resources'),
+        ('geography-hazards', 'Natural Hazards'),
+        ('flora-ecosystems', 'Dominant Ecosystems'),
+        ('flora-plants', 'Key Flora (Plants)'),
+        ('flora-animals', 'Key Fauna (Animals)'),
+        ('flora-interaction', 'Human/Inhabitant Interaction'),
+        ('history-origin', 'Origin / Creation Myth'),
+        ('history-timeline', 'Timeline of Major Eras'),
+        ('history-ruins', 'Ancient Civilizations & Ruins'),
+        ('history-wars', 'Major Wars & Cataclysms'),
+        ('history-myths', 'Myths, Legends & Folklore'),
+        ('culture-demographics', 'Demographics'),
+        ('culture-government', 'Government & Politics'),
+        ('culture-economy', 'Economy & Trade'),
+        ('culture-social', 'Social Structure'),
+        ('culture-language', 'Language(s)'),
+        ('culture-religion', 'Religion(s) & Philosophies'),
+        ('culture-tech', 'Technology & Magic'),
+        ('culture-art', 'Art & Architecture'),
+        ('locations-cities', 'Major Cities & Settlements'),
+        ('locations-manmade', 'Significant Man-Made Landmarks'),
+        ('locations-natural', 'Significant Natural Landmarks'),
+        ('locations-hidden', 'Hidden or Dangerous Locations'),
+        ('atmosphere-sights', 'Dominant Sights (Color Palette)'),
+        ('atmosphere-sounds', 'Pervasive Sounds'),
+        ('atmosphere-smells', 'Common Smells'),
+        ('atmosphere-mood', 'Overall Mood / Vibe'),
+    ),
+    'SCENE': (
+        ('scene-title', 'Scene Title / Working Name'),
+        ('scene-placement', 'Placement in Story'),
+        ('scene-summary', 'One-Sentence Summary'),
+        ('scene-purpose', 'Scene Goal / Purpose'),
+        ('scene-beginning-state', 'Beginning State'),
+        ('scene-ending-state', 'Ending State'),
+        ('setting-location', 'Location'),
+        ('setting-time', 'Time of Day / Date'),
+        ('setting-weather', 'Weather / Environment'),
+        ('setting-atmosphere', 'Atmosphere & Mood'),
+        ('setting-props', 'Key Props & Objects'),
+        ('characters-pov', 'Point of View (POV) Character'),
+        ('characters-present', 'Characters Present'),
+        ('characters-pov-goal', "POV Character's Goal"),
+        ('characters-opposing-goal', "Opposing Character's Goal"),
+        ('characters-emotional-arc', 'Emotional Arc'),
+        ('plot-opening-beat', 'Opening Beat'),
+        ('plot-sequence', 'Sequence of Events'),
+        ('plot-inciting-incident', 'Inciting Incident'),
+        ('plot-rising-action', 'Rising Action'),
+        ('plot-climax', 'Climax/Turning Point'),
+        ('plot-resolution', 'Resolution / Aftermath'),
+        ('plot-pacing', 'Pacing'),
+        ('plot-conflict-type', 'Conflict Type'),
+        ('sensory-visuals', 'Visuals'),
+        ('sensory-sounds', 'Sounds'),
+        ('sensory-smells', 'Smells & Tastes'),
+        ('sensory-tactile', 'Tactile Sensations'),
+        ('sensory-symbolism', 'Dominant Imagery / Symbolism'),
+        ('dialogue-key-lines', 'Key Lines of Dialogue'),
+        ('dialogue-subtext', 'Subtext'),
+        ('dialogue-tone', 'Tone of Dialogue'),
+        ('checklist-advances-plot', 'Does this scene advance the plot?'),
+        ('checklist-reveals-character', 'Does this scene reveal new information about a character?'),
+        ('checklist-has-conflict', 'Does this scene contain meaningful conflict?'),
+        ('checklist-has-hook', 'Does the scene end with a hook or question?'),
+        ('checklist-clear-pov', 'Is the POV clear and consistent throughout?'),
+    ),
+    'PERSONA': (
+        ('persona-portrait', 'Character Portrait'),
+        ('persona-name', 'Name'),
+        ('persona-role', 'Role in Story'),
+        ('persona-archetype', 'Character Archetype'),
+        ('persona-summary', 'One-Sentence Summary'),
+        ('persona-motivation', 'Core Motivation'),
+        ('persona-goal', 'Primary Conflict/Goal'),
+        ('profile-fullname', 'Full Name'),
+        ('profile-aliases', 'Nicknames / Aliases'),
+        ('profile-age', 'Age & Date of Birth'),
+        ('profile-gender', 'Gender & Pronouns'),
+        ('profile-occupation', 'Occupation / Profession'),
+        ('profile-status', 'Social Class & Status'),
+        ('profile-residence', 'Current Residence'),
+        ('profile-origin', 'Place of Origin'),
+        ('profile-description', 'Physical Description'),
+        ('profile-voice', 'Voice & Speech'),
+        ('profile-style', 'Typical Clothing Style'),
+        ('profile-mannerisms', 'Mannerisms & Body Language'),
+        ('profile-positive-traits', 'Positive Traits'),
+        ('profile-negative-traits', 'Negative Traits / Flaws'),
+        ('profile-likes', 'Likes'),
+        ('profile-dislikes', 'Dislikes'),
+        ('profile-hobbies', 'Hobbies & Skills'),
+        ('profile-personality-type', 'Personality Type'),
+        ('backstory-summary', 'Detailed Backstory'),
+        ('backstory-trauma', "Defining Trauma / 'Wound'"),
+        ('backstory-accomplishments', 'Greatest Accomplishment(s)'),
+        ('backstory-childhood', 'Childhood'),
+        ('backstory-adolescence', 'Adolescence'),
+        ('backstory-adulthood', 'Adulthood'),
+        ('relationship-name', 'Character Name'),
+        ('relationship-type', 'Relationship Type'),
+        ('relationship-dynamic', 'Relationship Dynamic'),
+        ('psychology-worldview', 'Worldview & Philosophy'),
+        ('psychology-morals', 'Moral Compass / Ethics'),
+        ('psychology-lie', 'The Lie They Believe'),
+        ('psychology-truth', 'The Truth They Must Learn'),
+        ('psychology-fear', 'Deepest Fear'),
+        ('psychology-secret', 'Most Guarded Secret'),
+        ('psychology-perception', 'Self-Perception vs. Public-Perception'),
+        ('psychology-external-goal', 'External Goal (The Want)'),
+        ('psychology-internal-goal', 'Internal Goal (The Need)'),
+        ('psychology-arc-summary', 'Character Arc Summary'),
+        ('psychology-stakes', 'What is at stake?'),
+        ('genre-species', 'Race / Species'),
+        ('genre-faction', 'Faction / Allegiance'),
+        ('genre-abilities', 'Powers / Abilities'),
+        ('genre-items', 'Magical Items / Advanced Tech'),
+        ('genre-homeworld', 'Homeworld / Realm'),
+        ('genre-connection', 'Connection to the Central Plot'),
+        ('genre-motive', 'Potential Motive'),
+        ('genre-means', 'Means & Opportunity'),
+        ('genre-alibi', 'Alibi'),
+        ('genre-secrets', 'Secrets Related to the Plot'),
+        ('genre-history', 'Romantic History / Baggage'),
+        ('genre-love-view', 'View on Love & Relationships'),
+        ('genre-love-language', 'Love Language'),
+        ('genre-partner-traits', 'Ideal Partner Traits'),
+        ('persona-gallery', 'Inspiration Gallery'),
+    ),
+    'SPECIES': (
+        ('species-name', 'Species Name'),
+        ('species-homeworld', 'Homeworld / Plane of Origin'),
+        ('species-sentience', 'Sentience Level'),
+        ('species-description', 'General Description'),
+        ('species-concept', 'Core Concept / Archetype'),
+        ('biology-appearance', 'General Appearance'),
+        ('biology-composition', 'Physical Composition'),
+        ('biology-skeletal', 'Skeletal Structure'),
+        ('biology-limbs', 'Limbs & Appendages'),
+        ('biology-integument', 'Integument'),
+        ('biology-coloration', 'Coloration & Markings'),
+        ('biology-head', 'Head & Facial Features'),
+        ('biology-diet', 'Diet & Metabolism'),
+        ('biology-senses', 'Senses'),
+        ('biology-reproduction', 'Reproduction'),
+        ('biology-lifecycle', 'Life Cycle & Maturation'),
+        ('biology-sleep', 'Sleep/Rest Patterns'),
+        ('biology-vulnerabilities', 'Vulnerabilities & Resistances'),
+        ('psych-intelligence', 'Intelligence & Problem-Solving'),
+        ('psych-communication', 'Primary Method of Communication'),
+        ('psych-drives', 'Dominant Instincts & Drives'),
+        ('psych-temperament', 'Temperament & Disposition'),
+        ('psych-emotions', 'Emotional Range'),
+        ('psych-memory', 'Memory & Learning'),
+        ('psych-self-concept', 'Concept of Self'),
+        ('culture-structure', 'Social Structure'),
+        ('culture-government', 'Government & Politics'),
+        ('culture-laws', 'Laws & Ethics'),
+        ('culture-hierarchy', 'Social Hierarchy'),
+        ('culture-gender-roles', 'Gender Roles & Family Structure'),
+        ('culture-language', 'Language(s)'),
+        ('culture-technology', 'Technology Level'),
+        ('culture-arts', 'Arts & Aesthetics'),
+        ('culture-religion', 'Religion, Spirituality, & Mythology'),
+        ('culture-rituals', 'Traditions & Rituals'),
+        ('culture-cuisine', 'Diet & Cuisine'),
+        ('ecology-homeworld-desc', 'Homeworld Description'),
+        ('ecology-niche', 'Habitat/Niche'),
+        ('ecology-relationships', 'Relationship with Other Species'),
+        ('ecology-resources', 'Resource Needs'),
+        ('ecology-architecture', 'Architecture & Habitations'),
+        ('abilities-inherent', 'Inherent Abilities'),
+        ('abilities-strengths', 'Species-Specific Strengths'),
+        ('abilities-weaknesses', 'Species-Specific Weaknesses'),
+        ('abilities-unique', 'Unique Biological Features'),
+        ('species-gallery', 'Inspiration Gallery'),
+    ),
+    'FACTION': (
+        ('faction-name', 'Faction Name'),
+        ('faction-symbol', 'Faction Symbol / Banner'),
+        ('faction-identity', 'Core Identity'),
+        ('faction-goal', 'Primary Goal / Mandate'),
+        ('faction-slogan', 'Public Slogan / Motto'),
+        ('ideology-core', 'Core Ideology'),
+        ('ideology-public-agenda', 'Public Agenda'),
+        ('ideology-hidden-agenda', 'Hidden Agenda'),
+        ('ideology-values', 'Core Values & Ethics'),
+        ('ideology-view-outsiders', 'View on Outsiders'),
+        ('power-government', 'Government Type'),
+        ('power-leadership', 'Leadership Structure'),
+        ('power-succession', 'Succession of Power'),
+        ('power-justice', 'Laws & Justice System'),
+        ('power-membership', 'Membership'),
+        ('assets-influence', 'Scope of Influence'),
+        ('assets-holdings', 'Territory & Holdings'),
+        ('assets-population', 'Population / Membership Size'),
+        ('assets-strength', 'Military Strength'),
+        ('assets-units', 'Key Units / Troop Types'),
+        ('assets-specialties', 'Technological & Tactical Specialties'),
+        ('assets-economic-strength', 'Economic Strength'),
+        ('assets-industries', 'Primary Industries & Resources'),
+        ('assets-tech-level', 'Technological Level'),
+        ('culture-hierarchy', 'Social Hierarchy'),
+        ('culture-traditions', 'Common Culture & Traditions'),
+        ('culture-aesthetics', 'Aesthetics'),
+        ('culture-languages', 'Language(s) & Communication'),
+        ('culture-morale', 'Public Morale & Cohesion'),
+        ('relations-allies', 'Allies'),
+        ('relations-enemies', 'Enemies / Rivals'),
+        ('relations-neutral', 'Neutral Parties'),
+        ('relations-policy', 'General Foreign Policy'),
+        ('relations-reputation', 'Reputation'),
+        ('history-founding', 'Founding Story'),
+        ('history-founders', 'Founders & Historical Figures'),
+        ('history-turning-points', 'Major Turning Points'),
+        ('notes-figures', 'notes-figures'),
+        ('notes-hooks', 'notes-hooks'),
+        ('notes-gallery', 'notes-gallery'),
+    ),
+    'PHILOSOPHY': (
+        ('philosophy-name', 'Philosophy Name'),
+        ('philosophy-core-tenet', 'Core Tenet'),
+        ('philosophy-category', 'Category'),
+        ('philosophy-guiding-question', 'Guiding Question'),
+        ('meta-cosmology', 'Cosmology & Creation'),
+        ('meta-ontology', 'Ontology (Nature of Being)'),
+        ('meta-theology', 'Theology & The Divine'),
+        ('meta-afterlife', 'The Soul & Afterlife'),
+        ('meta-free-will', 'Free Will vs. Determinism'),
+        ('epistemology-source', 'Source of Truth'),
+        ('epistemology-knowledge', 'Definition of Knowledge'),
+        ('epistemology-skepticism', 'Value of Skepticism'),
+        ('epistemology-forbidden', 'Forbidden Knowledge'),
+        ('ethics-compass', 'Moral Compass'),
+        ('ethics-good-evil', 'Definition of Good & Evil'),
+        ('ethics-ideal-life', 'The Ideal Life'),
+        ('ethics-code', 'Code of Conduct'),
+        ('ethics-dilemmas', 'Stance on Key Dilemmas'),
+        ('socio-government', 'Ideal Government'),
+        ('socio-structure', 'Social Structure'),
+        ('socio-individual', 'Role of the Individual'),
+        ('socio-economic', 'Economic Principles'),
+        ('socio-outsiders', 'Attitude Towards Outsiders'),
+        ('aesthetics-art-purpose', 'Purpose of Art'),
+        ('aesthetics-beauty', 'Definition of Beauty'),
+        ('aesthetics-art-forms', 'Valued Art Forms'),
+        ('history-founders', 'Founder(s) & Key Figures'),
+        ('history-texts', 'Foundational Texts'),
+        ('history-rituals', 'Rituals & Practices'),
+        ('history-symbols', 'Symbols & Iconography'),
+        ('history-organization', 'Organization & Hierarchy'),
+        ('history-schisms', 'Factions & Schisms'),
+    ),
+    'TECHNOLOGY': (
+        ('tech-name', 'Technology Name'),
+        ('tech-function', 'Core Function'),
+        ('tech-category', 'Category'),
+        ('tech-readiness', 'Readiness Level'),
+        ('tech-power-source', 'Power Source'),
+        ('tech-principles', 'Operating Principles'),
+        ('tech-components', 'Key Components'),
+        ('tech-interface', 'User Interface'),
+        ('tech-inventor', 'Inventor(s) / Creator(s)'),
+        ('tech-invention-date', 'Date & Place of Invention'),
+        ('tech-dev-history', 'Development History'),
+        ('tech-historical-context', 'Historical Context'),
+        ('tech-physical-desc', 'Physical Description'),
+        ('tech-sensory-details', 'Sensory Details'),
+        ('tech-aesthetic-style', 'Aesthetic Style'),
+        ('tech-resources', 'Required Resources'),
+        ('tech-manufacturing', 'Manufacturing Process'),
+        ('tech-cost', 'Cost & Availability'),
+        ('tech-maintenance', 'Maintenance & Repair'),
+        ('tech-economic-impact', 'Economic Impact'),
+        ('tech-social-impact', 'Social Impact'),
+        ('tech-military-impact', 'Military Impact'),
+        ('tech-legal-impact', 'Legal & Ethical Impact'),
+        ('tech-primary-users', 'Primary User(s)'),
+        ('tech-strengths', 'Strengths & Advantages'),
+        ('tech-weaknesses', 'Weaknesses & Limitations'),
+        ('tech-narrative-role', 'Role in the Story'),
+    ),
+}
+
+# Scenario Guide element pages (sg-bundle.js)
+SCENARIO_FIELDS = {
+    'STORYARC': (
+        ('storyarc-name', 'Name'),
+        ('storyarc-summary', 'Summary'),
+        ('storyarc-goal', 'Goal'),
+        ('storyarc-antagonist', 'Key Antagonist'),
+        ('storyarc-resolution', 'Resolution'),
+        ('storyarc-description', 'Description'),
+        ('storyarc-notes', 'Notes'),
+        ('storyarc-tags', 'Tags'),
+    ),
+    'ADVENTURE': (
+        ('adventure-name', 'Name'),
+        ('adventure-hook', 'Hook'),
+        ('adventure-goal', 'Goal'),
+        ('adventure-stakes', 'Stakes'),
+        ('adventure-resolution', 'Resolution'),
+        ('adventure-description', 'Description'),
+        ('adventure-notes', 'Notes'),
+        ('adventure-tags', 'Tags'),
+    ),
+    'NPC': (
+        ('npc-name', 'Name'),
+        ('npc-role', 'Role'),
+        ('npc-appearance', 'Appearance'),
+        ('npc-motivation', 'Motivation'),
+        ('npc-secrets', 'Secrets'),
+        ('npc-plot-hooks', 'Plot Hooks'),
+        ('npc-stats', 'Stats'),
+        ('npc-description', 'Description'),
+        ('npc-notes', 'Notes'),
+        ('npc-tags', 'Tags'),
+    ),
+    'LOCATION': (
+        ('location-name', 'Name'),
+        ('location-type', 'Type'),
+        ('location-atmosphere', 'Atmosphere'),
+        ('location-sights', 'Key Sights'),
+        ('location-smells', 'Sounds and Smells'),
+        ('location-encounters', 'Potential Encounters'),
+        ('location-secrets', 'Secrets'),
+        ('location-description', 'Description'),
+        ('location-notes', 'Notes'),
+        ('location-tags', 'Tags'),
+    ),
+    'GROUP': (
+        ('group-name', 'Name'),
+        ('group-goals', 'Goals'),
+        ('group-ideology', 'Ideology'),
+        ('group-members', 'Key Members'),
+        ('group-resources', 'Resources'),
+        ('group-description', 'Description'),
+        ('group-notes', 'Notes'),
+        ('group-tags', 'Tags'),
+    ),
+    'ENCOUNTER': (
+        ('encounter-name', 'Name'),
+        ('encounter-type', 'Type'),
+        ('encounter-setup', 'Setup'),
+        ('encounter-resolution', 'Resolution'),
+        ('encounter-mechanic', 'Mechanic'),
+        ('encounter-description', 'Description'),
+        ('encounter-notes', 'Notes'),
+        ('encounter-tags', 'Tags'),
+    ),
+    'ITEM': (
+        ('item-name', 'Name'),
+        ('item-rarity', 'Rarity'),
+        ('item-attunement', 'Attunement'),
+        ('item-properties', 'Properties'),
+        ('item-mechanic', 'Mechanic'),
+        ('item-history', 'History'),
+        ('item-description', 'Description'),
+        ('item-notes', 'Notes'),
+        ('item-tags', 'Tags'),
+    ),
+    'CLUE': (
+        ('clue-name', 'Name'),
+        ('clue-information', 'Information'),
+        ('clue-location', 'Location Found'),
+        ('clue-conclusion', 'Conclusion'),
+        ('clue-description', 'Description'),
+        ('clue-notes', 'Notes'),
+        ('clue-tags', 'Tags'),
+    ),
+    'MAP': (
+        ('map-name', 'Name'),
+        ('map-description', 'Description'),
+    ),
+    'HANDOUT': (
+        ('handout-title', 'Title'),
+        ('handout-content', 'Content'),
+        ('handout-notes', 'Notes'),
+    ),
+}
+
+# The earlier revision of the element forms, used with the "descriptive" template
+# (see tests/usability/generated_prompts)
+DESCRIPTIVE_FIELDS = {
+    'UNIVERSE': (
+        ('universe-name', 'Universe Name'),
+        ('primary-genre', 'Primary Genre'),
+        ('themes-motifs', 'Themes & Motifs'),
+        ('high-concept-pitch', 'High Concept Pitch'),
+        ('inspirations-tone', 'Inspirations & Tone'),
+        ('laws-physics', 'Fundamental Laws of Physics'),
+        ('universal-constants', 'Universal Constants'),
+        ('ftl-travel', 'Faster-Than-Light Travel'),
+        ('exotic-matter', 'Exotic Matter & Energy'),
+        ('soul-consciousness', 'The Soul & Consciousness'),
+        ('time-causality', 'Time & Causality'),
+        ('destiny-prophecy', 'Destiny & Prophecy'),
+        ('power-origin', 'Origin Point'),
+        ('power-access', 'Access Methods'),
+        ('cosmology-scale', 'Scale & Structure'),
+        ('cosmology-planes', 'Extra-planar Realities'),
+        ('cosmology-phenomena', 'Unique Celestial Phenomena'),
+    ),
+    'SETTING': (
+        ('setting-name', 'Setting Name'),
+        ('parent-world', 'Parent World'),
+        ('setting-purpose', 'Function & Purpose'),
+        ('setting-geography', 'Geographical Features & Climate'),
+        ('setting-landmarks', 'Key Landmarks'),
+        ('setting-architecture', 'Architectural Style & Materials'),
+        ('setting-flora-fauna', 'Flora & Fauna'),
+        ('setting-population', 'Population & Demographics'),
+        ('setting-culture', 'Culture & Social Norms'),
+        ('setting-government', 'Government & Leadership'),
+        ('setting-economy', 'Economy & Trade'),
+        ('setting-history', 'History & Lore'),
+        ('setting-atmosphere', 'Sensory Atmosphere'),
+    ),
+    'SCENE': (
+        ('scene-name', 'Scene Name / Slugline'),
+        ('scene-location', 'Location Description'),
+        ('scene-time', 'Time of Day & Duration'),
+        ('scene-mood', 'Mood & Atmosphere'),
+        ('scene-sight', 'Visual Details (Sight)'),
+        ('scene-sound', 'Auditory Details (Sound)'),
+        ('scene-smell', 'Olfactory & Other Senses'),
+        ('scene-characters', 'Key Characters Present'),
+        ('scene-objective', 'Scene Objective / Goal'),
+        ('scene-conflict', 'Core Conflict / Tension'),
+        ('scene-beats', 'Narrative Beats / Pacing'),
+        ('scene-objects', 'Key Objects & Interactivity'),
+    ),
+    'PERSONA': (
+        ('persona-name', 'Name'),
+        ('persona-role', 'Role in Story'),
+        ('persona-archetype', 'Character Archetype'),
+        ('persona-summary', 'One-Sentence Summary'),
+        ('persona-motivation', 'Core Motivation'),
+        ('persona-goal', 'Primary Conflict/Goal'),
+        ('profile-fullname', 'Full Name'),
+        ('profile-aliases', 'Nicknames / Aliases'),
+        ('profile-age', 'Age & Date of Birth'),
+        ('profile-gender', 'Gender & Pronouns'),
+        ('profile-occupation', 'Occupation / Profession'),
+        ('profile-status', 'Social Class & Status'),
+        ('profile-residence', 'Current Residence'),
+        ('profile-origin', 'Place of Origin'),
+        ('profile-description', 'Physical Description'),
+        ('profile-voice', 'Voice & Speech'),
+        ('profile-style', 'Typical Clothing Style'),
+        ('profile-mannerisms', 'Mannerisms & Body Language'),
+        ('profile-positive-traits', 'Positive Traits'),
+        ('profile-negative-traits', 'Negative Traits / Flaws'),
+        ('profile-likes', 'Likes'),
+        ('profile-dislikes', 'Dislikes'),
+        ('profile-hobbies', 'Hobbies & Skills'),
+        ('profile-personality-type', 'Personality Type'),
+        ('backstory-summary', 'Detailed Backstory'),
+        ('backstory-childhood', 'Childhood'),
+        ('backstory-adolescence', 'Adolescence'),
+        ('backstory-adulthood', 'Adulthood'),
+        ('backstory-trauma', "Defining Trauma / 'Wound'"),
+        ('backstory-accomplishments', 'Greatest Accomplishment(s)'),
+        ('backstory-relationships', 'Key Relationships'),
+        ('psychology-worldview', 'Worldview & Philosophy'),
+        ('psychology-morals', 'Moral Compass / Ethics'),
+        ('psychology-lie', 'The Lie They Believe'),
+        ('psychology-truth', 'The Truth They Must Learn'),
+        ('psychology-fear', 'Deepest Fear'),
+        ('psychology-secret', 'Most Guarded Secret'),
+        ('psychology-perception', 'Self-Perception vs. Public-Perception'),
+        ('psychology-external-goal', 'External Goal (The Want)'),
+        ('psychology-internal-goal', 'Internal Goal (The Need)'),
+        ('psychology-arc-summary', 'Character Arc Summary'),
+        ('psychology-stakes', 'What is at stake for them?'),
+        ('genre-species', 'Race / Species'),
+        ('genre-faction', 'Faction / Allegiance'),
+        ('genre-abilities', 'Powers / Abilities'),
+        ('genre-items', 'Magical Items / Advanced Tech'),
+        ('genre-homeworld', 'Homeworld / Realm'),
+        ('genre-connection', 'Connection to the Central Crime'),
+        ('genre-motive', 'Potential Motive'),
+        ('genre-alibi', 'Alibi'),
+        ('genre-secrets', 'Secrets Related to the Plot'),
+        ('genre-history', 'Romantic History / Baggage'),
+        ('genre-love-view', 'View on Love & Relationships'),
+        ('genre-love-language', 'Love Language'),
+        ('genre-partner-traits', 'Ideal Partner Traits'),
+    ),
+    'SPECIES': (
+        ('species-name', 'Species Name'),
+        ('species-classification', 'Classification'),
+        ('species-origin', 'Origin'),
+        ('species-anatomy', 'Physical Anatomy & Appearance'),
+        ('species-biology', 'Biological Systems & Life Cycle'),
+        ('species-senses', 'Sensory Capabilities'),
+        ('species-abilities', 'Abilities & Powers'),
+        ('species-communication', 'Communication Methods'),
+        ('species-vulnerabilities', 'Biological Vulnerabilities'),
+        ('species-behavior', 'Behavior & Social Structure'),
+        ('species-diet', 'Diet & Trophic Level'),
+        ('species-habitat', 'Habitat & Planetary Origin'),
+        ('species-evolution', 'Evolutionary History'),
+        ('species-culture', 'Cultural Traits & Technology Level'),
+        ('species-role', 'Ecological Role'),
+        ('species-relations', 'Inter-species Relations'),
+    ),
+    'FACTION': (
+        ('faction-name', 'Faction Name'),
+        ('faction-type', 'Faction Type'),
+        ('faction-mandate', 'Core Mandate'),
+        ('faction-slogan', 'Motto / Slogan'),
+        ('faction-reputation', 'Public Reputation'),
+        ('faction-ideology', 'Core Ideology'),
+        ('faction-alignment', 'Moral & Ethical Alignment'),
+        ('faction-short-term', 'Short-Term Objectives'),
+        ('faction-long-term', 'Long-Term Ambitions'),
+        ('faction-agenda', 'Public vs. Secret Agenda'),
+        ('faction-leadership', 'Leadership & Key Figures'),
+        ('faction-org-structure', 'Organizational Structure'),
+        ('faction-ranks', 'Membership & Ranks'),
+        ('faction-code', 'Code of Conduct'),
+        ('faction-symbols', 'Symbols & Iconography'),
+        ('faction-territory', 'Territory & Headquarters'),
+        ('faction-assets', 'Assets & Economic Power'),
+        ('faction-military', 'Military & Security Strength'),
+        ('faction-political', 'Political & Social Clout'),
+        ('faction-allies', 'Allies'),
+        ('faction-enemies', 'Enemies & Rivals'),
+        ('faction-gov-relations', 'Relationship with Governing Powers'),
+        ('faction-recruitment', 'Recruitment Methods'),
+    ),
+    'PHILOSOPHY': (
+        ('philosophy-name', 'Name'),
+        ('philosophy-origin', 'Origin & Founder(s)'),
+        ('philosophy-tenets', 'Core Tenets & Beliefs'),
+        ('philosophy-cosmology', 'View on Creation & Cosmology'),
+        ('philosophy-ethics', 'Moral & Ethical Code'),
+        ('philosophy-texts', 'Sacred Texts or Figures'),
+        ('philosophy-rituals', 'Rituals & Practices'),
+        ('philosophy-worship', 'Worship & Prayer'),
+        ('philosophy-places', 'Places of Worship & Significance'),
+        ('philosophy-symbols', 'Symbols & Iconography'),
+        ('philosophy-structure', 'Organizational Structure'),
+        ('philosophy-relations', 'Relationship with Other Philosophies'),
+        ('philosophy-societal-influence', 'Societal Influence'),
+        ('philosophy-political-influence', 'Political Influence'),
+        ('philosophy-adherence', 'Adherence & Conversion'),
+    ),
+    'TECHNOLOGY': (
+        ('tech-name', 'Technology Name'),
+        ('tech-category', 'Category / Type'),
+        ('tech-level', 'Tech Level'),
+        ('tech-purpose', 'Function & Purpose'),
+        ('tech-aesthetics', 'Aesthetics & Design'),
+        ('tech-mechanism', 'Operating Mechanism'),
+        ('tech-power', 'Power Source & Efficiency'),
+        ('tech-materials', 'Materials & Manufacturing'),
+        ('tech-drawbacks', 'Limitations & Drawbacks'),
+        ('tech-vulnerabilities', 'Counter-Measures & Vulnerabilities'),
+        ('tech-social-impact', 'Social & Cultural Impact'),
+        ('tech-eco-impact', 'Economic & Political Impact'),
+        ('tech-history', 'Historical Development'),
+        ('tech-proliferation', 'Adoption & Proliferation'),
+    ),
+}
@@ -0,0 +1,60 @@
+# Production serving of the Flask app (gunicorn is in requirements.txt; Linux/macOS):
+#     gunicorn -c server/gunicorn.conf.py
+# One worker process serves requests on a pool of threads, because a generation is mostly a 5-40 s wait on
+# the upstream. `python server/app.py` remains the development server.
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'wsgi:app'
+bind = os.getenv('AIME_BIND', '127.0.0.1:5001')
+
+# --- Workers ---
+# Chat sessions, rate limits, request coalescing and the upstream context cache are kept in process memory.
+# With several workers a chat session is only known to the worker that opened it, and every worker applies
+# the per-key limits on its own. So the server runs one worker and scales with threads, which means Python
+# code (prompt building, compression, JSON) runs on one CPU core: the server does not use more than one
+# core by default. Run more workers only behind a proxy that pins each API key to one worker, with the
+# AIME_RATE_LIMIT_* values divided by the worker count.
+workers = int(os.getenv('AIME_WORKERS', '1'))
+worker_class = 'gthread'
+# The upstream pool (AIME_UPSTREAM_POOL_SIZE) and the hedging executor are sized from this by default
+threads = int(os.getenv('AIME_THREADS', '16'))
+# Import the app once in the master and fork the workers from it: modules and compiled prompt templates are
+# shared copy-on-write. Upstream clients, caches and background threads are created on first use, i.e. in
+# each worker after the fork, so nothing with sockets or locks is inherited.
+preload_app = True
+
+# --- Recycling ---
+# Off by default: replacing a worker discards the state it holds in memory (open chat sessions, rate-limit
+# buckets, cached lore), so chat clients would be reset every few thousand requests. The in-memory caches
+# are bounded on their own. Set a count to have each worker replaced after that many requests (spread by
+# the jitter so they do not restart together); the old worker finishes its requests first.
+max_requests = int(os.getenv('AIME_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('AIME_MAX_REQUESTS_JITTER', '200'))
+
+# --- Draining ---
+# On SIGTERM, SIGHUP (reload) or recycling, workers stop accepting and get this long to finish in-flight
+# generations. It exceeds the longest route deadline (AIME_DEADLINE_IMAGE, 120 s), so deploys drop nothing.
+graceful_timeout = int(os.getenv('AIME_GRACEFUL_TIMEOUT', '130'))
+# Silence after which the master considers a worker hung; gthread workers report in between requests
+timeout = int(os.getenv('AIME_WORKER_TIMEOUT', '150'))
+keepalive = int(os.getenv('AIME_KEEPALIVE', '5'))
+
+accesslog = os.getenv('AIME_ACCESS_LOG', '-')
+errorlog = '-'
+
+# --- Metrics ---
+# Every worker writes its metrics here and /metrics adds them up (see metrics.py)
+os.environ.setdefault('AIME_METRICS_DIR', os.path.join(chdir, '.cache', 'metrics'))
+
+
+def on_starting(server):
+    # Counts are per run: the files of the previous one are removed before the first worker starts
+    from metrics import clear_directory
+    clear_directory(os.environ['AIME_METRICS_DIR'])
+
+
+def child_exit(server, worker):
+    # Keeps the counters of recycled workers (max_requests) without a file per worker ever started
+    from metrics import process_exited
+    process_exited(worker.pid, os.environ['AIME_METRICS_DIR'])
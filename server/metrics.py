@@ -0,0 +1,353 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+
+# --- Metrics Configuration ---
+# Set by gunicorn.conf.py (or by hand for other multi-process servers): each worker writes its metrics here
+# every AIME_METRICS_FLUSH_INTERVAL seconds and /metrics adds up all of them. Unset, /metrics reports only
+# the process that answers it, which is all there is under the development server.
+METRICS_DIR = os.getenv('AIME_METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('AIME_METRICS_FLUSH_INTERVAL', '5'))
+
+# Seconds. Generations routinely take 5-40 s, images up to the 120 s deadline.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# name -> (type, help, label names)
+DEFINITIONS = {
+    'aime_http_requests_total': (
+        'counter', 'Requests answered, by route, method and status.', ('route', 'method', 'status')),
+    'aime_http_request_duration_seconds': (
+        'histogram', 'Time until the response body was sent (streams included), by route.', ('route',)),
+    'aime_http_requests_in_flight': (
+        'gauge', 'Requests being served, by route.', ('route',)),
+    'aime_upstream_requests_total': (
+        'counter', 'Calls to the AI service, by model and HTTP status ("network" when no response came back).',
+        ('model', 'status')),
+    'aime_upstream_duration_seconds': (
+        'histogram', 'Time until the AI service answered (its headers, for streams), by model.', ('model',)),
+    'aime_upstream_in_flight': (
+        'gauge', 'Calls to the AI service waiting for an answer, by model.', ('model',)),
+    'aime_tokens_total': (
+        'counter', 'Tokens the AI service reported in usageMetadata, by model and kind (prompt, cached, output).',
+        ('model', 'kind')),
+    'aime_component_stat': (
+        'gauge', 'The numbers of /api/stats (caches, pools, rate limiter, ...), by worker process.',
+        ('component', 'stat', 'pid')),
+}
+
+# /api/stats maps with an entry per API key: exported summed over their entries, so the number of series
+# does not grow with the keys seen. component -> stat paths
+SUMMED_STATS = {'ratelimit': ('keys',)}
+
+_MODEL = re.compile(r'/models/([^/:?]+)')
+# usageMetadata fields, found in raw response bytes so bodies are never parsed just for metrics
+USAGE_FIELDS = (
+    ('prompt', re.compile(rb'"promptTokenCount"\s*:\s*(\d+)')),
+    ('cached', re.compile(rb'"cachedContentTokenCount"\s*:\s*(\d+)')),
+    ('output', re.compile(rb'"candidatesTokenCount"\s*:\s*(\d+)')),
+)
+# Bytes of the previous chunk searched again with the next one, so a field split between chunks is found
+USAGE_OVERLAP = 64
+
+
+def model_label(url):
+    """The model an upstream URL addresses ("gemini-1.5-flash"), or "other" (cachedContents, ...)."""
+    match = _MODEL.search(str(url))
+    return match.group(1) if match else 'other'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def flatten_stats(stats, prefix='', summed=()):
+    """
+    (stat, value) for every number in a /api/stats component, nested keys joined with dots. The entries of
+    the maps at the `summed` paths are added up, so "keys.<fingerprint>.active" becomes one "keys.active".
+    """
+    if isinstance(stats, dict) and prefix in summed:
+        totals = {}
+        for entry in stats.values():
+            for stat, value in flatten_stats(entry, prefix):
+                totals[stat] = totals.get(stat, 0.0) + value
+        yield from totals.items()
+    elif isinstance(stats, dict):
+        for key, value in stats.items():
+            yield from flatten_stats(value, f"{prefix}.{key}" if prefix else str(key), summed)
+    elif isinstance(stats, (int, float)) and prefix:
+        yield prefix, float(stats)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms of one process, rendered in the Prometheus text format. With a
+    `directory`, the process also writes them there and the rendering adds up the files of every worker:
+    counters and histograms of workers that have exited are kept, their gauges are dropped.
+    """
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL, stats=None):
+        # `stats` returns the /api/stats numbers to export; by default the function set with register_stats
+        self.directory = directory
+        self.stats = stats
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._values = {}  # (name, label values) -> number, or bucket counts plus the sum for histograms
+        self._stopped = threading.Event()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+            if flush_interval > 0:
+                threading.Thread(target=self._flush_loop, args=(flush_interval,), name='aime-metrics', daemon=True).start()
+
+    # --- Recording ---
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, tuple(str(label) for label in labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, labels, seconds):
+        key = (name, tuple(str(label) for label in labels))
+        with self._lock:
+            buckets = self._values.get(key)
+            if buckets is None:
+                buckets = self._values[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+            position = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+            buckets[position] += 1
+            buckets[-1] += seconds
+
+    def request_started(self, route):
+        self.inc('aime_http_requests_in_flight', (route,))
+        return time.perf_counter()
+
+    def request_finished(self, route, method, status, started):
+        self.inc('aime_http_requests_in_flight', (route,), -1)
+        self.inc('aime_http_requests_total', (route, method, status))
+        self.observe('aime_http_request_duration_seconds', (route,), time.perf_counter() - started)
+
+    def upstream_started(self, url):
+        self.inc('aime_upstream_in_flight', (model_label(url),))
+        return time.perf_counter()
+
+    def upstream_finished(self, url, status, started, body=None):
+        """Records an upstream answer (`status` None: no response); `body` is searched for usageMetadata."""
+        model = model_label(url)
+        self.inc('aime_upstream_in_flight', (model,), -1)
+        self.inc('aime_upstream_requests_total', (model, status or 'network'))
+        self.observe('aime_upstream_duration_seconds', (model,), time.perf_counter() - started)
+        if body:
+            self.record_usage(model, scan_usage(body))
+
+    def record_usage(self, model, usage):
+        for kind, count in usage.items():
+            self.inc('aime_tokens_total', (model, kind), count)
+
+    # --- Aggregation ---
+
+    def snapshot(self, stats=None):
+        with self._lock:
+            values = [[name, list(labels), list(value) if isinstance(value, list) else value]
+                      for (name, labels), value in self._values.items()]
+        rows = []
+        source = stats or self.stats or _stats_source
+        if source is not None:
+            try:
+                components = source()
+            except Exception:
+                # A component failing to report must not stop the request metrics from being written
+                components = {}
+            for component, numbers in components.items():
+                summed = SUMMED_STATS.get(component, ())
+                rows.extend([component, stat, value] for stat, value in flatten_stats(numbers, summed=summed))
+        return {"values": values, "stats": rows}
+
+    def flush(self):
+        """Writes this process's metrics to the directory (atomically, so readers never see half a file)."""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{self.pid}.json")
+        try:
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(f"{path}.tmp", path)
+        except OSError:
+            pass
+
+    def _flush_loop(self, interval):
+        while not self._stopped.wait(interval):
+            self.flush()
+
+    def close(self):
+        self._stopped.set()
+
+    def collect(self, stats=None):
+        """
+        {(name, label values): value} over every process, with /api/stats as aime_component_stat. Those are
+        labelled with the process rather than added up: rates and settings (cache.hit_rate, ratelimit.enabled)
+        mean nothing summed.
+        """
+        own = self.snapshot(stats)
+        snapshots = [(own, str(self.pid), True)]
+        if self.directory:
+            for name in os.listdir(self.directory):
+                stem = name[:-len('.json')] if name.endswith('.json') else None
+                if stem is None or stem == str(self.pid):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                snapshots.append((snapshot, stem, stem.isdigit() and _alive(int(stem))))
+        merged = {}
+        for snapshot, pid, alive in snapshots:
+            for name, labels, value in snapshot.get("values", []):
+                if name not in DEFINITIONS or (not alive and DEFINITIONS[name][0] == 'gauge'):
+                    continue
+                _merge(merged, (name, tuple(labels)), value)
+            if alive:
+                for component, stat, value in snapshot.get("stats", []):
+                    merged[('aime_component_stat', (component, stat, pid))] = value
+        return merged
+
+    def render(self, stats=None):
+        """The metrics of all processes in the Prometheus text exposition format."""
+        merged = self.collect(stats)
+        lines = []
+        for name, (kind, help_text, label_names) in DEFINITIONS.items():
+            series = sorted((labels, value) for (metric, labels), value in merged.items() if metric == name)
+            if not series:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in series:
+                pairs = [f'{label}="{_escape(text)}"' for label, text in zip(label_names, labels)]
+                if kind != 'histogram':
+                    lines.append(f"{name}{{{','.join(pairs)}}} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), value):
+                    cumulative += count
+                    bucket_labels = ','.join(pairs + ['le="%s"' % bound])
+                    lines.append(f"{name}_bucket{{{bucket_labels}}} {_number(cumulative)}")
+                lines.append(f"{name}_sum{{{','.join(pairs)}}} {_number(value[-1])}")
+                lines.append(f"{name}_count{{{','.join(pairs)}}} {_number(cumulative)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(merged, key, value):
+    current = merged.get(key)
+    if current is None:
+        merged[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(value, list):
+        merged[key] = [a + b for a, b in zip(current, value)]
+    else:
+        merged[key] = current + value
+
+
+def scan_usage(data, usage=None):
+    """The usageMetadata token counts in raw response bytes; later (cumulative) counts replace earlier ones."""
+    usage = {} if usage is None else usage
+    for kind, pattern in USAGE_FIELDS:
+        found = pattern.findall(data)
+        if found:
+            usage[kind] = int(found[-1])
+    return usage
+
+
+def metered_stream(url, chunks):
+    """Passes a streamed upstream body (bytes chunks or SSE lines) through, recording its token usage at the end."""
+    usage, tail = {}, b''
+    try:
+        for chunk in chunks:
+            data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            scan_usage(tail + data, usage)
+            tail = data[-USAGE_OVERLAP:]
+            yield chunk
+    finally:
+        get_metrics().record_usage(model_label(url), usage)
+
+
+async def metered_async_stream(url, chunks):
+    """metered_stream for an async iterator (asgi.py)."""
+    usage, tail = {}, b''
+    try:
+        async for chunk in chunks:
+            data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            scan_usage(tail + data, usage)
+            tail = data[-USAGE_OVERLAP:]
+            yield chunk
+    finally:
+        get_metrics().record_usage(model_label(url), usage)
+
+
+def clear_directory(directory=METRICS_DIR):
+    """Removes the files of a previous run (gunicorn.conf.py calls this when the server starts)."""
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith(('.json', '.tmp')):
+                os.remove(os.path.join(directory, name))
+
+
+def process_exited(pid, directory=METRICS_DIR):
+    """
+    Folds the counters and histograms of an exited worker into dead.json and removes its file, so recycled
+    workers neither lose their counts nor leave a file each behind (gunicorn.conf.py calls this).
+    """
+    path = os.path.join(directory, f"{pid}.json") if directory else None
+    if not path or not os.path.exists(path):
+        return
+    merged = {}
+    for name in ('dead.json', f"{pid}.json"):
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                values = json.load(f).get("values", [])
+        except (OSError, ValueError):
+            continue
+        for metric, labels, value in values:
+            if metric in DEFINITIONS and DEFINITIONS[metric][0] != 'gauge':
+                _merge(merged, (metric, tuple(labels)), value)
+    dead = os.path.join(directory, 'dead.json')
+    with open(f"{dead}.tmp", 'w', encoding='utf-8') as f:
+        json.dump({"values": [[metric, list(labels), value] for (metric, labels), value in merged.items()]}, f)
+    os.replace(f"{dead}.tmp", dead)
+    os.remove(path)
+
+
+_stats_source = None
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def register_stats(source):
+    """Sets the function whose /api/stats numbers are exported as aime_component_stat."""
+    global _stats_source
+    _stats_source = source
+
+
+def get_metrics():
+    """Returns the process-wide Metrics, created on first use (i.e. after any fork)."""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,305 @@
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from context import DEFAULT_IMPORTANCE, SKIPPED_IMPORTANCE, pack_entries
+from element_fields import DESCRIPTIVE_FIELDS, ELEMENT_FIELDS, SCENARIO_FIELDS
+
+# --- Prompt Text ---
+# These strings are the super-prompt the element pages used to assemble in the browser (craftSuperPrompt
+# in element-bundle.js and sg-bundle.js); the server now builds the same text from structured inputs.
+
+ELEMENT_INSTRUCTIONS = {
+    'PERSONA': "Write a compelling character persona. Focus on bringing the character to life through vivid descriptions of their personality, appearance, and backstory. The goal is to create a believable and engaging individual for a story.",
+    'WORLD': "Describe a unique and imaginative world. Focus on its core concept, history, and the societies that inhabit it. Create a rich tapestry of lore that feels both expansive and detailed.",
+    'SETTING': "Paint a picture of a specific setting within a larger world. Use sensory details to evoke the atmosphere, architecture, and mood of the location. Make it feel like a real place the reader can step into.",
+    'SCENE': "Write a complete and engaging scene. Use the provided context, characters, and setting to build a narrative moment with a clear beginning, middle, and end. Focus on action, dialogue, and emotional progression.",
+    'SPECIES': "Create a unique and believable species. Describe their biology, culture, societal structure, and role within their world. Give them distinct traits that make them memorable and consistent.",
+    'TECHNOLOGY': "Detail a piece of technology, explaining its function, appearance, and impact on the world. Write it from the perspective of an in-world document, like a technical manual, historical entry, or user review, as guided by the user.",
+    'PHILOSOPHY': "Flesh out a philosophy or belief system. Explain its core tenets, history, organization, and influence on its followers and the world. Make it feel like a genuine and coherent ideology.",
+    'UNIVERSE': "Create the foundational lore for an entire universe. Define its core genre, cosmic scope, and the fundamental rules that govern it, such as its magic or technology systems. Establish a consistent tone and history.",
+    'FACTION': "Describe a faction or organization. Detail its goals, methods, structure, and public perception. Give it a clear identity and purpose within the larger world.",
+}
+
+SCENARIO_INSTRUCTIONS = {
+    'STORYARC': "Write a compelling story arc. Focus on the narrative progression, key plot points, and the ultimate resolution. The goal is to create a satisfying and engaging storyline.",
+    'ADVENTURE': "Describe a self-contained adventure. Detail the hook that draws players in, the primary goal, the stakes involved, and potential resolutions. Make it feel like a complete and exciting scenario.",
+    'NPC': "Create a memorable non-player character. Describe their role in the story, their appearance, motivations, and any secrets they might have. Give them a distinct personality.",
+    'LOCATION': "Describe a vivid location. Use sensory details to establish the atmosphere, key sights, and potential encounters. Make it feel like a real place with a purpose.",
+    'GROUP': "Detail a faction or organization. Explain their goals, ideology, key members, and available resources. Give them a clear identity and purpose within the larger world.",
+    'ENCOUNTER': "Design an engaging encounter. Specify the type (combat, social, puzzle), the setup, potential resolutions, and any special mechanics involved.",
+    'ITEM': "Create a unique item. Describe its appearance, rarity, properties, and any special mechanics or history associated with it.",
+    'CLUE': "Detail a clue for an investigation. Explain what information it reveals, where it can be found, and what conclusions it might lead to.",
+    'MAP': "Describe a map. Explain its purpose, what it depicts, and any points of interest or secrets it might contain.",
+    'HANDOUT': "Create the content for a player handout. Write the text and describe any imagery that might be included. Ensure it serves a clear purpose in the story.",
+}
+
+DEFAULT_INSTRUCTION = "Generate rich, detailed, and creative content for the specified element, using all provided context to inform the output."
+
+ITERATION_INSTRUCTION = "Your task is to revise and improve the following content based *only* on the new instructions provided. Do not repeat the old content unless it is being modified. Focus on integrating the changes smoothly."
+
+CREATIVE_INTRO = (
+    "You are AIME, an AI world-building assistant{audience}. Your task is to act as a creative partner and generate "
+    "content based on the user's request.\n\n--- YOUR TASK ---\n{instruction}\n\nDo not describe the element itself "
+    "in a meta way; instead, create the content *for* the element. Use the following information to guide your writing:\n\n"
+)
+DESCRIPTIVE_INTRO = (
+    "You are AIME, an AI world-building assistant. The user wants to generate details for a \"{element_type}\" Element. "
+    "Use the provided information to create a rich, detailed, and creative description.\n\n"
+)
+ITERATION_INTRO = "You are AIME, an AI world-building assistant{audience}. You are in an iteration loop.\n\n--- YOUR TASK ---\n{instruction}\n\n"
+
+CREATIVE_OUTRO = (
+    "\n--- FINAL INSTRUCTION ---\nGenerate the content as requested. The output MUST be well-structured Markdown. "
+    "Use headings (#), subheadings (##), bold text (**text**), italics (*text*), and lists (- item) to organize the "
+    "information for clarity and readability."
+)
+DESCRIPTIVE_OUTRO = (
+    "\n--- TASK ---\nGenerate the content for the primary \"{element_type}\" Element. Use the Guidance Gems for style. "
+    "Critically, use the Contextual Assets for lore, background, and specific direction, paying close attention to "
+    "their specified Importance and Director's Notes. Be descriptive, imaginative, and ensure the output is consistent "
+    "with all provided data. Format the output clearly with headings."
+)
+
+NO_TRAITS = "No specific traits provided for this element. Please generate creatively.\n"
+
+
+class PromptError(ValueError):
+    """Raised when an element prompt cannot be built from the given inputs."""
+
+
+# A precompiled template: everything that depends only on the element type is rendered once at import
+ElementTemplate = namedtuple('ElementTemplate', [
+    'element_type',
+    'intro',            # text before the traits
+    'iteration_intro',  # text before the gems when revising existing content
+    'traits_heading',
+    'labels',           # field id -> "Label: " prefix, in form order
+    'notes_section',    # whether custom notes get their own section
+    'outro',
+])
+
+
+def compile_template(element_type, fields, style):
+    audience = ' for tabletop RPGs' if style == 'scenario' else ''
+    if style == 'descriptive':
+        intro = DESCRIPTIVE_INTRO.format(element_type=element_type)
+        outro = DESCRIPTIVE_OUTRO.format(element_type=element_type)
+    else:
+        instructions = SCENARIO_INSTRUCTIONS if style == 'scenario' else ELEMENT_INSTRUCTIONS
+        intro = CREATIVE_INTRO.format(audience=audience, instruction=instructions.get(element_type, DEFAULT_INSTRUCTION))
+        outro = CREATIVE_OUTRO
+    return ElementTemplate(
+        element_type=element_type,
+        intro=intro,
+        iteration_intro=ITERATION_INTRO.format(audience=audience, instruction=ITERATION_INSTRUCTION),
+        traits_heading=f"--- PRIMARY ELEMENT: {element_type} ---\n",
+        labels={field_id: f"{label}: " for field_id, label in fields},
+        # The Scenario Guide pages list every field, custom notes included, as a trait
+        notes_section=style != 'scenario',
+        outro=outro,
+    )
+
+
+# --- Template Registry ---
+# Live templates are looked up by element type alone (the element and Scenario Guide types are distinct);
+# the "descriptive" templates reproduce the element forms' earlier prompt and are opted into by name.
+TEMPLATES = {
+    **{element_type: compile_template(element_type, fields, 'creative') for element_type, fields in ELEMENT_FIELDS.items()},
+    **{element_type: compile_template(element_type, fields, 'scenario') for element_type, fields in SCENARIO_FIELDS.items()},
+}
+DESCRIPTIVE_TEMPLATES = {
+    element_type: compile_template(element_type, fields, 'descriptive') for element_type, fields in DESCRIPTIVE_FIELDS.items()
+}
+
+
+def get_template(element_type, template=None):
+    templates = DESCRIPTIVE_TEMPLATES if template == 'descriptive' else TEMPLATES
+    if template not in (None, 'descriptive'):
+        raise PromptError(f"Unknown prompt template: {template}.")
+    compiled = templates.get(element_type)
+    if compiled is None:
+        raise PromptError(f"Unknown element type: {element_type}.")
+    return compiled
+
+
+# --- Sections ---
+
+def _js_number(value):
+    # JSON.parse turns integral numbers into integers, so 2.0 is written back as 2 like JSON.stringify does
+    number = float(value)
+    return int(number) if number.is_integer() and abs(number) < 1e21 else number
+
+
+# --- Asset Serialization ---
+# "compact" writes JSON assets as flattened `key: value` lines without empty fields or file boilerplate;
+# "pretty" is the indented JSON the browser used to embed (the captured prompts were made with it)
+ASSET_FORMATS = ('compact', 'pretty')
+ASSET_FORMAT = os.getenv('AIME_ASSET_FORMAT', 'compact').lower()
+
+# Top-level keys of AIME files that only describe the file itself; the type is already in the entry's label
+ASSET_BOILERPLATE = ('assetType', 'timestamp', 'savedAt')
+
+
+def asset_format(requested):
+    """The JSON asset format for one prompt: the configured one unless the request names another."""
+    requested = (requested or ASSET_FORMAT).lower()
+    if requested not in ASSET_FORMATS:
+        raise PromptError(f"Unknown asset format '{requested}'; expected one of: {', '.join(ASSET_FORMATS)}.")
+    return requested
+
+
+def _compact_scalar(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    # Continuation lines are indented so a multi-line value cannot be mistaken for the next key
+    return str(value).strip().replace('\n', '\n  ')
+
+
+def _compact_lines(value, path):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _compact_lines(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        if all(not isinstance(item, (dict, list)) for item in value):
+            items = [_compact_scalar(item) for item in value if item is not None and str(item).strip()]
+            if items:
+                yield f"{path}: {'; '.join(items)}"
+        else:
+            for index, item in enumerate(value):
+                yield from _compact_lines(item, f"{path}[{index}]")
+    elif value is not None and str(value).strip():
+        yield f"{path}: {_compact_scalar(value)}" if path else _compact_scalar(value)
+
+
+def compact_json(parsed):
+    """
+    A parsed JSON asset as flattened `key: value` lines: nested keys joined with dots, scalar lists joined
+    with "; ", empty values left out. AIME file boilerplate is dropped and a lone wrapper such as "traits"
+    or "fields" is unwrapped, so a saved World reads `name: Cyberia` rather than `traits.name: Cyberia`.
+    """
+    if isinstance(parsed, dict):
+        parsed = {key: value for key, value in parsed.items() if key not in ASSET_BOILERPLATE}
+        if len(parsed) == 1 and isinstance(next(iter(parsed.values())), dict):
+            parsed = next(iter(parsed.values()))
+    return '\n'.join(_compact_lines(parsed, ''))
+
+
+@lru_cache(maxsize=256)
+def render_asset(asset_type, file_name, content, importance, annotation, fmt='pretty'):
+    """
+    One contextual asset entry, or '' when the asset is skipped. Cached, because the same assets are
+    sent with every generate and iterate click and re-serializing JSON assets dominates assembly time.
+    """
+    if importance == SKIPPED_IMPORTANCE:
+        return ''
+    note = f"  - Director's Note: {annotation}\n" if annotation else ''
+    if asset_type == 'json':
+        try:
+            parsed = json.loads(content, parse_float=_js_number)
+        except ValueError:
+            # Malformed JSON assets are left out, as the browser did
+            return ''
+        label = (parsed.get('assetType') if isinstance(parsed, dict) else None) or 'JSON Data'
+        body = compact_json(parsed) if fmt == 'compact' else json.dumps(parsed, indent=2, ensure_ascii=False)
+        if not body:
+            # Nothing but boilerplate and empty fields: no lore to give
+            return ''
+        return f"\n[Reference Asset: {label} | Importance: {importance}]\n{note}{body}\n"
+    return (f"\n[Reference Asset: Text File | Importance: {importance}]\n- Filename: {file_name}\n{note}"
+            f"--- Text Content ---\n{content}\n--- End Content ---\n")
+
+
+def render_assets(assets, budget=0, fmt=None, selected=None):
+    """
+    The contextual assets section and its packing report (see context.py): entries in importance order,
+    packed into `budget` tokens (0: no limit), JSON assets written in `fmt` (default: ASSET_FORMAT). With
+    `selected` (indices chosen by retrieval.py) the other assets are left out and reported as "unmatched".
+    """
+    fmt = asset_format(fmt)
+    entries, unmatched = [], []
+    for index, asset in enumerate(assets or []):
+        # Only text and JSON assets carry lore; images and other files are not part of the prompt
+        if not isinstance(asset, dict) or asset.get('type') not in ('text', 'json'):
+            continue
+        if selected is not None and index not in selected:
+            unmatched.append({"index": index, "fileName": asset.get('fileName'), "importance": asset.get('importance'),
+                              "tokens": 0, "keptTokens": 0, "status": 'unmatched'})
+            continue
+        content = asset.get('content')
+        if asset['type'] == 'json' and not isinstance(content, str):
+            # Structured clients may send the parsed object instead of the file text
+            content = json.dumps(content, ensure_ascii=False)
+        entries.append((index, asset, render_asset(asset['type'], asset.get('fileName') or '', content or '',
+                                                   asset.get('importance') or DEFAULT_IMPORTANCE, asset.get('annotation') or '', fmt)))
+    if not entries and not unmatched:
+        return '', None
+    # Skipped assets (Non-Informative, malformed JSON) render empty and take no part in packing
+    packed, report = pack_entries([entry for entry in entries if entry[2]], budget)
+    report["assets"] += unmatched
+    # Nothing left to show (all skipped, unmatched or over budget): no section header either
+    if not packed:
+        return '', report
+    return "\n--- CONTEXTUAL ASSETS (REFERENCE LORE) ---\n" + ''.join(packed), report
+
+
+def render_gems(gems):
+    lines = ''.join(f"- {gem}\n" for gem in gems or [])
+    return f"\n--- GUIDANCE GEMS (STYLISTIC DIRECTION) ---\n{lines}" if lines else ''
+
+
+def render_traits(compiled, fields):
+    """Trait lines in form order; fields the template does not know are labelled with their id, after the rest."""
+    values = {field_id: str(value).strip() for field_id, value in (fields or {}).items() if value is not None}
+    lines = [prefix + values[field_id] for field_id, prefix in compiled.labels.items() if values.get(field_id)]
+    lines += [f"{field_id}: {value}" for field_id, value in values.items() if value and field_id not in compiled.labels]
+    if not lines:
+        return compiled.traits_heading + NO_TRAITS
+    return compiled.traits_heading + '\n'.join(lines) + '\n'
+
+
+# --- Public API ---
+
+# A rendered superprompt. `lore` (the gems and assets sections) repeats across a session's generations
+# while `instructions` (the rest of `text`) changes; context_cache.py caches the former upstream.
+SuperPrompt = namedtuple('SuperPrompt', ['text', 'lore', 'instructions', 'context'])
+
+
+def render_element_prompt(element_type, fields=None, notes=None, gems=None, assets=None, iteration=None, template=None,
+                          budget=0, asset_format=None, selected=None):
+    """
+    Assembles the super-prompt for an element page from structured inputs and returns a SuperPrompt:
+    `fields` maps input ids to values, `notes` is the custom notes text, `gems` the selected guidance gems,
+    `assets` the loaded assets ({type, fileName, content, importance, annotation}) and `iteration`
+    ({existingContent, updateInstructions}) switches to revising previously generated content. The assets
+    are packed into `budget` tokens (0: no limit) and JSON assets written in `asset_format` ("compact" or
+    "pretty", default ASSET_FORMAT). `selected` limits the assets to those indices (see retrieval.py). The
+    packing report is None when there are no assets.
+    """
+    compiled = get_template(element_type, template)
+    if not isinstance(fields or {}, dict):
+        raise PromptError("Element fields must be an object mapping field ids to values.")
+    if not isinstance(gems or [], list) or not isinstance(assets or [], list):
+        raise PromptError("Gems and assets must be lists.")
+    if iteration and not isinstance(iteration, dict):
+        raise PromptError("Iteration must be an object with existingContent and updateInstructions.")
+
+    if iteration:
+        head = (compiled.iteration_intro
+                + f"--- PREVIOUS CONTENT ---\n{iteration.get('existingContent', '')}\n\n"
+                + f"--- USER'S UPDATE INSTRUCTIONS ---\n{iteration.get('updateInstructions', '')}\n\n")
+    else:
+        head = compiled.intro + render_traits(compiled, fields)
+        notes = (notes or '').strip()
+        if compiled.notes_section and notes:
+            head += f"\n--- CUSTOM NOTES ---\n{notes}\n"
+
+    section, report = render_assets(assets, budget, asset_format, selected)
+    lore = render_gems(gems) + section
+    return SuperPrompt(head + lore + compiled.outro, lore, head + compiled.outro, report)
+
+
+def build_element_prompt(*args, **kwargs):
+    """The text of render_element_prompt."""
+    return render_element_prompt(*args, **kwargs).text
@@ -0,0 +1,294 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- Rate Limit Configuration (all limits apply per resolved API key) ---
+RATE_LIMIT_ENABLED = os.getenv('AIME_RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+REQUESTS_PER_MINUTE = int(os.getenv('AIME_RATE_LIMIT_RPM', '60'))
+TOKENS_PER_MINUTE = int(os.getenv('AIME_RATE_LIMIT_TPM', '1000000'))
+MAX_CONCURRENCY = int(os.getenv('AIME_RATE_LIMIT_CONCURRENCY', '8'))
+# Requests allowed to wait for capacity, and how long they may wait before getting a 429
+QUEUE_SIZE = int(os.getenv('AIME_RATE_LIMIT_QUEUE', '16'))
+MAX_WAIT = float(os.getenv('AIME_RATE_LIMIT_MAX_WAIT', '10'))
+# API keys given their own limits; the least recently used idle key is forgotten beyond this
+MAX_KEYS = int(os.getenv('AIME_RATE_LIMIT_MAX_KEYS', '1024'))
+# Rough characters-per-token ratio for Gemini models, used to estimate a request's token cost up front
+CHARS_PER_TOKEN = 4
+
+
+class RateLimited(Exception):
+    """Raised when a request cannot be admitted within the wait budget."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def estimate_tokens(body):
+    """Estimates the tokens a generation will cost: the prompt as sent plus any requested output budget."""
+    prompt_tokens = len(json.dumps(body or {}, ensure_ascii=False)) // CHARS_PER_TOKEN
+    # Runs before the route validates the body, so malformed bodies are charged by their size alone
+    config = body.get('generationConfig') if isinstance(body, dict) else None
+    output_tokens = config.get('maxOutputTokens') if isinstance(config, dict) else None
+    return prompt_tokens + (output_tokens if isinstance(output_tokens, int) and output_tokens > 0 else 0)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        # Seconds until `amount` is available; a request bigger than the bucket only needs it full
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class KeyState:
+    def __init__(self, limiter):
+        self.requests = TokenBucket(limiter.requests_per_minute)
+        self.tokens = TokenBucket(limiter.tokens_per_minute)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.admitted = 0
+
+
+class Lease:
+    """One admitted request's concurrency slot; release() is idempotent."""
+
+    def __init__(self, limiter, state):
+        self._limiter = limiter
+        self._state = state
+        self._released = False
+
+    def release(self):
+        with self._limiter._lock:
+            if self._released:
+                return
+            self._released = True
+            self._state.active -= 1
+            self._limiter._wake()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class RateLimiter:
+    """
+    Per-key admission control: a requests/minute and a tokens/minute token bucket plus a cap on
+    concurrent requests. Requests that cannot start right away wait in a bounded queue; when the queue
+    is full, or the wait would exceed the budget, they are rejected at once with a Retry-After estimate.
+
+    Only keys the AI service has accepted (see verify()) get limits of their own, at most `max_keys` of
+    them; every other key shares the limits of UNVERIFIED, so inventing keys buys no extra capacity.
+    """
+
+    UNVERIFIED = 'unverified'
+
+    def __init__(self, enabled=RATE_LIMIT_ENABLED, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, max_concurrency=MAX_CONCURRENCY,
+                 queue_size=QUEUE_SIZE, max_wait=MAX_WAIT, max_keys=MAX_KEYS):
+        self.enabled = enabled
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._keys = OrderedDict()
+        self._unverified = KeyState(self)
+        # (loop, asyncio.Event) of each coroutine waiting in acquire_async()
+        self._async_waiters = set()
+
+    @staticmethod
+    def identity(api_key):
+        # Keys are tracked by fingerprint so raw API keys never sit in memory longer than the request
+        return hashlib.sha256((api_key or 'anonymous').encode('utf-8')).hexdigest()[:16]
+
+    def verify(self, api_key):
+        """Records that the AI service accepted `api_key`, so its requests are limited on their own."""
+        identity = self.identity(api_key)
+        with self._lock:
+            if identity in self._keys:
+                self._keys.move_to_end(identity)
+                return
+            state = self._keys[identity] = KeyState(self)
+            # The key's buckets start where the shared ones are, so verification is no way to a fresh burst
+            for bucket, shared in ((state.requests, self._unverified.requests), (state.tokens, self._unverified.tokens)):
+                shared._refill(time.monotonic())
+                bucket.tokens = shared.tokens
+            # Forget the least recently used keys with nothing in flight; a forgotten key starts over unverified
+            for stale in [name for name, state in list(self._keys.items())[:-1] if not state.active and not state.waiting]:
+                if len(self._keys) <= self.max_keys:
+                    break
+                del self._keys[stale]
+
+    def _state(self, api_key):
+        identity = self.identity(api_key)
+        state = self._keys.get(identity)
+        if state is None:
+            return self._unverified
+        self._keys.move_to_end(identity)
+        return state
+
+    def _wake(self):
+        # A concurrency slot was released: wake blocked threads and waiting coroutines (on their own loop)
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _try_admit(self, state, tokens, now):
+        """Admits the request and returns 0, or returns how long to wait (math.inf: wait for a slot)."""
+        wait = max(state.requests.wait_time(1, now), state.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        if state.active >= self.max_concurrency:
+            return math.inf
+        state.requests.take(1)
+        state.tokens.take(tokens)
+        state.active += 1
+        state.admitted += 1
+        return 0.0
+
+    def _enqueue(self, state):
+        if state.waiting >= self.queue_size:
+            state.rejected += 1
+            raise RateLimited("Too many queued requests for this API key.", self._retry_after())
+        state.waiting += 1
+
+    def _retry_after(self):
+        # Fallback hint when the wait is unbounded (all concurrency slots busy): one request interval
+        return 60.0 / self.requests_per_minute if self.requests_per_minute else 1.0
+
+    def _reject(self, state, wait):
+        state.rejected += 1
+        raise RateLimited("Rate limit exceeded for this API key.", wait if math.isfinite(wait) else self._retry_after())
+
+    def acquire(self, api_key, tokens=0):
+        """Blocks until the request may proceed and returns its Lease, or raises RateLimited."""
+        if not self.enabled:
+            return None
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            state = self._state(api_key)
+            now = time.monotonic()
+            wait = self._try_admit(state, tokens, now)
+            if wait == 0:
+                return Lease(self, state)
+            if now + wait > deadline and math.isfinite(wait):
+                self._reject(state, wait)
+            self._enqueue(state)
+            try:
+                while True:
+                    remaining = deadline - now
+                    if remaining <= 0 or (math.isfinite(wait) and wait > remaining):
+                        self._reject(state, wait)
+                    self._cond.wait(min(wait, remaining))
+                    now = time.monotonic()
+                    wait = self._try_admit(state, tokens, now)
+                    if wait == 0:
+                        return Lease(self, state)
+            finally:
+                state.waiting -= 1
+
+    async def acquire_async(self, api_key, tokens=0):
+        """Event-loop friendly acquire(): waits on an asyncio.Event instead of blocking the thread."""
+        if not self.enabled:
+            return None
+        deadline = time.monotonic() + self.max_wait
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            state = self._state(api_key)
+            now = time.monotonic()
+            wait = self._try_admit(state, tokens, now)
+            if wait == 0:
+                return Lease(self, state)
+            if now + wait > deadline and math.isfinite(wait):
+                self._reject(state, wait)
+            self._enqueue(state)
+            self._async_waiters.add(waiter)
+        try:
+            while True:
+                remaining = deadline - now
+                if remaining <= 0 or (math.isfinite(wait) and wait > remaining):
+                    with self._lock:
+                        self._reject(state, wait)
+                # Woken early when a concurrency slot is released, on this thread or another
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), min(wait, remaining))
+                except TimeoutError:
+                    pass
+                now = time.monotonic()
+                with self._lock:
+                    wait = self._try_admit(state, tokens, now)
+                    if wait == 0:
+                        return Lease(self, state)
+                    # Cleared under the lock, so a release after this admission attempt is never missed
+                    waiter[1].clear()
+        finally:
+            with self._lock:
+                state.waiting -= 1
+                self._async_waiters.discard(waiter)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "max_concurrency": self.max_concurrency,
+                "keys": {
+                    identity: {
+                        "active": state.active,
+                        "waiting": state.waiting,
+                        "admitted": state.admitted,
+                        "rejected": state.rejected,
+                    }
+                    for identity, state in [*self._keys.items(), (self.UNVERIFIED, self._unverified)]
+                },
+            }
+
+
+def verify_accepted_key(params, status):
+    """Called with the query parameters and status of every upstream call: a 2xx verifies the key used."""
+    api_key = (params or {}).get('key')
+    if api_key and 200 <= status < 300:
+        get_rate_limiter().verify(api_key)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Returns the process-wide RateLimiter."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
@@ -0,0 +1,156 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import time
+
+# --- Request Logging Configuration ---
+LOG_LEVEL = os.getenv('AIME_LOG_LEVEL', 'INFO').upper()
+# Send each response's phase timings to the browser as a Server-Timing header (shown by devtools)
+SERVER_TIMING = os.getenv('AIME_SERVER_TIMING', 'true').lower() == 'true'
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# An id set by a proxy in front of the server is kept, so its logs and ours can be joined
+REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{8,128}$')
+
+logger = logging.getLogger('aime')
+
+_current = contextvars.ContextVar('aime_request', default=None)
+
+
+class RequestTimings:
+    """
+    The id of one request, where its time went (phase name -> seconds) and a few fields for its log line.
+    Phases are summed, so a phase entered several times (retries, several upstream calls) counts in full.
+    """
+    __slots__ = ('request_id', 'started', 'phases', 'fields', 'active')
+
+    def __init__(self, request_id=None):
+        self.request_id = request_id if request_id and REQUEST_ID.match(request_id) else secrets.token_hex(8)
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.fields = {}
+        self.active = set()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """The Server-Timing header value: each phase so far and the total, in milliseconds."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ', '.join(entries)
+
+
+class phase:
+    """
+    Times a block as a phase of the current request: `with phase('upstream'): ...`. Outside a request,
+    or inside a block already timing the same phase, it does nothing, so helpers can time themselves
+    without counting twice when their callers do too.
+    """
+    __slots__ = ('name', 'timings', 'started')
+
+    def __init__(self, name):
+        self.name = name
+        self.timings = None
+
+    def __enter__(self):
+        timings = _current.get()
+        if timings is not None and self.name not in timings.active:
+            timings.active.add(self.name)
+            self.timings = timings
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.timings is not None:
+            self.timings.active.discard(self.name)
+            self.timings.add(self.name, time.perf_counter() - self.started)
+            self.timings = None
+
+
+def start_request(request_id=None):
+    """Starts timing a request (with the id its client or proxy sent, if usable) and returns its timings."""
+    timings = RequestTimings(request_id)
+    _current.set(timings)
+    return timings
+
+
+def current_request():
+    return _current.get()
+
+
+def annotate(**fields):
+    """Adds fields (model, cache state, ...) to the log line of the current request."""
+    timings = _current.get()
+    if timings is not None:
+        timings.fields.update(fields)
+
+
+def telemetry_headers(timings, path):
+    """The headers of every response: its request id and, with AIME_SERVER_TIMING, its phase timings."""
+    headers = {REQUEST_ID_HEADER: timings.request_id}
+    if SERVER_TIMING:
+        headers['Server-Timing'] = timings.server_timing()
+        if path.startswith('/api/'):
+            # Lets the front end (any origin, like CORS) read the timings through the Resource Timing API
+            headers['Timing-Allow-Origin'] = '*'
+    return headers
+
+
+def log_level(path):
+    # API calls are logged at INFO; pages, scripts and blobs only at DEBUG
+    return logging.INFO if path.startswith('/api/') else logging.DEBUG
+
+
+def log_request(timings, method, route, status, level=logging.INFO, **fields):
+    """Logs the line summing up a finished request: status, duration and the time spent in each phase."""
+    if not logger.isEnabledFor(level):
+        return
+    logger.log(level, 'request', extra={"fields": {
+        "request_id": timings.request_id,
+        "method": method,
+        "route": route,
+        "status": status,
+        "duration_ms": round(timings.elapsed() * 1000, 1),
+        "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in timings.phases.items()},
+        **timings.fields,
+        **{key: value for key, value in fields.items() if value is not None},
+    }})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, tagged with the id of the request being served when there is one."""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        timings = _current.get()
+        if timings is not None:
+            entry["request_id"] = timings.request_id
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=LOG_LEVEL, stream=None):
+    """Sends the "aime" loggers to stderr as JSON lines (once; the app factories call this)."""
+    if any(getattr(handler, 'aime', False) for handler in logger.handlers):
+        return
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    handler.aime = True
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
@@ -0,0 +1,275 @@
+import asyncio
+import inspect
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# --- Deadlines (seconds from the start of the upstream call, including retries) ---
+ROUTE_DEADLINES = {
+    'proxy': float(os.getenv('AIME_DEADLINE_PROXY', '90')),
+    'chat': float(os.getenv('AIME_DEADLINE_CHAT', '60')),
+    'image': float(os.getenv('AIME_DEADLINE_IMAGE', '120')),
+    'generate': float(os.getenv('AIME_DEADLINE_GENERATE', '90')),
+}
+DEFAULT_DEADLINE = float(os.getenv('AIME_DEADLINE_DEFAULT', '90'))
+CONNECT_TIMEOUT = float(os.getenv('AIME_CONNECT_TIMEOUT', '10'))
+
+# --- Retries ---
+MAX_RETRIES = int(os.getenv('AIME_RETRY_MAX', '2'))
+BACKOFF_BASE = float(os.getenv('AIME_RETRY_BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.getenv('AIME_RETRY_BACKOFF_MAX', '8'))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# --- Hedging: a duplicate request after the p95 latency, first response wins ---
+HEDGE_ENABLED = os.getenv('AIME_HEDGE_ENABLED', 'false').lower() == 'true'
+HEDGE_QUANTILE = float(os.getenv('AIME_HEDGE_QUANTILE', '0.95'))
+HEDGE_MIN_SAMPLES = int(os.getenv('AIME_HEDGE_MIN_SAMPLES', '20'))
+HEDGE_MIN_DELAY = float(os.getenv('AIME_HEDGE_MIN_DELAY', '1'))
+# Upper bound on hedges as a fraction of calls, which caps the extra quota hedging can spend
+HEDGE_MAX_RATIO = float(os.getenv('AIME_HEDGE_MAX_RATIO', '0.1'))
+# Request threads per worker (gunicorn.conf.py); a hedged call runs both its attempts on the hedging executor
+REQUEST_THREADS = int(os.getenv('AIME_THREADS', '16'))
+HEDGE_WORKERS = int(os.getenv('AIME_HEDGE_WORKERS', str(2 * REQUEST_THREADS)))
+LATENCY_WINDOW = 200
+
+
+def retry_after_seconds(response):
+    # Only the delta-seconds form of Retry-After is honoured; HTTP dates fall back to backoff
+    value = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than the upstream's Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+    return max(delay, retry_after) if retry_after is not None else delay
+
+
+class Resilience:
+    """
+    Wraps upstream calls with a per-route deadline, bounded retries with jittered exponential backoff
+    for retryable status codes and transport errors, and optional hedging for buffered calls.
+
+    Calls are described by `send(timeout)`, which performs one attempt and returns a response with
+    `status_code` and `headers`; `discard(response)` releases a response that will not be used.
+    """
+
+    def __init__(self, deadlines=None, max_retries=MAX_RETRIES, hedge_enabled=HEDGE_ENABLED,
+                 hedge_quantile=HEDGE_QUANTILE, hedge_min_samples=HEDGE_MIN_SAMPLES,
+                 hedge_min_delay=HEDGE_MIN_DELAY, hedge_max_ratio=HEDGE_MAX_RATIO):
+        self.deadlines = dict(ROUTE_DEADLINES if deadlines is None else deadlines)
+        self.max_retries = max_retries
+        self.hedge_enabled = hedge_enabled
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_ratio = hedge_max_ratio
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._executor = None
+        self.counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0}
+
+    # --- Bookkeeping ---
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def record_latency(self, key, seconds):
+        with self._lock:
+            self._latencies[key].append(seconds)
+
+    def hedge_delay(self, key):
+        """Seconds to wait before hedging a call, or None when hedging should not happen."""
+        if not self.hedge_enabled:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies[key])
+            budget_left = self.counters["hedges"] < self.counters["calls"] * self.hedge_max_ratio
+        if len(samples) < self.hedge_min_samples or not budget_left:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_quantile))
+        return max(self.hedge_min_delay, samples[index])
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, hedge_enabled=self.hedge_enabled)
+
+    def _executor_pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='aime-hedge')
+        return self._executor
+
+    # --- Retry Loop ---
+
+    def _next_delay(self, attempt, deadline, response):
+        # Backoff before the next attempt, or None when retries are exhausted or would miss the deadline
+        if attempt >= self.max_retries:
+            return None
+        delay = backoff_delay(attempt, retry_after_seconds(response))
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def call(self, route, send, discard=None, retry_exceptions=(), hedge=False, latency_key=None):
+        latency_key = latency_key or route
+        deadline = time.monotonic() + self.deadlines.get(route, DEFAULT_DEADLINE)
+        self._count("calls")
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            remaining = deadline - started
+            response, error = None, None
+            try:
+                if hedge:
+                    response = self._hedged(send, remaining, discard, latency_key)
+                else:
+                    response = send(remaining)
+            except retry_exceptions as e:
+                error = e
+
+            if response is not None and response.status_code not in RETRYABLE_STATUS:
+                if response.status_code < 400:
+                    self.record_latency(latency_key, time.monotonic() - started)
+                return response
+
+            delay = self._next_delay(attempt, deadline, response)
+            if delay is None:
+                self._count("failures")
+                if response is not None:
+                    return response
+                raise error
+            if response is not None and discard:
+                discard(response)
+            self._count("retries")
+            time.sleep(delay)
+            attempt += 1
+
+    def _hedged(self, send, remaining, discard, latency_key):
+        delay = self.hedge_delay(latency_key)
+        if delay is None or delay >= remaining:
+            return send(remaining)
+
+        pool = self._executor_pool()
+        primary = pool.submit(send, remaining)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        backup = pool.submit(send, remaining - delay)
+        pending, finished = {primary, backup}, []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            finished.extend(done)
+            # A retryable failure does not end the race while the other attempt may still succeed
+            winner = next((f for f in done if _settled(f)), None)
+            if winner is not None:
+                if winner is backup:
+                    self._count("hedge_wins")
+                break
+        else:
+            # Both attempts failed: a response (whose Retry-After call() honours) beats an error
+            winner = next((f for f in finished if f.exception() is None), primary)
+        for loser in (set(finished) | pending) - {winner}:
+            loser.add_done_callback(lambda f: discard(f.result()) if discard and f.exception() is None else None)
+        return winner.result()
+
+    # --- Async Variant ---
+
+    async def call_async(self, route, send, discard=None, retry_exceptions=(), hedge=False, latency_key=None):
+        """Event-loop counterpart of call(); `send` and `discard` may be coroutine functions."""
+        latency_key = latency_key or route
+        deadline = time.monotonic() + self.deadlines.get(route, DEFAULT_DEADLINE)
+        self._count("calls")
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            remaining = deadline - started
+            response, error = None, None
+            try:
+                if hedge:
+                    response = await self._hedged_async(send, remaining, discard, latency_key)
+                else:
+                    response = await send(remaining)
+            except retry_exceptions as e:
+                error = e
+
+            if response is not None and response.status_code not in RETRYABLE_STATUS:
+                if response.status_code < 400:
+                    self.record_latency(latency_key, time.monotonic() - started)
+                return response
+
+            delay = self._next_delay(attempt, deadline, response)
+            if delay is None:
+                self._count("failures")
+                if response is not None:
+                    return response
+                raise error
+            if response is not None and discard:
+                await _maybe_await(discard(response))
+            self._count("retries")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _hedged_async(self, send, remaining, discard, latency_key):
+        delay = self.hedge_delay(latency_key)
+        if delay is None or delay >= remaining:
+            return await send(remaining)
+
+        primary = asyncio.ensure_future(send(remaining))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        backup = asyncio.ensure_future(send(remaining - delay))
+        pending, finished = {primary, backup}, []
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finished.extend(done)
+            winner = next((t for t in done if _settled(t)), None)
+            if winner is not None:
+                if winner is backup:
+                    self._count("hedge_wins")
+                break
+        else:
+            winner = next((t for t in finished if t.exception() is None), primary)
+        for loser in pending:
+            loser.cancel()
+        for loser in set(finished) - {winner}:
+            if loser.exception() is None and discard:
+                await _maybe_await(discard(loser.result()))
+        return winner.result()
+
+
+def _settled(attempt):
+    # A finished hedge attempt that decides the call: a response that is not worth retrying
+    return attempt.exception() is None and attempt.result().status_code not in RETRYABLE_STATUS
+
+
+async def _maybe_await(result):
+    if inspect.isawaitable(result):
+        await result
+
+
+_resilience = None
+_resilience_lock = threading.Lock()
+
+
+def get_resilience():
+    """Returns the process-wide Resilience policy."""
+    global _resilience
+    if _resilience is None:
+        with _resilience_lock:
+            if _resilience is None:
+                _resilience = Resilience()
+    return _resilience
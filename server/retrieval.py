@@ -0,0 +1,225 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from context import PINNED_IMPORTANCE
+from vectors import get_vector_index
+
+# --- Lore Retrieval Configuration ---
+# How many assets an element prompt keeps when it asks for retrieval without a number (inputs.retrieve: true)
+RETRIEVAL_TOP_K = int(os.getenv('AIME_RETRIEVAL_TOP_K', '8'))
+# Indexed documents kept in memory; the least recently used are forgotten first and re-indexed when seen again
+RETRIEVAL_MAX_DOCUMENTS = int(os.getenv('AIME_RETRIEVAL_MAX_DOCUMENTS', '20000'))
+
+# Fields that identify an element (names, aliases, factions, locations, homeworlds, ...): a match there says
+# far more about relevance than a match in a description, so their terms count several times
+KEY_FIELD = re.compile(r'(?:^|[-_])(?:name|fullname|alias(?:es)?|factions?|locations?|homeworld|origin|setting)(?:$|[-_])', re.I)
+KEY_FIELD_WEIGHT = 3
+
+# Terms too common in lore to tell assets apart
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have in into is it its of on or that the their them they this to was
+were which with who will not no can all any its our your his her he she you we i me my so than then there these
+those what when where how also more most very such only over under out up about after before between through
+""".split())
+
+_WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)?", re.UNICODE)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Reciprocal rank fusion of the keyword and semantic rankings: score = sum of 1 / (RRF_K + rank)
+RRF_K = 60
+
+
+def terms(text):
+    """Lowercased words of `text`, without stop words and single letters."""
+    return [word for word in _WORD.findall(str(text).lower()) if len(word) > 1 and word not in STOP_WORDS]
+
+
+def _json_terms(value, key, counts):
+    if isinstance(value, dict):
+        for child_key, child in value.items():
+            _json_terms(child, str(child_key), counts)
+        # Keys are part of the lore too ("faction-goal"), but only once per object
+        counts.update(terms(' '.join(map(str, value))))
+    elif isinstance(value, list):
+        for item in value:
+            _json_terms(item, key, counts)
+    elif value is not None:
+        weight = KEY_FIELD_WEIGHT if KEY_FIELD.search(key) else 1
+        for term in terms(value):
+            counts[term] += weight
+
+
+def asset_terms(asset_type, content):
+    """Weighted term counts of an asset: its text, or for JSON assets the values with key fields boosted."""
+    counts = Counter()
+    if asset_type == 'json':
+        try:
+            _json_terms(json.loads(content), '', counts)
+            return counts
+        except ValueError:
+            pass
+    counts.update(terms(content))
+    return counts
+
+
+class LoreIndex:
+    """
+    An inverted index over lore assets, keyed by asset reference (the SHA-256 of the content, see assets.py).
+    Assets are added as they are uploaded or first seen inline; an edited asset is simply a new document. A
+    search only walks the postings of the query's terms, so its cost follows the query, not the library.
+    """
+
+    def __init__(self, max_documents=RETRIEVAL_MAX_DOCUMENTS):
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self._postings = {}           # term -> {ref: weighted count}
+        self._lengths = OrderedDict()  # ref -> document length, in least recently used order
+        self._terms = {}              # ref -> its terms, to unlink them when the document is removed
+        self._total_length = 0
+        self.searches = 0
+
+    def __contains__(self, ref):
+        with self._lock:
+            return ref in self._lengths
+
+    def __len__(self):
+        with self._lock:
+            return len(self._lengths)
+
+    def add(self, ref, asset_type, content):
+        """Indexes an asset under `ref`; already indexed references are only marked as recently used."""
+        with self._lock:
+            if ref in self._lengths:
+                self._lengths.move_to_end(ref)
+                return
+        counts = asset_terms(asset_type, content)
+        with self._lock:
+            if ref in self._lengths:
+                return
+            for term, count in counts.items():
+                self._postings.setdefault(term, {})[ref] = count
+            self._terms[ref] = tuple(counts)
+            self._lengths[ref] = sum(counts.values())
+            self._total_length += self._lengths[ref]
+            while len(self._lengths) > self.max_documents:
+                self._remove(next(iter(self._lengths)))
+
+    def remove(self, ref):
+        with self._lock:
+            self._remove(ref)
+
+    def _remove(self, ref):
+        if ref not in self._lengths:
+            return
+        for term in self._terms.pop(ref):
+            postings = self._postings[term]
+            del postings[ref]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(ref)
+
+    def search(self, query, candidates=None, k=10):
+        """
+        The `k` best matches for `query` as [(ref, score)], best first, scored with BM25. `candidates`
+        restricts the results to those references (the assets a request brought along).
+        """
+        query_terms = set(terms(query))
+        scores = Counter()
+        with self._lock:
+            self.searches += 1
+            if not self._lengths:
+                return []
+            count = len(self._lengths)
+            average = self._total_length / count or 1
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for ref, frequency in postings.items():
+                    if candidates is not None and ref not in candidates:
+                        continue
+                    norm = frequency + K1 * (1 - B + B * self._lengths[ref] / average)
+                    scores[ref] += idf * frequency * (K1 + 1) / norm
+        return scores.most_common(k)
+
+    def stats(self):
+        with self._lock:
+            return {"documents": len(self._lengths), "terms": len(self._postings), "searches": self.searches}
+
+
+def retrieval_k(requested):
+    """How many assets to keep for inputs.retrieve: None (send every asset), true (the default) or a count."""
+    if requested in (None, False, '', 0):
+        return None
+    if requested is True:
+        return RETRIEVAL_TOP_K
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        raise ValueError("retrieve must be true or a number of assets.")
+    if requested < 0:
+        raise ValueError("retrieve must be a positive number of assets.")
+    return requested
+
+
+def select_assets(assets, query, k, index=None, vectors=None):
+    """
+    The indices of the assets (already resolved, with "ref" or content) worth sending for `query`: the `k`
+    best matching ones plus every pinned one. Assets that carry no lore (images, ...) are left to the renderer.
+    Keyword matches are fused with semantic ones when the vector index (vectors.py) is available.
+    """
+    if index is None:
+        index = get_lore_index()
+    if vectors is None:
+        vectors = get_vector_index()
+    refs, selected = {}, set()
+    for position, asset in enumerate(assets or []):
+        if not isinstance(asset, dict) or asset.get('type') not in ('text', 'json'):
+            selected.add(position)
+            continue
+        # Assets the user marked as most important are always sent, matched or not
+        if asset.get('importance') in PINNED_IMPORTANCE:
+            selected.add(position)
+            continue
+        content = asset.get('content')
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        # Inline assets are keyed like uploaded ones (assets.asset_ref), so both share one document
+        ref = asset.get('ref') or hashlib.sha256(content.encode('utf-8')).hexdigest()
+        if ref not in index:
+            index.add(ref, asset['type'], content)
+        if vectors is not None and ref not in vectors:
+            vectors.add(ref, asset['type'], content)
+        refs.setdefault(ref, []).append(position)
+    rankings = [index.search(query, candidates=refs, k=k)]
+    if vectors is not None and refs:
+        rankings.append(vectors.search(query, candidates=refs, k=k))
+    fused = Counter()
+    for ranking in rankings:
+        for rank, (ref, _) in enumerate(ranking):
+            fused[ref] += 1 / (RRF_K + rank)
+    for ref, _ in fused.most_common(k):
+        selected.update(refs[ref])
+    return selected
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_lore_index():
+    """Returns the process-wide LoreIndex."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LoreIndex()
+    return _index
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import posixpath
+import re
+import sys
+import threading
+import zlib
+from collections import namedtuple
+
+from compression import brotli, parse_accept_encoding
+
+# --- Static Asset Configuration ---
+# The front end: only these directories (and the files in STATIC_FILES) are served, never the rest of the repo
+STATIC_ROOT = os.getenv('AIME_STATIC_ROOT', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATIC_DIRS = ('script', 'style', 'pages', 'SG')
+STATIC_FILES = ('index.html',)
+# Re-read sources that changed on disk (development); production serves what was built at startup
+STATIC_WATCH = os.getenv('AIME_STATIC_WATCH', 'false').lower() == 'true'
+# Fingerprinted URLs never change content, so browsers may keep them for a year without revalidating
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+STATIC_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.json': 'application/json',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.ico': 'image/x-icon',
+    '.woff2': 'font/woff2',
+}
+# Pages keep their URLs (they are bookmarked and linked to) and are revalidated instead
+FINGERPRINT_EXCLUDED = ('.html',)
+COMPRESSIBLE = ('.html', '.js', '.css', '.json', '.svg')
+# Built once, so compressed as small as the codings go
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+HASH_LENGTH = 12
+
+# src/href attributes of pages, rewritten to the fingerprinted names of the files they load
+ASSET_REFERENCE = re.compile(r'''(\b(?:src|href)\s*=\s*["'])([^"'#?:]+)(["'])''', re.I)
+# url() references of stylesheets (fonts, images, @import), rewritten the same way; data: and absolute URLs are left alone
+CSS_REFERENCE = re.compile(r'''(\burl\(\s*["']?)([^"'()#?:\s]+)((?:[?#][^"'()]*)?["']?\s*\))''', re.I)
+# Files whose references are rewritten, in build order (a page may load a stylesheet, not the other way round)
+REWRITTEN = {'.css': CSS_REFERENCE, '.html': ASSET_REFERENCE}
+
+# One servable file. `variants` maps a content coding (None: identity) to (bytes, strong ETag).
+StaticFile = namedtuple('StaticFile', ['source', 'content_type', 'variants', 'immutable', 'mtime'])
+
+
+def fingerprinted_name(path, digest):
+    """script/global-ui.js -> script/global-ui.<hash>.js"""
+    stem, extension = posixpath.splitext(path)
+    return f"{stem}.{digest[:HASH_LENGTH]}{extension}"
+
+
+def parse_etags(header):
+    """The entity tags of an If-None-Match header (weak tags compare equal to strong ones there)."""
+    return {tag.strip().removeprefix('W/') for tag in (header or '').split(',') if tag.strip()}
+
+
+class StaticSite:
+    """
+    The front end, built once: every file gets a fingerprinted URL (its content hash in the name), pages and
+    stylesheets are rewritten to load those, and compressible files are precompressed with gzip and, when
+    available, brotli.
+    Fingerprinted URLs are served as immutable; page URLs and the plain file names stay valid but are
+    revalidated with their strong ETag and answered with 304 when unchanged.
+    """
+
+    def __init__(self, root=STATIC_ROOT, watch=STATIC_WATCH):
+        self.root = root
+        self.watch = watch
+        self._lock = threading.Lock()
+        self._files = {}
+        self.manifest = {}
+        self.builds = 0
+        self.not_modified = 0
+        self.build()
+
+    def sources(self):
+        """URL paths of the files that may be served, e.g. "script/global-ui.js"."""
+        paths = [name for name in STATIC_FILES if os.path.isfile(os.path.join(self.root, name))]
+        for directory in STATIC_DIRS:
+            for dirpath, dirnames, filenames in os.walk(os.path.join(self.root, directory)):
+                dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+                for name in sorted(filenames):
+                    if not name.startswith('.') and posixpath.splitext(name)[1].lower() in STATIC_TYPES:
+                        relative = os.path.relpath(os.path.join(dirpath, name), self.root)
+                        paths.append(relative.replace(os.sep, '/'))
+        return paths
+
+    def _read(self, path):
+        with open(os.path.join(self.root, *path.split('/')), 'rb') as f:
+            return f.read(), self._read_mtime(path)
+
+    def _rewrite(self, path, data, manifest, pattern=ASSET_REFERENCE):
+        # A reference like ../script/global-ui.js resolves against the directory of the file it is in
+        base = posixpath.dirname(path)
+
+        def fingerprint(match):
+            reference = match.group(2)
+            target = posixpath.normpath(posixpath.join(base, reference))
+            if target not in manifest:
+                return match.group(0)
+            hashed = manifest[target]
+            return match.group(1) + posixpath.join(posixpath.dirname(reference), posixpath.basename(hashed)) + match.group(3)
+
+        return pattern.sub(fingerprint, data.decode('utf-8')).encode('utf-8')
+
+    @staticmethod
+    def _variants(extension, data, digest):
+        variants = {None: (data, f'"{digest}"')}
+        if extension in COMPRESSIBLE:
+            gzipped = zlib.compress(data, GZIP_LEVEL, wbits=16 + zlib.MAX_WBITS)
+            if len(gzipped) < len(data):
+                variants['gzip'] = (gzipped, f'"{digest}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+                if len(compressed) < len(data):
+                    variants['br'] = (compressed, f'"{digest}-br"')
+        return variants
+
+    def build(self):
+        """(Re)builds every file: hashes, fingerprinted names, rewritten pages and precompressed variants."""
+        sources = {path: self._read(path) for path in self.sources()}
+        built, manifest = {}, {}
+        # Files are built in reference order: stylesheets name fonts and images, pages name all of them.
+        # A rewritten file is fingerprinted by what it serves, so its URL changes whenever a reference does.
+        order = [None, *REWRITTEN]
+        extensions = {path: posixpath.splitext(path)[1].lower() for path in sources}
+        for path in sorted(sources, key=lambda path: order.index(extensions[path] if extensions[path] in REWRITTEN else None)):
+            data, extension = sources[path][0], extensions[path]
+            if extension in REWRITTEN:
+                data = self._rewrite(path, data, manifest, REWRITTEN[extension])
+            built[path] = data
+            if extension not in FINGERPRINT_EXCLUDED:
+                manifest[path] = fingerprinted_name(path, hashlib.sha256(data).hexdigest())
+        files = {}
+        for path, (_, mtime) in sources.items():
+            extension = posixpath.splitext(path)[1].lower()
+            data = built[path]
+            digest = hashlib.sha256(data).hexdigest()
+            variants = self._variants(extension, data, digest)
+            files[path] = StaticFile(path, STATIC_TYPES[extension], variants, False, mtime)
+            if path in manifest:
+                files[manifest[path]] = StaticFile(path, STATIC_TYPES[extension], variants, True, mtime)
+        with self._lock:
+            self._files, self.manifest = files, manifest
+            self.builds += 1
+
+    def _changed(self):
+        with self._lock:
+            built = {found.source: found.mtime for found in self._files.values()}
+        try:
+            return {path: self._read_mtime(path) for path in self.sources()} != built
+        except OSError:
+            return True
+
+    def _read_mtime(self, path):
+        return os.path.getmtime(os.path.join(self.root, *path.split('/')))
+
+    def lookup(self, path):
+        """The StaticFile served at URL path `path` ("" is the index page), or None."""
+        path = path.strip('/') or 'index.html'
+        if self.watch and self._changed():
+            # Pages embed the fingerprints of what they load, so any change rebuilds the whole site
+            self.build()
+        with self._lock:
+            return self._files.get(path)
+
+    def respond(self, path, accept_encoding='', if_none_match=''):
+        """
+        (status, headers, body) for a GET of `path`, or None when nothing is served there. Picks the
+        smallest precompressed variant the client accepts and answers 304 when its ETag still matches.
+        """
+        found = self.lookup(path)
+        if found is None:
+            return None
+        # Codings the client refuses with q=0 (e.g. "br;q=0, gzip") are not offered
+        accepted = parse_accept_encoding(accept_encoding)
+        coding = next((coding for coding in ('br', 'gzip') if coding in found.variants and coding in accepted), None)
+        body, etag = found.variants[coding]
+        headers = {
+            'Content-Type': found.content_type,
+            'ETag': etag,
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': f'public, max-age={STATIC_MAX_AGE}, immutable' if found.immutable else 'no-cache',
+        }
+        if coding:
+            headers['Content-Encoding'] = coding
+        tags = parse_etags(if_none_match)
+        if etag in tags or '*' in tags:
+            with self._lock:
+                self.not_modified += 1
+            return 304, headers, b''
+        headers['Content-Length'] = str(len(body))
+        return 200, headers, body
+
+    def stats(self):
+        with self._lock:
+            sources = {found.source: found for found in self._files.values()}
+            return {
+                "files": len(sources),
+                "bytes": sum(len(found.variants[None][0]) for found in sources.values()),
+                "gzipBytes": sum(len(found.variants.get('gzip', found.variants[None])[0]) for found in sources.values()),
+                "brotliBytes": sum(len(found.variants.get('br', found.variants[None])[0]) for found in sources.values())
+                if brotli is not None else None,
+                "builds": self.builds,
+                "notModified": self.not_modified,
+            }
+
+
+_site = None
+_site_lock = threading.Lock()
+
+
+def get_static_site():
+    """Returns the process-wide StaticSite, building it on first use."""
+    global _site
+    if _site is None:
+        with _site_lock:
+            if _site is None:
+                _site = StaticSite()
+    return _site
+
+
+if __name__ == '__main__':
+    # python server/static_assets.py: what the build produces, per file
+    site = StaticSite(sys.argv[1] if len(sys.argv) > 1 else STATIC_ROOT)
+    for source in site.sources():
+        variants = site.lookup(source).variants
+        sizes = '  '.join(f"{coding or 'identity'} {len(data)}" for coding, (data, _) in variants.items())
+        print(f"{site.manifest.get(source, source):<50} {sizes}")
+    print(site.stats())
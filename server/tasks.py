@@ -0,0 +1,167 @@
+from collections import namedtuple
+
+from ai_service import CHAT_MODEL, build_chat_payload, build_chat_prompt
+from assets import AssetError, MissingAssets, get_asset_store
+from context import context_budget
+from prompts import PromptError, SuperPrompt, render_element_prompt
+from retrieval import retrieval_k, select_assets
+
+# Model the front-end bundles have always used for text generation
+DEFAULT_TASK_MODEL = 'gemini-2.5-flash-lite'
+
+# A generation task: the model it runs on by default and how its prompt is built from the inputs
+Task = namedtuple('Task', ['model', 'build_prompt'])
+# What build_task_request produces: the generateContent call, how element assets were packed into the
+# context budget (see context.py) and the prompt split into reusable lore and per-call instructions
+TaskRequest = namedtuple('TaskRequest', ['model', 'body', 'context', 'lore', 'instructions'])
+
+# Story Weaver prompts end with their assets under this heading
+WRITER_ASSETS_HEADING = "\n--- CONTEXTUAL ASSETS ---\n"
+
+
+class TaskError(ValueError):
+    """Raised for an unknown task type or inputs the task cannot build a prompt from."""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or {}
+
+    def to_json(self):
+        # The 400 body: the message plus anything the client can act on (e.g. assets to upload again)
+        return {"error": str(self), **self.details}
+
+
+def _require(inputs, *names):
+    missing = [name for name in names if not isinstance(inputs.get(name), str) or not inputs[name].strip()]
+    if missing:
+        raise TaskError(f"Missing required input(s): {', '.join(missing)}.")
+    return [inputs[name] for name in names]
+
+
+def prompt_input(inputs):
+    # Superprompts assembled in the browser from page state (writer tabs, module tabs)
+    prompt, = _require(inputs, 'prompt')
+    return prompt
+
+
+def writer_prompt(inputs):
+    # The Story Weaver builds its own superprompt; its trailing assets section is the reusable lore
+    prompt = prompt_input(inputs)
+    split = prompt.find(WRITER_ASSETS_HEADING)
+    if split < 0:
+        return prompt
+    return SuperPrompt(prompt, prompt[split:], prompt[:split], None)
+
+
+def retrieval_query(inputs):
+    # What the prompt is about: the filled-in form, the notes, and for an iteration what is to change
+    fields = inputs.get('fields') if isinstance(inputs.get('fields'), dict) else {}
+    iteration = inputs.get('iteration') if isinstance(inputs.get('iteration'), dict) else {}
+    parts = [*fields.values(), inputs.get('notes'), iteration.get('updateInstructions')]
+    return ' '.join(str(part) for part in parts if part)
+
+
+def element_prompt(inputs):
+    # Element and Scenario Guide pages send their form state and the superprompt is assembled here;
+    # a finished "prompt" is still accepted from pages that build their own
+    if 'elementType' not in inputs:
+        return prompt_input(inputs)
+    element_type, = _require(inputs, 'elementType')
+    try:
+        budget = context_budget(inputs.get('contextBudget'))
+        top_k = retrieval_k(inputs.get('retrieve'))
+    except ValueError as e:
+        raise TaskError(str(e))
+    try:
+        # Assets are usually sent as {"ref": sha256} and expanded from the asset store here
+        assets = get_asset_store().resolve(inputs.get('assets'))
+    except MissingAssets as e:
+        raise TaskError(str(e), {"missingAssets": e.refs})
+    except AssetError as e:
+        raise TaskError(str(e))
+    # With inputs.retrieve only the assets relevant to this prompt are sent, instead of the whole library
+    selected = select_assets(assets, retrieval_query(inputs), top_k) if top_k is not None else None
+    try:
+        return render_element_prompt(
+            element_type.upper(),
+            fields=inputs.get('fields'),
+            notes=inputs.get('notes'),
+            gems=inputs.get('gems'),
+            assets=assets,
+            iteration=inputs.get('iteration'),
+            template=inputs.get('template'),
+            budget=budget,
+            asset_format=inputs.get('assetFormat'),
+            selected=selected,
+        )
+    except PromptError as e:
+        raise TaskError(str(e))
+
+
+TEXT_TOOL_PROMPTS = {
+    'rephrase': 'Rephrase the following text to be clearer and more engaging, while maintaining the original meaning:\n\n"{text}"',
+    'shorten': 'Shorten the following text, keeping the core meaning concise:\n\n"{text}"',
+    'expand': 'Expand upon the following text, adding more detail and description:\n\n"{text}"',
+    'custom': 'Apply the following instruction to the text below:\n\nInstruction: "{instruction}"\n\nText: "{text}"',
+}
+
+
+def text_tool_prompt(inputs):
+    action, text = _require(inputs, 'action', 'text')
+    template = TEXT_TOOL_PROMPTS.get(action)
+    if template is None:
+        raise TaskError(f"Unknown text tool action: {action}.")
+    instruction = _require(inputs, 'instruction')[0] if action == 'custom' else ''
+    return template.format(text=text, instruction=instruction)
+
+
+def outline_prompt(inputs):
+    concept, = _require(inputs, 'concept')
+    return ('You are AIME, a master storyteller. Based on the following concept, generate a detailed 5-step plot outline. '
+            'For each step, provide a "Title:" and a "Description:".\n\n--- CONCEPT ---\n' + concept)
+
+
+def treatment_prompt(inputs):
+    outline, = _require(inputs, 'outline')
+    return ('You are AIME, a master storyteller. Based on the following outline, write a detailed story treatment. '
+            'Expand on the plot points, describe character emotions, and flesh out the scenes.\n\n--- OUTLINE ---\n' + outline)
+
+
+def chat_prompt(inputs):
+    message, = _require(inputs, 'message')
+    return build_chat_prompt(message, inputs.get('context'))
+
+
+# --- Task Registry ---
+# Every browser-side generation goes through /api/generate under one of these task types.
+TASKS = {
+    'element': Task(DEFAULT_TASK_MODEL, element_prompt),
+    'writer': Task(DEFAULT_TASK_MODEL, writer_prompt),
+    'module': Task(DEFAULT_TASK_MODEL, prompt_input),
+    'scenario': Task(DEFAULT_TASK_MODEL, element_prompt),
+    'text-tool': Task(DEFAULT_TASK_MODEL, text_tool_prompt),
+    'outline': Task(DEFAULT_TASK_MODEL, outline_prompt),
+    'treatment': Task(DEFAULT_TASK_MODEL, treatment_prompt),
+    'chat': Task(CHAT_MODEL, chat_prompt),
+}
+
+
+def build_task_request(task_name, inputs, model=None, generation_config=None):
+    """
+    Returns the TaskRequest for a task. Its context report is None and its lore empty for tasks
+    without assets. Raises TaskError for unknown tasks, bad inputs or a generationConfig that is not an object.
+    """
+    task = TASKS.get(task_name)
+    if task is None:
+        raise TaskError(f"Unknown task type: {task_name}.")
+    if not isinstance(inputs, dict):
+        raise TaskError("Task inputs must be an object.")
+    if generation_config is not None and not isinstance(generation_config, dict):
+        raise TaskError("generationConfig must be an object.")
+    prompt = task.build_prompt(inputs)
+    if isinstance(prompt, str):
+        prompt = SuperPrompt(prompt, '', prompt, None)
+    body = build_chat_payload(prompt.text)
+    if generation_config:
+        body["generationConfig"] = generation_config
+    return TaskRequest(model or task.model, body, prompt.context, prompt.lore, prompt.instructions)
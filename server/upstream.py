@@ -0,0 +1,205 @@
+import os
+import socket
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+from metrics import get_metrics, model_label
+from ratelimit import verify_accepted_key
+from request_log import annotate, phase
+from resilience import CONNECT_TIMEOUT, HEDGE_ENABLED, REQUEST_THREADS, get_resilience
+
+# --- Pool Configuration ---
+# Connections kept per upstream host: by default one per request thread (AIME_THREADS), or two when hedging,
+# as a hedged call holds a connection for each attempt. Streamed replies hold theirs until they end.
+POOL_SIZE = int(os.getenv('AIME_UPSTREAM_POOL_SIZE', str(REQUEST_THREADS * (2 if HEDGE_ENABLED else 1))))
+# Number of distinct host pools to keep around (generativelanguage, aiplatform, ...)
+POOL_HOSTS = int(os.getenv('AIME_UPSTREAM_POOL_HOSTS', '4'))
+# When true, requests beyond POOL_SIZE wait for a free connection instead of opening a throwaway one
+POOL_BLOCK = os.getenv('AIME_UPSTREAM_POOL_BLOCK', 'true').lower() == 'true'
+# Seconds such a request waits for a free connection before it is answered with a 503
+POOL_TIMEOUT = float(os.getenv('AIME_UPSTREAM_POOL_TIMEOUT', '5'))
+# Seconds of idleness before the OS starts TCP keep-alive probes on pooled connections (0 disables)
+KEEPALIVE_IDLE = int(os.getenv('AIME_UPSTREAM_KEEPALIVE_IDLE', '60'))
+
+
+class PoolExhausted(requests.exceptions.RequestException):
+    """
+    No pooled connection to the host freed up within the pool timeout. It is not retried, as every attempt
+    would queue behind the same busy connections; the request is answered with a 503 instead.
+    """
+    status_code = 503
+
+
+class _BoundedWait:
+    # urllib3 waits forever for a connection from a full blocking pool; this pool waits `pool_timeout`
+    pool_timeout = None
+
+    def _get_conn(self, timeout=None):
+        return super()._get_conn(timeout=self.pool_timeout if timeout is None else timeout)
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose pooled sockets have TCP keep-alive enabled, and whose callers wait at most
+    `pool_timeout` seconds for a connection when the pool blocks. It never retries by itself: retries
+    are resilience.py's, under the route's deadline.
+    """
+
+    def __init__(self, keepalive_idle=KEEPALIVE_IDLE, pool_timeout=POOL_TIMEOUT, **kwargs):
+        self.keepalive_idle = keepalive_idle
+        self.pool_timeout = pool_timeout
+        super().__init__(max_retries=0, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keepalive_idle > 0:
+            options = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+                       (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle))
+            kwargs['socket_options'] = options
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: type(base.__name__, (_BoundedWait, base), {'pool_timeout': self.pool_timeout})
+            for scheme, base in (('http', HTTPConnectionPool), ('https', HTTPSConnectionPool))
+        }
+
+
+class UpstreamClient:
+    """
+    A single pooled HTTP client shared by every route that talks to the AI service.
+    Connections are pooled per host and reused across /api/proxy, /api/chat and /api/image.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, pool_hosts=POOL_HOSTS, pool_block=POOL_BLOCK,
+                 keepalive_idle=KEEPALIVE_IDLE, pool_timeout=POOL_TIMEOUT):
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self.session = requests.Session()
+        self.adapter = KeepAliveAdapter(
+            keepalive_idle=keepalive_idle,
+            pool_timeout=pool_timeout,
+            pool_connections=pool_hosts,
+            pool_maxsize=pool_size,
+            pool_block=pool_block,
+        )
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self._lock = threading.Lock()
+        self._in_flight = defaultdict(int)
+        self._requests = defaultdict(int)
+        self._exhausted = defaultdict(int)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        host = urlsplit(url).netloc
+        with self._lock:
+            self._in_flight[host] += 1
+            self._requests[host] += 1
+        started = get_metrics().upstream_started(url)
+        status = body = None
+        try:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except EmptyPoolError as e:
+                with self._lock:
+                    self._exhausted[host] += 1
+                raise PoolExhausted(f"No upstream connection to {host} became free: {e}") from e
+            status = response.status_code
+            verify_accepted_key(kwargs.get('params'), status)
+            if not kwargs.get('stream'):
+                body = response.content
+            return response
+        finally:
+            with self._lock:
+                self._in_flight[host] -= 1
+            get_metrics().upstream_finished(url, status, started, body)
+
+    def stats(self):
+        """Returns per-host pool statistics: connections in use, idle and requests waiting."""
+        idle_by_host = {}
+        opened_by_host = {}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+            # The pool queue holds idle connections, padded with None for unopened slots
+            idle_by_host[host] = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+            opened_by_host[host] = pool.num_connections
+
+        with self._lock:
+            in_flight = dict(self._in_flight)
+            requests_by_host = dict(self._requests)
+            exhausted = dict(self._exhausted)
+
+        hosts = {}
+        for host in set(idle_by_host) | set(in_flight):
+            active = in_flight.get(host, 0)
+            hosts[host] = {
+                "in_use": min(active, self.pool_size),
+                # Only a blocking pool makes callers queue for a connection
+                "waiting": max(0, active - self.pool_size) if self.pool_block else 0,
+                "idle": idle_by_host.get(host, 0),
+                "opened": opened_by_host.get(host, 0),
+                "requests": requests_by_host.get(host, 0),
+                "exhausted": exhausted.get(host, 0),
+            }
+
+        return {
+            "pool_size": self.pool_size,
+            "pool_block": self.pool_block,
+            "hosts": hosts,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide UpstreamClient, creating it on first use (i.e. after any fork)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamClient()
+    return _client
+
+
+def resilient_post(route, url, hedge=False, **kwargs):
+    """
+    POSTs through the shared client under the route's deadline, retry and hedging policy
+    (see resilience.py). Retryable failures that outlast the policy are returned or raised as usual.
+    """
+    client = get_client()
+
+    def send(remaining):
+        # requests has no total timeout; the read timeout bounds each wait for data by the time left
+        remaining = max(remaining, 0.001)
+        return client.post(url, timeout=(min(CONNECT_TIMEOUT, remaining), remaining), **kwargs)
+
+    annotate(model=model_label(url))
+    # The request's upstream phase: every attempt, backoff and hedge, until an answer is kept
+    with phase('upstream'):
+        return get_resilience().call(
+            route, send,
+            discard=lambda response: response.close(),
+            retry_exceptions=(requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+            hedge=hedge,
+            latency_key=url,
+        )
@@ -0,0 +1,384 @@
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the server runs as a single process
+    fcntl = None
+
+# NumPy is optional: install `numpy` to add semantic (embedding) matching to lore retrieval. Without it
+# retrieval.py uses the keyword index alone.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# --- Vector Index Configuration ---
+VECTOR_DIR = os.getenv('AIME_VECTOR_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'vectors'))
+# "hashing" (feature hashing, no model), "local" (a sentence-transformers model on the CPU), "auto" (local if
+# sentence-transformers is installed) or "off"
+VECTOR_EMBEDDER = os.getenv('AIME_EMBEDDER', 'auto').lower()
+VECTOR_LOCAL_MODEL = os.getenv('AIME_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+VECTOR_HASHING_DIM = int(os.getenv('AIME_HASHING_DIM', '512'))
+# Chunks less similar than this to the query do not count as a match (default: the embedder's own threshold)
+VECTOR_MIN_SCORE = float(os.getenv('AIME_VECTOR_MIN_SCORE')) if os.getenv('AIME_VECTOR_MIN_SCORE') else None
+# Chunks kept on disk and in memory (a chunk costs 4 bytes per dimension); past this the least recently used
+# assets are dropped and re-embedded when seen again
+VECTOR_MAX_CHUNKS = int(os.getenv('AIME_VECTOR_MAX_CHUNKS', '100000'))
+
+# Text assets are split at blank lines into chunks of about this many characters
+CHUNK_CHARS = 800
+INITIAL_CAPACITY = 1024
+
+_WORD = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embeddings: words, word pairs and character 4-grams hashed into `dim` signed buckets.
+    Matches shared words and word forms ("insurgent", "insurgency"), not synonyms. The 4-grams carry most
+    of the weight, so a shared stem counts nearly as much as a shared word.
+    """
+    # Hashed vectors of unrelated texts still overlap a little through bucket collisions
+    min_score = 0.12
+
+    def __init__(self, dim=VECTOR_HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        words = _WORD.findall(text.lower())
+        for word in words:
+            yield word, 0.5
+            padded = f"#{word}#"
+            for start in range(len(padded) - 3):
+                yield padded[start:start + 4], 1.0
+        for first, second in zip(words, words[1:]):
+            yield f"{first} {second}", 0.25
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                # crc32 rather than hash(): vectors are persisted, so buckets must not change between runs
+                bucket = zlib.crc32(feature.encode('utf-8'))
+                matrix[row, bucket % self.dim] += weight if bucket & 0x80000000 else -weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+
+class LocalModelEmbedder:
+    """A sentence-transformers model run on the CPU; downloaded once, then works offline."""
+    min_score = 0.3
+
+    def __init__(self, model=VECTOR_LOCAL_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"local-{model}"
+
+    def embed(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def make_embedder(kind=VECTOR_EMBEDDER):
+    """The configured embedder, or None when semantic matching is off or NumPy is missing."""
+    if np is None or kind == 'off':
+        return None
+    if kind in ('local', 'auto'):
+        try:
+            return LocalModelEmbedder()
+        except ImportError:
+            if kind == 'local':
+                raise
+    return HashingEmbedder()
+
+
+def _label(key):
+    return key.replace('-', ' ').replace('_', ' ')
+
+
+def _leaves(value, key):
+    if isinstance(value, dict):
+        for child_key, child in value.items():
+            yield from _leaves(child, str(child_key))
+    elif isinstance(value, list):
+        items = [item for item in value if not isinstance(item, (dict, list))]
+        if items:
+            yield key, '; '.join(str(item) for item in items)
+        for item in value:
+            if isinstance(item, (dict, list)):
+                yield from _leaves(item, key)
+    elif value is not None and str(value).strip():
+        yield key, str(value).strip()
+
+
+def chunk_asset(asset_type, content):
+    """
+    The chunks an asset is embedded as: one per filled-in field of a JSON element (with the element's name
+    and the field label, so "persona role: insurgent commander" carries its context), paragraphs of text.
+    """
+    if asset_type == 'json':
+        try:
+            parsed = json.loads(content)
+        except ValueError:
+            parsed = None
+        if parsed is not None:
+            leaves = [(key, value) for key, value in _leaves(parsed, '') if key not in ('assetType', 'timestamp', 'savedAt')]
+            name = next((value for key, value in leaves if key.endswith('name')), '')
+            prefix = f"{name} - " if name else ''
+            return [f"{prefix}{_label(key)}: {value}" for key, value in leaves]
+    chunks, current = [], ''
+    for paragraph in re.split(r'\n\s*\n', content):
+        if current and len(current) + len(paragraph) > CHUNK_CHARS:
+            chunks.append(current)
+            current = ''
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+class VectorIndex:
+    """
+    Embedded lore chunks in a memory-mapped float32 matrix (`vectors.f32`, one row per chunk) with an
+    append-only ID table (`ids.tsv`: asset reference and chunk number per row). Rows are appended under a
+    file lock, after reading the rows other processes sharing the directory have appended, so workers never
+    write over each other. Past `max_chunks` the least recently used assets are dropped and both files
+    rewritten; an index built with another embedder is started afresh.
+    """
+
+    def __init__(self, root=VECTOR_DIR, embedder=None, max_chunks=VECTOR_MAX_CHUNKS):
+        self.root = root
+        self.embedder = embedder or make_embedder()
+        self.dim = self.embedder.dim
+        self.max_chunks = max_chunks
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()  # ref -> row numbers of its chunks, in least recently used order
+        self._row_refs = []         # row number -> ref
+        self._count = 0
+        self._matrix = None
+        self._ids_read = None       # (inode, bytes read) of the ID table
+        self.searches = 0
+        self.evictions = 0
+        self.compactions = 0
+        os.makedirs(root, exist_ok=True)
+        with self._file_lock():
+            self._load()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def _file_lock(self):
+        # Serializes changes to the files between processes (gunicorn workers) sharing the directory
+        if fcntl is None:
+            yield
+            return
+        with open(self._path('index.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _meta(self):
+        return {"embedder": self.embedder.name, "dim": self.dim}
+
+    def _load(self):
+        try:
+            with open(self._path('meta.json'), encoding='utf-8') as f:
+                fresh = json.load(f) != self._meta()
+        except (OSError, ValueError):
+            fresh = True
+        if fresh:
+            for name in ('vectors.f32', 'ids.tsv'):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            self._write_meta()
+        self._read_ids()
+
+    def _write_meta(self):
+        with open(self._path('meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(self._meta(), f)
+
+    def _stored_capacity(self):
+        try:
+            return max(INITIAL_CAPACITY, os.path.getsize(self._path('vectors.f32')) // (4 * self.dim))
+        except OSError:
+            return INITIAL_CAPACITY
+
+    def _read_ids(self):
+        """
+        Catches up with the ID table: reads the rows appended since the last read (by this process or
+        another), or all of them when the table was rewritten by a compaction. Called under the file lock.
+        """
+        path = self._path('ids.tsv')
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+        inode, size = (stat.st_ino, stat.st_size) if stat else (None, 0)
+        if self._ids_read is None or self._ids_read[0] != inode:
+            self._rows.clear()
+            self._row_refs.clear()
+            self._count = 0
+            self._matrix = None
+            offset = 0
+        else:
+            offset = self._ids_read[1]
+        if self._matrix is None or self._stored_capacity() > self._matrix.shape[0]:
+            self._map(self._stored_capacity())
+        if size > offset:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    ref = line.split(b'\t', 1)[0].decode('utf-8')
+                    # A row whose vector never reached the matrix (interrupted write) ends the table
+                    if not ref or not line.endswith(b'\n') or self._count >= self._matrix.shape[0]:
+                        break
+                    self._rows.setdefault(ref, []).append(self._count)
+                    self._row_refs.append(ref)
+                    self._count += 1
+                    offset += len(line)
+            if offset < size:
+                # Nothing is mid-write under the lock, so the rest is left over from a crash: drop it
+                with open(path, 'ab') as f:
+                    f.truncate(offset)
+        self._ids_read = (inode, offset)
+
+    def _map(self, capacity):
+        path = self._path('vectors.f32')
+        with open(path, 'ab') as f:
+            f.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+    def __contains__(self, ref):
+        with self._lock:
+            return ref in self._rows
+
+    def add(self, ref, asset_type, content):
+        """Embeds and stores the chunks of an asset; already indexed references are marked as recently used."""
+        if ref in self:
+            return
+        chunks = chunk_asset(asset_type, content)
+        if not chunks or len(chunks) > self.max_chunks:
+            return
+        vectors = self.embedder.embed(chunks)
+        with self._lock, self._file_lock():
+            self._read_ids()
+            if ref in self._rows:
+                self._rows.move_to_end(ref)
+                return
+            if self._count + len(chunks) > self.max_chunks:
+                self._compact(len(chunks))
+            start, end = self._count, self._count + len(chunks)
+            if end > self._matrix.shape[0]:
+                self._matrix.flush()
+                self._map(min(max(end, self._matrix.shape[0] * 2), self.max_chunks))
+            self._matrix[start:end] = vectors
+            self._matrix.flush()
+            with open(self._path('ids.tsv'), 'a', encoding='utf-8') as f:
+                f.writelines(f"{ref}\t{number}\n" for number in range(len(chunks)))
+            self._rows[ref] = list(range(start, end))
+            self._row_refs.extend([ref] * len(chunks))
+            self._count = end
+            stat = os.stat(self._path('ids.tsv'))
+            self._ids_read = (stat.st_ino, stat.st_size)
+
+    def _compact(self, needed):
+        """
+        Drops the least recently used assets until `needed` more rows fit in 90% of `max_chunks`, then
+        rewrites both files with the remaining rows, least recently used first. Called under both locks.
+        """
+        target = self.max_chunks * 9 // 10 - needed
+        while self._rows and self._count > target:
+            _, rows = self._rows.popitem(last=False)
+            self._count -= len(rows)
+            self.evictions += 1
+        capacity = min(max(INITIAL_CAPACITY, self._count + needed), self.max_chunks)
+        with open(self._path('vectors.f32.tmp'), 'wb') as f:
+            f.truncate(capacity * self.dim * 4)
+        matrix = np.memmap(self._path('vectors.f32.tmp'), dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+        rows, row_refs = OrderedDict(), []
+        with open(self._path('ids.tsv.tmp'), 'w', encoding='utf-8') as f:
+            for ref, old_rows in self._rows.items():
+                start = len(row_refs)
+                matrix[start:start + len(old_rows)] = self._matrix[old_rows]
+                f.writelines(f"{ref}\t{number}\n" for number in range(len(old_rows)))
+                rows[ref] = list(range(start, start + len(old_rows)))
+                row_refs.extend([ref] * len(old_rows))
+        matrix.flush()
+        del matrix
+        # The old mapping is released first (Windows cannot replace a mapped file). Without meta.json the next
+        # start begins afresh, so an interrupted swap never pairs the new vectors with the old IDs.
+        self._matrix = None
+        os.remove(self._path('meta.json'))
+        os.replace(self._path('vectors.f32.tmp'), self._path('vectors.f32'))
+        os.replace(self._path('ids.tsv.tmp'), self._path('ids.tsv'))
+        self._write_meta()
+        self._rows, self._row_refs, self._count = rows, row_refs, len(row_refs)
+        self._map(capacity)
+        stat = os.stat(self._path('ids.tsv'))
+        self._ids_read = (stat.st_ino, stat.st_size)
+        self.compactions += 1
+
+    def search(self, query, candidates=None, k=10, min_score=VECTOR_MIN_SCORE):
+        """
+        The `k` assets whose best chunk is most similar to `query`, as [(ref, score)] with cosine scores of
+        at least `min_score` (default: the embedder's). `candidates` restricts the search to those references.
+        """
+        if min_score is None:
+            min_score = self.embedder.min_score
+        vector = self.embedder.embed([query])[0]
+        with self._lock:
+            self.searches += 1
+            if candidates is None:
+                rows = np.arange(self._count)
+                scores = self._matrix[:self._count] @ vector
+            else:
+                for ref in candidates:
+                    if ref in self._rows:
+                        self._rows.move_to_end(ref)
+                rows = np.fromiter((row for ref in candidates for row in self._rows.get(ref, ())), dtype=np.int64)
+                scores = self._matrix[rows] @ vector
+            if not len(rows):
+                return []
+            # Enough of the best rows to cover k assets even when some share an asset
+            top = min(len(rows), k * 8)
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            ranked = [(self._row_refs[rows[position]], float(scores[position])) for position in best]
+        results = {}
+        for ref, score in ranked:
+            if score < min_score or len(results) == k:
+                break
+            results.setdefault(ref, score)
+        return list(results.items())
+
+    def stats(self):
+        with self._lock:
+            return {"embedder": self.embedder.name, "assets": len(self._rows), "chunks": self._count,
+                    "searches": self.searches, "evictions": self.evictions,
+                    "compactions": self.compactions}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index():
+    """Returns the process-wide VectorIndex, or None when semantic matching is unavailable."""
+    global _index
+    if np is None or VECTOR_EMBEDDER == 'off':
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = VectorIndex()
+    return _index
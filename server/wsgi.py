@@ -0,0 +1,4 @@
+# WSGI entry point for production servers: gunicorn -c server/gunicorn.conf.py (see there)
+from app import create_app
+
+app = create_app()
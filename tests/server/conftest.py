@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The server modules import each other as top-level modules (the server is run as `python server/app.py`)
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "server"))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+
+class FakeAIService:
+    """
+    A local stand-in for the generativelanguage API. Records every request it receives and answers
+    with `reply(path, body)`, which tests can replace to script responses. A reply given as a list of
+    chunks is sent as a server-sent event stream, like streamGenerateContent with alt=sse.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.reply = lambda path, body: (200, {"candidates": [{"content": {"parts": [{"text": "Mock reply"}]}}]})
+        handler = self._make_handler()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _make_handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                body = json.loads(raw) if raw else None
+                service.requests.append({"path": self.path, "body": body, "headers": dict(self.headers), "port": self.client_address[1]})
+                status, payload = service.reply(self.path, body)
+                content_type = "application/json; charset=UTF-8"
+                if isinstance(payload, list):
+                    data = b"".join(f"data: {json.dumps(chunk)}\r\n\r\n".encode() for chunk in payload)
+                    content_type = "text/event-stream"
+                else:
+                    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            # cachedContents TTL updates
+            do_PATCH = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def fake_ai_service(monkeypatch):
+    service = FakeAIService()
+    import ai_service
+    monkeypatch.setattr(ai_service, "AI_API_BASE_URL", f"{service.url}/v1beta/models/")
+    monkeypatch.setenv("API_KEY", "test-key")
+    yield service
+    service.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_server_state(tmp_path, monkeypatch):
+    # Fresh process-wide singletons per test, so caches, limits and counters never leak between tests
+    import assets
+    import blobstore
+    import cache
+    import chat_sessions
+    import context_cache
+    import metrics
+    import ratelimit
+    import resilience
+    import retrieval
+    import singleflight
+    import vectors
+    monkeypatch.setattr(assets, "_store", assets.AssetStore(str(tmp_path / "assets")))
+    monkeypatch.setattr(blobstore, "_store", blobstore.BlobStore(str(tmp_path / "blobs")))
+    monkeypatch.setattr(context_cache, "_cache", context_cache.ContextCache(context_cache.LocalContextBackend()))
+    monkeypatch.setattr(chat_sessions, "_store", chat_sessions.ChatSessionStore())
+    monkeypatch.setattr(cache, "_cache", cache.ResponseCache(disk_dir=str(tmp_path / "responses")))
+    monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter())
+    monkeypatch.setattr(singleflight, "_group", singleflight.SingleFlight())
+    monkeypatch.setattr(resilience, "_resilience", resilience.Resilience())
+    monkeypatch.setattr(retrieval, "_index", retrieval.LoreIndex())
+    monkeypatch.setattr(metrics, "_metrics", metrics.Metrics(directory=""))
+    # Semantic matching uses the model-free embedder in tests (and is skipped where NumPy is not installed)
+    monkeypatch.setattr(vectors, "_index", vectors.VectorIndex(str(tmp_path / "vectors"), vectors.HashingEmbedder())
+                        if vectors.np is not None else None)
+    # Keep retry backoff short so tests exercising upstream errors stay fast
+    monkeypatch.setattr(resilience, "BACKOFF_BASE", 0.01)
@@ -0,0 +1,122 @@
+import asyncio
+
+import asgi
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_async_routes_keep_json_contracts(fake_ai_service):
+    """
+    The asyncio app should answer /api/proxy and /api/chat exactly like the Flask app.
+    """
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+
+            # 1. Proxy forwards the body (minus the model) and returns the upstream JSON
+            response = await client.post("/api/proxy", json={"model": "gemini-pro", "contents": [{"parts": [{"text": "Hi"}]}]})
+            assert response.status_code == 200
+            assert (await response.get_json())["candidates"][0]["content"]["parts"][0]["text"] == "Mock reply"
+            assert fake_ai_service.requests[-1]["path"].startswith("/v1beta/models/gemini-pro:generateContent")
+            assert "model" not in fake_ai_service.requests[-1]["body"]
+
+            # 2. Chat wraps the message in the AIME prompt and returns only the reply text
+            response = await client.post("/api/chat", json={"message": "Help", "context": "Chapter 1"})
+            assert await response.get_json() == {"reply": "Mock reply"}
+
+            # 3. Upstream errors surface with the upstream message and status
+            fake_ai_service.reply = lambda path, body: (429, {"error": {"message": "Quota exceeded"}})
+            response = await client.post("/api/proxy", json={"contents": []})
+            assert response.status_code == 429
+            assert await response.get_json() == {"error": "Quota exceeded"}
+
+    run(scenario())
+
+
+def test_async_chat_stream(fake_ai_service):
+    """
+    The asyncio app should stream chat replies with the same events as the Flask app.
+    """
+    fake_ai_service.reply = lambda path, body: (200, [{"candidates": [{"content": {"parts": [{"text": "Hello"}]}}]}])
+
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            response = await test_app.test_client().post("/api/chat", json={"message": "Hi", "stream": True})
+            assert await response.get_data(as_text=True) == 'data: {"reply": "Hello"}\n\nevent: done\ndata: {}\n\n'
+
+    run(scenario())
+
+
+def test_async_blob_serving():
+    """
+    Blobs served by the asyncio app carry the same strong ETag, immutable caching and Range support.
+    """
+    import blobstore
+
+    data = b"\x89PNG\r\n\x1a\n" + b"x" * 100
+    name = blobstore.get_blob_store().put(data)
+
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+            response = await client.get(f"/blobs/{name}")
+            assert response.status_code == 200
+            assert await response.get_data() == data
+            assert response.headers["ETag"] == f'"{name.split(".")[0]}"'
+            assert "immutable" in response.headers["Cache-Control"]
+
+            response = await client.get(f"/blobs/{name}", headers={"If-None-Match": response.headers["ETag"]})
+            assert response.status_code == 304
+
+            response = await client.get(f"/blobs/{name}", headers={"Range": "bytes=0-3"})
+            assert response.status_code == 206
+            assert await response.get_data() == data[:4]
+
+    run(scenario())
+
+
+def test_both_apps_answer_errors_alike(fake_ai_service):
+    """
+    Parsing and error shaping are shared (api.py), so malformed bodies and upstream failures get the
+    same status and JSON from either app.
+    """
+    import app as server_app
+
+    fake_ai_service.reply = lambda path, body: (429, {"error": {"message": "Quota exceeded"}})
+    cases = [("/api/chat", ["not", "an", "object"]), ("/api/chat", {"message": "Hi"}),
+             ("/api/generate", {"task": "nope"}), ("/api/assets", {"assets": "lore"}), ("/api/batch", 7)]
+    client = server_app.app.test_client()
+    flask_answers = [(r.status_code, r.get_json()) for r in (client.post(path, json=body) for path, body in cases)]
+
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+            answers = []
+            for path, body in cases:
+                response = await client.post(path, json=body)
+                answers.append((response.status_code, await response.get_json()))
+            return answers
+
+    assert run(scenario()) == flask_answers
+    assert [status for status, _ in flask_answers] == [400, 429, 400, 400, 400]
+    assert flask_answers[1] == (429, {"error": "Quota exceeded"})
+
+
+def test_async_lore_generations_are_cached_by_full_prompt(fake_ai_service):
+    """
+    Repeated deterministic element generations with large lore should reach the AI service once.
+    """
+    lore = "The tides of Cyberia answer to the moon-engine. " * 500
+    request = {"task": "element", "generationConfig": {"temperature": 0},
+               "inputs": {"elementType": "SPECIES", "fields": {"species-name": "Abyssals"},
+                          "assets": [{"type": "text", "fileName": "bible.txt", "content": lore, "importance": "High"}]}}
+
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+            return [(await client.post("/api/generate", json=request)).headers["X-AIME-Cache"] for _ in range(3)]
+
+    assert run(scenario()) == ["MISS", "HIT", "HIT"]
+    assert len(fake_ai_service.requests) == 1
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import app as server_app
+import asgi
+import ratelimit
+from assets import AssetStore, asset_ref
+from ratelimit import RateLimiter
+
+WORLD = json.dumps({"assetType": "WORLD", "traits": {"name": "Cyberia"}})
+
+
+def element_inputs(*assets):
+    return {"elementType": "SPECIES", "fields": {"species-name": "Abyssals"}, "assets": list(assets)}
+
+
+def test_store_deduplicates_by_content_and_resolves_references(tmp_path):
+    store = AssetStore(str(tmp_path))
+
+    first = store.put({"type": "json", "content": WORLD})
+    second = store.put({"type": "json", "content": WORLD})
+
+    assert first == {"ref": asset_ref(WORLD), "bytes": len(WORLD), "created": True}
+    assert second["created"] is False
+    assert store.stats()["stored"] == 1
+    resolved = store.resolve([{"type": "json", "ref": first["ref"], "importance": "Crucial"},
+                              {"type": "text", "fileName": "inline.txt", "content": "inline"}])
+    assert resolved[0] == {"type": "json", "ref": first["ref"], "importance": "Crucial", "content": WORLD}
+    assert resolved[1]["content"] == "inline"
+
+
+def test_uploads_are_rate_limited(fake_ai_service, monkeypatch):
+    """
+    /api/assets goes through the per-key rate limiter, charged as a request whatever the upload's size.
+    """
+    monkeypatch.setattr(ratelimit, "_limiter", RateLimiter(requests_per_minute=1, tokens_per_minute=10, max_wait=0))
+    client = server_app.app.test_client()
+    upload = {"assets": [{"type": "json", "content": WORLD}]}
+
+    assert client.post("/api/assets", json=upload).status_code == 200
+    assert client.post("/api/assets", json=upload).status_code == 429
+
+
+def test_generation_expands_asset_references(fake_ai_service):
+    """Lore is uploaded once; generation requests carry only its reference and the server expands it."""
+    client = server_app.app.test_client()
+    uploaded = client.post("/api/assets", json={"assets": [{"type": "json", "content": WORLD}]}).get_json()["assets"]
+    reference = {"type": "json", "fileName": "cyberia.world", "ref": uploaded[0]["ref"], "importance": "Typical"}
+
+    response = client.post("/api/generate", json={"task": "element", "inputs": element_inputs(reference)})
+
+    assert response.status_code == 200
+    prompt = fake_ai_service.requests[-1]["body"]["contents"][0]["parts"][0]["text"]
+    assert '[Reference Asset: WORLD | Importance: Typical]\nname: Cyberia\n' in prompt
+    assert client.get("/api/stats").get_json()["assets"]["resolved"] == 1
+
+
+def test_unknown_references_are_reported_for_upload(fake_ai_service):
+    client = server_app.app.test_client()
+    reference = {"type": "text", "fileName": "notes.txt", "ref": asset_ref("never uploaded")}
+
+    response = client.post("/api/generate", json={"task": "element", "inputs": element_inputs(reference)})
+
+    assert response.status_code == 400
+    assert response.get_json()["missingAssets"] == [reference["ref"]]
+    assert fake_ai_service.requests == []
+
+    # Uploading the missing asset lets the same request through
+    client.post("/api/assets", json={"assets": [{"type": "text", "content": "never uploaded"}]})
+    assert client.post("/api/generate", json={"task": "element", "inputs": element_inputs(reference)}).status_code == 200
+
+
+def test_upload_rejects_bad_assets(fake_ai_service):
+    client = server_app.app.test_client()
+
+    assert client.post("/api/assets", json={"assets": {"type": "text"}}).status_code == 400
+    assert client.post("/api/assets", json={"assets": [{"type": "image", "content": "data:"}]}).status_code == 400
+    bad_ref = client.post("/api/generate", json={"task": "element", "inputs": element_inputs({"type": "text", "ref": "../etc/passwd"})})
+    assert bad_ref.status_code == 400
+
+
+def test_asgi_upload_and_reference(fake_ai_service):
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+            upload = await client.post("/api/assets", json={"assets": [{"type": "text", "content": "The rain never stops."}]})
+            ref = (await upload.get_json())["assets"][0]["ref"]
+            reference = {"type": "text", "fileName": "weather.txt", "ref": ref, "importance": "Typical"}
+            response = await client.post("/api/generate", json={"task": "element", "inputs": element_inputs(reference)})
+            return response.status_code
+
+    assert asyncio.run(scenario()) == 200
+    prompt = fake_ai_service.requests[-1]["body"]["contents"][0]["parts"][0]["text"]
+    assert "- Filename: weather.txt\n--- Text Content ---\nThe rain never stops.\n--- End Content ---\n" in prompt
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+
+import app as server_app
+import asgi
+
+
+def slow_reply(delay):
+    def reply(path, body):
+        prompt = body["contents"][0]["parts"][0]["text"]
+        if "fail" in prompt:
+            return 400, {"error": {"message": "Invalid prompt"}}
+        time.sleep(delay)
+        return 200, {"candidates": [{"content": {"parts": [{"text": f"Reply to {prompt}"}]}}]}
+    return reply
+
+
+def batch_body():
+    return {
+        "parallelism": 4,
+        "jobs": [
+            {"id": "universe", "task": "element", "inputs": {"prompt": "universe"}},
+            {"id": "world", "task": "element", "inputs": {"prompt": "world"}},
+            {"id": "faction", "task": "element", "inputs": {"prompt": "faction"}},
+            {"id": "broken", "task": "element", "inputs": {"prompt": "fail please"}},
+            {"id": "unknown", "task": "sonnet", "inputs": {}},
+        ],
+    }
+
+
+def check_records(records):
+    summary = records[-1]
+    by_id = {record["id"]: record for record in records[:-1]}
+    assert summary["done"] is True
+    assert (summary["succeeded"], summary["failed"]) == (3, 2)
+    assert by_id["world"]["status"] == 200
+    assert by_id["world"]["index"] == 1
+    assert by_id["world"]["result"]["candidates"][0]["content"]["parts"][0]["text"] == "Reply to world"
+    # Failed jobs are reported in their own records without failing the batch
+    assert by_id["broken"] == {"index": 3, "id": "broken", "status": 400, "error": "Invalid prompt"}
+    assert by_id["unknown"]["status"] == 400
+    # Records arrive in completion order: the instant failures come before the slow generations
+    assert {records[0]["id"], records[1]["id"]} == {"broken", "unknown"}
+
+
+def test_batch_runs_jobs_concurrently_and_streams_ndjson(fake_ai_service):
+    """
+    Jobs run side by side, so three 0.5 s generations take about 0.5 s instead of 1.5 s.
+    """
+    fake_ai_service.reply = slow_reply(0.5)
+    client = server_app.app.test_client()
+
+    started = time.monotonic()
+    response = client.post("/api/batch", json=batch_body())
+    records = [json.loads(line) for line in response.data.splitlines()]
+    elapsed = time.monotonic() - started
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    check_records(records)
+    assert elapsed < 1.2
+
+
+def test_batch_rejects_malformed_requests(fake_ai_service):
+    client = server_app.app.test_client()
+    assert client.post("/api/batch", json={"jobs": []}).status_code == 400
+    assert client.post("/api/batch", json={"jobs": ["not a job"]}).status_code == 400
+    assert client.post("/api/batch", json={"jobs": [{}] * 100}).status_code == 400
+    assert client.post("/api/batch", json=[{"task": "chat"}]).get_json() == {"error": "A batch must be a JSON object."}
+
+
+def test_async_batch(fake_ai_service):
+    fake_ai_service.reply = slow_reply(0.5)
+
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+            started = time.monotonic()
+            response = await client.post("/api/batch", json=batch_body())
+            records = [json.loads(line) for line in (await response.get_data()).splitlines()]
+            assert time.monotonic() - started < 1.2
+            check_records(records)
+
+    asyncio.run(scenario())
@@ -0,0 +1,94 @@
+import base64
+import hashlib
+import os
+import time
+
+import api
+import app as server_app
+import credentials
+from blobstore import BlobStore
+from credentials import CredentialManager, StaticTokenSource
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+
+
+def generate_image(fake_ai_service, monkeypatch):
+    monkeypatch.setattr(credentials, "_manager", CredentialManager(StaticTokenSource(project_id="demo"), background=False))
+    monkeypatch.setattr(api, "image_api_url", lambda project_id: f"{fake_ai_service.url}/{project_id}:predict")
+    encoded = base64.b64encode(PNG_BYTES).decode("ascii")
+    fake_ai_service.reply = lambda path, body: (200, {"predictions": [{"bytesBase64Encoded": encoded, "mimeType": "image/png"}]})
+    client = server_app.app.test_client()
+    return client, client.post("/api/image", json={"prompt": "A lighthouse"}).get_json()
+
+
+def test_image_route_returns_content_addressed_url(fake_ai_service, monkeypatch):
+    """
+    Generated images are stored once and referenced by the SHA-256 of their bytes, not inlined as base64.
+    """
+    digest = hashlib.sha256(PNG_BYTES).hexdigest()
+    client, data = generate_image(fake_ai_service, monkeypatch)
+    assert data["imageUrl"] == f"/blobs/{digest}.png"
+
+    response = client.get(data["imageUrl"])
+    assert response.status_code == 200
+    assert response.data == PNG_BYTES
+    assert response.mimetype == "image/png"
+    assert response.headers["ETag"] == f'"{digest}"'
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "max-age=31536000" in response.headers["Cache-Control"]
+
+    # The same image generated again reuses the stored blob
+    _, again = generate_image(fake_ai_service, monkeypatch)
+    assert again["imageUrl"] == data["imageUrl"]
+
+
+def test_blob_conditional_and_range_requests(fake_ai_service, monkeypatch):
+    client, data = generate_image(fake_ai_service, monkeypatch)
+    etag = client.get(data["imageUrl"]).headers["ETag"]
+
+    not_modified = client.get(data["imageUrl"], headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+
+    partial = client.get(data["imageUrl"], headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.data == PNG_BYTES[:8]
+    assert partial.headers["Content-Range"] == f"bytes 0-7/{len(PNG_BYTES)}"
+
+
+def test_unknown_or_malformed_blob_names_are_not_found():
+    client = server_app.app.test_client()
+    assert client.get(f"/blobs/{'0' * 64}.png").status_code == 404
+    assert client.get("/blobs/..%2Fapp.py").status_code == 404
+    assert client.get(f"/blobs/{'0' * 64}.exe").status_code == 404
+
+
+def test_store_evicts_least_recently_used_blobs_over_its_cap(tmp_path):
+    """
+    Past the total size cap the blobs least recently stored or read are removed; recently read ones stay.
+    """
+    store = BlobStore(str(tmp_path), max_bytes=3500)
+    names = []
+    for fill in b"abc":
+        names.append(store.put(bytes([fill]) * 1000))
+        time.sleep(0.01)
+    assert store.read(names[0]) is not None
+    os.utime(store.open(names[0])[0], (time.time() + 1, time.time() + 1))
+    store.put(b"d" * 1000)
+
+    assert store.read(names[0]) is not None
+    assert store.open(names[1]) is None
+    assert store.stats()["evictions"] >= 1
+    assert store.stats()["bytes"] == 3000
+
+
+def test_store_keeps_every_blob_by_default(tmp_path):
+    """
+    Saved projects refer to generated images by their blob URL, so the image store has no cap unless one is set.
+    """
+    store = BlobStore(str(tmp_path))
+    names = [store.put(bytes([fill]) * 1000) for fill in b"abcd"]
+
+    assert store.max_bytes == 0
+    assert all(store.open(name) is not None for name in names)
+    assert store.stats()["evictions"] == 0 and store.stats()["bytes"] == 4000
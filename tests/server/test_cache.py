@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+import app as server_app
+import cache
+from cache import CachedResponse, ResponseCache, cache_key
+
+
+@pytest.fixture
+def response_cache(tmp_path, monkeypatch):
+    instance = ResponseCache(enabled=True, disk_dir=str(tmp_path / "responses"))
+    monkeypatch.setattr(cache, "_cache", instance)
+    return instance
+
+
+def test_deterministic_generations_are_served_from_cache(fake_ai_service, response_cache):
+    """
+    A temperature-0 request should hit the upstream once and be answered from the cache afterwards.
+    """
+    client = server_app.app.test_client()
+    payload = {"model": "gemini-pro", "contents": [{"parts": [{"text": "Name a moon"}]}], "generationConfig": {"temperature": 0}}
+
+    first = client.post("/api/proxy", json=dict(payload))
+    second = client.post("/api/proxy", json=dict(payload))
+
+    assert first.headers["X-AIME-Cache"] == "MISS"
+    assert second.headers["X-AIME-Cache"] == "HIT"
+    assert first.get_data() == second.get_data()
+    assert len(fake_ai_service.requests) == 1
+
+
+def test_sampled_generations_bypass_unless_opted_in(fake_ai_service, response_cache):
+    """
+    Non-zero temperatures go upstream every time unless the client sends {"cache": true}.
+    """
+    client = server_app.app.test_client()
+    payload = {"contents": [], "generationConfig": {"temperature": 0.9}}
+
+    assert client.post("/api/proxy", json=dict(payload)).headers["X-AIME-Cache"] == "BYPASS"
+    assert client.post("/api/proxy", json=dict(payload)).headers["X-AIME-Cache"] == "BYPASS"
+    assert len(fake_ai_service.requests) == 2
+
+    assert client.post("/api/proxy", json=dict(payload, cache=True)).headers["X-AIME-Cache"] == "MISS"
+    assert client.post("/api/proxy", json=dict(payload, cache=True)).headers["X-AIME-Cache"] == "HIT"
+    assert "cache" not in fake_ai_service.requests[-1]["body"]
+
+    chat = {"message": "Ideas?", "context": "Draft", "cache": True}
+    assert client.post("/api/chat", json=chat).headers["X-AIME-Cache"] == "MISS"
+    hit = client.post("/api/chat", json=chat)
+    assert hit.headers["X-AIME-Cache"] == "HIT"
+    assert hit.get_json() == {"reply": "Mock reply"}
+
+
+def test_disk_tier_survives_restart_and_respects_limits(tmp_path):
+    """
+    Entries persist on disk across cache instances, expire after the TTL and are evicted over the size cap.
+    """
+    disk_dir = str(tmp_path / "responses")
+    entry = CachedResponse(200, "application/json", b"x" * 400)
+
+    ResponseCache(disk_dir=disk_dir).set("a" * 64, entry)
+    assert ResponseCache(disk_dir=disk_dir).get("a" * 64) == entry
+
+    expired = ResponseCache(disk_dir=disk_dir, disk_ttl=-1)
+    assert expired.get("a" * 64) is None
+
+    capped = ResponseCache(disk_dir=disk_dir, disk_bytes=1000, memory_items=0)
+    for name in "bcd":
+        capped.set(name * 64, entry)
+        time.sleep(0.01)
+    assert capped.get("b" * 64) is None
+    assert capped.get("d" * 64) == entry
+
+
+def test_cache_key_is_canonical():
+    """
+    Key order and whitespace in the request body must not change the content address.
+    """
+    assert cache_key("proxy", "m", {"a": 1, "b": [1, 2]}) == cache_key("proxy", "m", {"b": [1, 2], "a": 1})
+    assert cache_key("proxy", "m", {"a": 1}) != cache_key("chat", "m", {"a": 1})
+
+
+def test_rewriting_an_entry_keeps_the_disk_size_exact(tmp_path):
+    """
+    Writing a key again replaces its file, so the tracked size must not count the old bytes as well.
+    """
+    disk_dir = str(tmp_path / "responses")
+    instance = ResponseCache(disk_dir=disk_dir, memory_items=0)
+    instance.set("a" * 64, CachedResponse(200, "application/json", b"x" * 400))
+    instance.set("b" * 64, CachedResponse(200, "application/json", b"y" * 100))
+    for _ in range(3):
+        instance.set("a" * 64, CachedResponse(200, "application/json", b"x" * 400))
+
+    assert instance.stats()["disk_bytes"] == instance._scan_disk_size()
+
+
+def test_entries_are_not_shared_across_api_keys(fake_ai_service, response_cache):
+    """
+    A cached answer is only served to the key it was fetched with; another key goes upstream itself.
+    """
+    client = server_app.app.test_client()
+    payload = {"contents": [], "generationConfig": {"temperature": 0}}
+
+    assert client.post("/api/proxy", json=payload, headers={"X-AIME-API-Key": "key-a"}).headers["X-AIME-Cache"] == "MISS"
+    assert client.post("/api/proxy", json=payload, headers={"X-AIME-API-Key": "key-b"}).headers["X-AIME-Cache"] == "MISS"
+    assert client.post("/api/proxy", json=payload, headers={"X-AIME-API-Key": "key-a"}).headers["X-AIME-Cache"] == "HIT"
+    assert len(fake_ai_service.requests) == 2
+    assert cache_key("proxy", "m", {}, "key-a") != cache_key("proxy", "m", {}, "key-b")
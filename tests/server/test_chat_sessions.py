@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+import app as server_app
+import asgi
+import chat_sessions
+from chat_sessions import ChatSession, ChatSessionStore, SessionError, UnknownSession
+
+
+def reply_with(text):
+    return lambda path, body: (200, {"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+
+def test_session_history_is_sent_with_each_message(fake_ai_service):
+    client = server_app.app.test_client()
+
+    first = client.post("/api/chat", json={"message": "My hero is Mara.", "context": "Chapter 1", "session": True}).get_json()
+    second = client.post("/api/chat", json={"message": "Who is my hero?", "context": "Chapter 2", "session": first["session"]}).get_json()
+
+    assert first["reply"] == "Mock reply" and second["session"] == first["session"]
+    body = fake_ai_service.requests[-1]["body"]
+    assert [(turn["role"], turn["parts"][0]["text"]) for turn in body["contents"]] == [
+        ("user", "My hero is Mara."), ("model", "Mock reply"), ("user", "Who is my hero?")]
+    # Only the current page goes into the system instruction
+    system = body["systemInstruction"]["parts"][0]["text"]
+    assert "Chapter 2" in system and "Chapter 1" not in system
+    # Without a session chat stays stateless
+    assert client.post("/api/chat", json={"message": "Hi"}).get_json() == {"reply": "Mock reply"}
+    assert client.post("/api/chat", json={"message": "Hi", "session": "../../etc"}).status_code == 400
+
+
+def test_long_history_is_rolled_into_a_summary(fake_ai_service, monkeypatch):
+    monkeypatch.setattr(chat_sessions, "CHAT_HISTORY_TOKENS", 300)
+    monkeypatch.setattr(chat_sessions, "CHAT_KEEP_TOKENS", 100)
+    client = server_app.app.test_client()
+    fake_ai_service.reply = reply_with("A long answer. " * 40)
+    session = client.post("/api/chat", json={"message": "Tell me about the docks.", "session": True}).get_json()["session"]
+    client.post("/api/chat", json={"message": "And the cathedral?", "session": session})
+
+    fake_ai_service.reply = lambda path, body: reply_with("SUMMARY: docks and cathedral discussed.")(path, body) \
+        if "running summary" in body["contents"][0]["parts"][0]["text"] else reply_with("Short.")(path, body)
+    client.post("/api/chat", json={"message": "Now the spire.", "session": session})
+
+    body = fake_ai_service.requests[-1]["body"]
+    assert "SUMMARY: docks and cathedral discussed." in body["systemInstruction"]["parts"][0]["text"]
+    assert [turn["parts"][0]["text"] for turn in body["contents"]][-3:] == ["And the cathedral?", "A long answer. " * 40, "Now the spire."]
+    assert "Tell me about the docks." not in str(body["contents"])
+    assert client.get("/api/stats").get_json()["chat_sessions"]["compactions"] == 1
+
+
+def test_failed_summary_still_bounds_the_history():
+    session = ChatSession("s" * 16)
+    for number in range(6):
+        session.record(f"question {number} " * 50, f"answer {number} " * 50)
+
+    folded = session.due_for_compaction(threshold=500, keep=200)
+    session.compact(folded, session.snapshot()[0])
+
+    # Everything but the latest exchange, which is always kept verbatim
+    assert len(folded) == 10
+    assert session.snapshot() == ('', [("user", "question 5 " * 50), ("model", "answer 5 " * 50)])
+
+
+def test_sessions_are_scoped_to_their_api_key_and_expire():
+    store = ChatSessionStore(ttl=60, max_sessions=2)
+    mine = store.open(True, "key-1")
+    mine.record("hello", "hi")
+
+    assert store.open(mine.id, "key-1") is mine
+    with pytest.raises(UnknownSession):
+        store.open(mine.id, "key-2")
+    with pytest.raises(UnknownSession):
+        store.open("a" * 16, "key-1")  # ids are only issued by the store
+    store.open(True, "key-1")
+    store.open(True, "key-1")
+    with pytest.raises(UnknownSession):
+        store.open(mine.id, "key-1")  # evicted as least recently used
+    with pytest.raises(SessionError):
+        store.open("short", "key-1")
+
+
+def test_unknown_session_starts_over_and_says_so(fake_ai_service):
+    """
+    A session the server does not have (expired, evicted, restarted) is replaced, and the reply flags the reset.
+    """
+    client = server_app.app.test_client()
+
+    reply = client.post("/api/chat", json={"message": "Who is my hero?", "session": "gone-session-0001"}).get_json()
+
+    assert reply["sessionReset"] is True and reply["session"] != "gone-session-0001"
+    again = client.post("/api/chat", json={"message": "Still there?", "session": reply["session"]}).get_json()
+    assert again["session"] == reply["session"] and "sessionReset" not in again
+    assert [turn["parts"][0]["text"] for turn in fake_ai_service.requests[-1]["body"]["contents"]] == [
+        "Who is my hero?", "Mock reply", "Still there?"]
+
+
+def test_async_stream_records_the_session(fake_ai_service):
+    fake_ai_service.reply = lambda path, body: (200, [{"candidates": [{"content": {"parts": [{"text": "Hel"}]}}]},
+                                                      {"candidates": [{"content": {"parts": [{"text": "lo"}]}}]}])
+    session_id = chat_sessions.get_session_store().open(True, "test-key").id
+
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            response = await test_app.test_client().post("/api/chat", json={"message": "Hi", "stream": True, "session": session_id})
+            return await response.get_data(as_text=True)
+
+    assert asyncio.run(scenario()).endswith(f'event: done\ndata: {{"session": "{session_id}"}}\n\n')
+    session = chat_sessions.get_session_store().open(session_id, "test-key")
+    assert session.snapshot()[1] == [("user", "Hi"), ("model", "Hello")]
+
+
+def test_disconnected_stream_records_nothing(fake_ai_service):
+    """A reader that goes away mid-reply leaves the session as it was, so the next turn does not build on half an answer."""
+    fake_ai_service.reply = lambda path, body: (200, [{"candidates": [{"content": {"parts": [{"text": f"part {n} "}]}}]} for n in range(5)])
+    client = server_app.app.test_client()
+    session_id = chat_sessions.get_session_store().open(True, "test-key").id
+
+    response = client.post("/api/chat", json={"message": "Hi", "stream": True, "session": session_id}, buffered=False)
+    first = next(iter(response.response))
+    response.close()
+
+    assert b'"reply": "part 0 "' in first
+    assert chat_sessions.get_session_store().open(session_id, "test-key").snapshot() == ('', [])
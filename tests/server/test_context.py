@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import app as server_app
+import context
+import prompts
+
+
+def lore(name, importance, size, annotation=''):
+    return {"type": "text", "fileName": name, "content": f"{name} " * (size // (len(name) + 1)),
+            "importance": importance, "annotation": annotation}
+
+
+def test_packer_fills_budget_by_importance_then_truncates_then_drops(monkeypatch):
+    monkeypatch.setattr(context, "MIN_TRUNCATED_TOKENS", 50)
+    assets = [
+        lore("low.txt", "Low", 2000),
+        lore("typical.txt", "Typical", 2000),
+        lore("noted.txt", "Typical", 2000, annotation="Canon"),
+        lore("high.txt", "High", 2000),
+    ]
+
+    section, report = prompts.render_assets(assets, budget=1300)
+
+    statuses = {asset["fileName"]: asset["status"] for asset in report["assets"]}
+    assert statuses == {"high.txt": "included", "noted.txt": "included", "typical.txt": "truncated", "low.txt": "dropped"}
+    assert [asset["fileName"] for asset in report["assets"]] == ["high.txt", "noted.txt", "typical.txt", "low.txt"]
+    assert report["tokens"] <= report["budget"] == 1300
+    assert context.estimate_tokens(section) <= 1300 + 20
+    assert section.index("high.txt") < section.index("noted.txt") < section.index("typical.txt")
+    assert context.TRUNCATION_MARKER in section
+    assert "low.txt" not in section
+
+
+def test_every_importance_level_the_pages_offer_has_a_rank():
+    levels = ["Non-Informative", "Low", "High", "Typical", None]
+    ranked = sorted(levels, key=lambda level: context.priority({"importance": level}))
+    assert ranked == ["High", "Typical", None, "Low", "Non-Informative"]
+
+
+def test_unlimited_budget_includes_everything():
+    assets = [lore("a.txt", "Low", 4000), lore("b.txt", "High", 4000)]
+
+    section, report = prompts.render_assets(assets, budget=0)
+
+    assert {asset["status"] for asset in report["assets"]} == {"included"}
+    assert context.TRUNCATION_MARKER not in section
+
+
+def test_requested_budget_is_capped_and_validated(monkeypatch):
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGET", 1000)
+    assert context.context_budget(None) == 1000
+    assert context.context_budget(200) == 200
+    assert context.context_budget("50000") == 1000
+    with pytest.raises(ValueError):
+        context.context_budget(-5)
+
+
+def test_gateway_reports_packing_in_a_header(fake_ai_service):
+    inputs = {"elementType": "SPECIES", "fields": {"species-name": "Abyssals"}, "contextBudget": 600,
+              "assets": [lore("bible.txt", "Low", 20000), lore("core.txt", "High", 400)]}
+
+    response = server_app.app.test_client().post("/api/generate", json={"task": "element", "inputs": inputs})
+
+    assert response.status_code == 200
+    summary = json.loads(response.headers["X-AIME-Context"])
+    assert (summary["budget"], summary["truncated"], summary["dropped"]) == (600, [0], [])
+    assert summary["tokens"] <= 600
+    prompt = fake_ai_service.requests[-1]["body"]["contents"][0]["parts"][0]["text"]
+    assert prompt.index("core.txt") < prompt.index("bible.txt")
@@ -0,0 +1,133 @@
+import threading
+import time
+
+import app as server_app
+import context_cache
+from context_cache import ContextCache, LocalContextBackend, UpstreamContextBackend
+from tasks import WRITER_ASSETS_HEADING, build_task_request
+
+BIBLE = "The tides of Cyberia answer to the moon-engine. " * 500
+
+
+def element_inputs():
+    return {"elementType": "SPECIES", "fields": {"species-name": "Abyssals"},
+            "assets": [{"type": "text", "fileName": "bible.txt", "content": BIBLE, "importance": "High"}]}
+
+
+def sent_body(fake_ai_service):
+    return next(request["body"] for request in reversed(fake_ai_service.requests) if "cachedContents" not in request["path"])
+
+
+def test_repeated_lore_is_cached_on_second_use(fake_ai_service):
+    client = server_app.app.test_client()
+    backend = context_cache.get_context_cache().backend
+
+    client.post("/api/generate", json={"task": "element", "inputs": element_inputs()})
+    first = sent_body(fake_ai_service)
+    client.post("/api/generate", json={"task": "element", "inputs": element_inputs()})
+    second = sent_body(fake_ai_service)
+    client.post("/api/generate", json={"task": "element", "inputs": element_inputs()})
+
+    assert "cachedContent" not in first and BIBLE[:60] in first["contents"][0]["parts"][0]["text"]
+    assert second["cachedContent"] == "cachedContents/local-1"
+    instructions = second["contents"][0]["parts"][0]["text"]
+    assert BIBLE[:60] not in instructions and "Abyssals" in instructions
+    assert BIBLE[:60] in backend.entries["cachedContents/local-1"]["text"]
+    stats = client.get("/api/stats").get_json()["context_cache"]
+    assert (stats["created"], stats["hits"], stats["entries"]) == (1, 1, 1)
+
+
+def test_repeated_deterministic_lore_generation_reaches_upstream_once(fake_ai_service):
+    client = server_app.app.test_client()
+    request = {"task": "element", "inputs": element_inputs(), "generationConfig": {"temperature": 0}}
+
+    states = [client.post("/api/generate", json=request).headers["X-AIME-Cache"] for _ in range(3)]
+
+    assert states == ["MISS", "HIT", "HIT"]
+    assert len(fake_ai_service.requests) == 1
+    assert client.get("/api/stats").get_json()["context_cache"]["created"] == 0
+
+
+def test_concurrent_lore_generations_share_one_upstream_call(fake_ai_service):
+    def slow_reply(path, body):
+        time.sleep(0.3)
+        return 200, {"candidates": [{"content": {"parts": [{"text": "Shared"}]}}]}
+    fake_ai_service.reply = slow_reply
+    client = server_app.app.test_client()
+
+    # Were each request to prepare its own body, the second would register the lore and go out on its own
+    threads = [threading.Thread(target=client.post, args=("/api/generate",),
+                                kwargs={"json": {"task": "element", "inputs": element_inputs()}}) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert len(fake_ai_service.requests) == 1
+    assert client.get("/api/stats").get_json()["singleflight"] == {"executed": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_entries_near_expiry_are_extended():
+    backend = LocalContextBackend()
+    cache = ContextCache(backend, min_tokens=1, min_uses=1, ttl=600, refresh_margin=120)
+    body = {"contents": [{"parts": [{"text": "lore + ask"}]}]}
+
+    name = cache.prepare("key", "gemini", body, "lore", "ask")["cachedContent"]
+    backend.entries[name]["expires_at"] = time.time() + 30
+    cache._entries[cache.key("key", "gemini", "lore")][1] = time.time() + 30
+
+    assert cache.prepare("key", "gemini", body, "lore", "ask")["cachedContent"] == name
+    assert backend.entries[name]["expires_at"] > time.time() + 500
+    assert cache.stats()["extended"] == 1
+
+
+def test_short_or_failing_lore_goes_out_uncached():
+    class Broken(LocalContextBackend):
+        def create(self, *args):
+            raise OSError("caching not supported")
+
+    body = {"contents": []}
+    assert ContextCache(LocalContextBackend(), min_tokens=100, min_uses=1).prepare("k", "m", body, "lore", "ask") is body
+    broken = ContextCache(Broken(), min_tokens=1, min_uses=1)
+    assert broken.prepare("k", "m", body, "lore", "ask") is body
+    assert broken.stats()["failures"] == 1
+
+
+def test_lost_cache_entry_falls_back_to_full_prompt(fake_ai_service):
+    client = server_app.app.test_client()
+    client.post("/api/generate", json={"task": "element", "inputs": element_inputs()})
+
+    def reply(path, body):
+        if "cachedContent" in body:
+            return 404, {"error": {"message": "CachedContent not found (or permission denied)"}}
+        return 200, {"candidates": [{"content": {"parts": [{"text": "Mock reply"}]}}]}
+    fake_ai_service.reply = reply
+
+    response = client.post("/api/generate", json={"task": "element", "inputs": element_inputs()})
+
+    assert response.status_code == 200
+    assert BIBLE[:60] in sent_body(fake_ai_service)["contents"][0]["parts"][0]["text"]
+    assert client.get("/api/stats").get_json()["context_cache"]["invalidated"] == 1
+
+
+def test_upstream_backend_registers_lore(fake_ai_service):
+    fake_ai_service.reply = lambda path, body: (200, {"name": "cachedContents/abc123"})
+
+    name, expires_at = UpstreamContextBackend().create("test-key", "gemini-2.5-flash", "lore", 300)
+
+    request = fake_ai_service.requests[-1]
+    assert name == "cachedContents/abc123" and expires_at > time.time() + 290
+    assert request["path"].startswith("/v1beta/cachedContents?")
+    assert request["body"] == {"model": "models/gemini-2.5-flash", "ttl": "300s",
+                               "contents": [{"role": "user", "parts": [{"text": "lore"}]}]}
+
+
+def test_writer_prompt_splits_off_its_assets():
+    prompt = "Write chapter one." + WRITER_ASSETS_HEADING + "[Asset: notes.txt]"
+
+    task = build_task_request("writer", {"prompt": prompt})
+
+    assert task.instructions == "Write chapter one."
+    assert task.lore == WRITER_ASSETS_HEADING + "[Asset: notes.txt]"
+    assert task.body["contents"][0]["parts"][0]["text"] == prompt
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import api
+import app as server_app
+import credentials
+from credentials import CredentialManager, StaticTokenSource
+
+
+def test_token_is_fetched_once_for_concurrent_requests():
+    """
+    Many simultaneous image requests should share a single credential load.
+    """
+    source = StaticTokenSource("token-1")
+    manager = CredentialManager(source, background=False)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(manager.get_token())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert source.fetches == 1
+    assert set(results) == {("token-1", None)}
+
+
+def test_background_refresh_replaces_token_before_expiry():
+    """
+    A token inside the refresh margin keeps being served while the background thread renews it.
+    """
+    source = StaticTokenSource("token", lifetime=0.5)
+    manager = CredentialManager(source, refresh_margin=0.3)
+
+    assert manager.get_token() == ("token", None)
+    deadline = time.time() + 2
+    while source.fetches < 2 and time.time() < deadline:
+        # Never blocks: either the current token or the refreshed one comes straight from the cache
+        assert manager.cached_token() is not None
+        time.sleep(0.02)
+    assert source.fetches >= 2
+
+
+def test_image_route_uses_cached_token(fake_ai_service, monkeypatch):
+    """
+    /api/image should authenticate with the cached token instead of loading credentials per request.
+    """
+    source = StaticTokenSource("cached-token", project_id="demo-project")
+    monkeypatch.setattr(credentials, "_manager", CredentialManager(source, background=False))
+    monkeypatch.setattr(api, "image_api_url", lambda project_id: f"{fake_ai_service.url}/{project_id}:predict")
+    fake_ai_service.reply = lambda path, body: (200, {"predictions": [{"bytesBase64Encoded": "iVBORw0KGgo="}]})
+    client = server_app.app.test_client()
+
+    for _ in range(2):
+        response = client.post("/api/image", json={"prompt": "A lighthouse"})
+        assert response.status_code == 200
+
+    assert source.fetches == 1
+    assert fake_ai_service.requests[-1]["path"] == "/demo-project:predict"
+    assert fake_ai_service.requests[-1]["headers"]["Authorization"] == "Bearer cached-token"
@@ -0,0 +1,64 @@
+import asyncio
+
+import app as server_app
+import asgi
+
+
+def test_gateway_builds_task_prompt_and_returns_upstream_json(fake_ai_service):
+    """
+    /api/generate turns a task type and structured inputs into the generateContent call the bundles used to make.
+    """
+    client = server_app.app.test_client()
+    response = client.post("/api/generate", json={"task": "text-tool", "inputs": {"action": "shorten", "text": "A long day"}},
+                           headers={"X-AIME-API-Key": "user-key"})
+
+    assert response.status_code == 200
+    assert response.get_json()["candidates"][0]["content"]["parts"][0]["text"] == "Mock reply"
+    upstream = fake_ai_service.requests[-1]
+    assert upstream["path"].startswith("/v1beta/models/gemini-2.5-flash-lite:generateContent")
+    assert "key=user-key" in upstream["path"]
+    assert upstream["body"] == {"contents": [{"parts": [{"text": 'Shorten the following text, keeping the core meaning concise:\n\n"A long day"'}]}]}
+
+
+def test_gateway_passes_prompts_and_options_through(fake_ai_service):
+    client = server_app.app.test_client()
+    body = {"task": "element", "inputs": {"prompt": "Forge a species"}, "model": "gemini-pro",
+            "generationConfig": {"temperature": 0}}
+
+    first = client.post("/api/generate", json=body)
+    second = client.post("/api/generate", json=body)
+
+    assert fake_ai_service.requests[-1]["path"].startswith("/v1beta/models/gemini-pro:generateContent")
+    assert fake_ai_service.requests[-1]["body"]["generationConfig"] == {"temperature": 0}
+    # Deterministic gateway requests are cached like /api/proxy requests
+    assert (first.headers["X-AIME-Cache"], second.headers["X-AIME-Cache"]) == ("MISS", "HIT")
+    assert len(fake_ai_service.requests) == 1
+
+
+def test_gateway_rejects_unknown_tasks_and_missing_inputs(fake_ai_service):
+    client = server_app.app.test_client()
+
+    response = client.post("/api/generate", json={"task": "poem", "inputs": {"prompt": "x"}})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Unknown task type: poem."}
+
+    response = client.post("/api/generate", json={"task": "outline", "inputs": {}})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Missing required input(s): concept."}
+
+    response = client.post("/api/generate", json={"task": "chat", "inputs": {"message": "x"}, "generationConfig": "hot"})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "generationConfig must be an object."}
+    assert fake_ai_service.requests == []
+
+
+def test_async_gateway(fake_ai_service):
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+            response = await client.post("/api/generate", json={"task": "chat", "inputs": {"message": "Help"}})
+            assert response.status_code == 200
+            assert (await response.get_json())["candidates"][0]["content"]["parts"][0]["text"] == "Mock reply"
+            assert "Help" in fake_ai_service.requests[-1]["body"]["contents"][0]["parts"][0]["text"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import app as server_app
+import asgi
+import metrics
+from metrics import Metrics
+
+
+def usage(prompt, output):
+    return {"promptTokenCount": prompt, "candidatesTokenCount": output, "totalTokenCount": prompt + output}
+
+
+def reply(text, **extra):
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}], **extra}
+
+
+def samples(text):
+    """{"name{labels}": value} of a rendered exposition."""
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if not line.startswith("#")}
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_routes_upstream_latency_and_tokens(fake_ai_service):
+    fake_ai_service.reply = lambda path, body: (200, reply("Mock reply", usageMetadata=usage(12, 5)))
+    client = server_app.app.test_client()
+    # Requests are counted when the server closes the response, after its body has been sent
+    with client.post("/api/proxy", json={"model": "gemini-pro", "contents": []}) as response:
+        assert response.status_code == 200
+    for body, status in (({"message": "Hi"}, 200), ({}, 400)):
+        with client.post("/api/chat", json=body) as response:
+            assert response.status_code == status
+
+    response = client.get("/metrics")
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    found = samples(response.get_data(as_text=True))
+    assert found['aime_http_requests_total{route="/api/proxy",method="POST",status="200"}'] == 1
+    assert found['aime_http_requests_total{route="/api/chat",method="POST",status="400"}'] == 1
+    assert found['aime_http_request_duration_seconds_count{route="/api/chat"}'] == 2
+    assert found['aime_http_requests_in_flight{route="/api/proxy"}'] == 0
+    assert found['aime_upstream_requests_total{model="gemini-pro",status="200"}'] == 1
+    assert found['aime_upstream_duration_seconds_bucket{model="gemini-pro",le="+Inf"}'] == 1
+    assert found['aime_tokens_total{model="gemini-pro",kind="prompt"}'] == 12
+    assert found['aime_tokens_total{model="gemini-pro",kind="output"}'] == 5
+    # /api/stats numbers come along: cache and pool counters
+    assert f'aime_component_stat{{component="cache",stat="misses",pid="{os.getpid()}"}}' in found
+
+
+def test_streamed_usage_and_upstream_errors(fake_ai_service):
+    # Each chunk carries the running usage; the last one is the total
+    fake_ai_service.reply = lambda path, body: (200, [reply("Once", usageMetadata=usage(7, 1)),
+                                                      reply(" upon", usageMetadata=usage(7, 3))])
+    client = server_app.app.test_client()
+    client.post("/api/proxy", json={"model": "gemini-pro", "stream": True, "contents": []}).get_data()
+    fake_ai_service.reply = lambda path, body: (403, {"error": {"message": "Key rejected"}})
+    client.post("/api/proxy", json={"model": "gemini-pro", "contents": []})
+
+    found = samples(metrics.get_metrics().render())
+    assert found['aime_tokens_total{model="gemini-pro",kind="output"}'] == 3
+    assert found['aime_upstream_requests_total{model="gemini-pro",status="403"}'] == 1
+
+
+def test_usage_split_across_chunks_is_found():
+    chunks = [b'data: {"usageMetadata": {"promptTok', b'enCount": 40, "candidatesTokenCount": 9}}\r\n\r\n']
+    assert list(metrics.metered_stream("https://host/v1beta/models/gemini-pro:streamGenerateContent", chunks)) == chunks
+    found = samples(metrics.get_metrics().render())
+    assert found['aime_tokens_total{model="gemini-pro",kind="prompt"}'] == 40
+
+
+def test_worker_files_are_added_up(tmp_path):
+    tmp_path = tmp_path / "metrics"
+    here = Metrics(str(tmp_path), flush_interval=0)
+    here.inc("aime_http_requests_total", ("/api/chat", "POST", 200))
+    here.inc("aime_http_requests_in_flight", ("/api/chat",))
+    here.observe("aime_upstream_duration_seconds", ("gemini-pro",), 0.3)
+    other = {"values": [["aime_http_requests_total", ["/api/chat", "POST", "200"], 2],
+                        ["aime_http_requests_in_flight", ["/api/chat"], 4],
+                        ["aime_upstream_duration_seconds", ["gemini-pro"], [0] * 5 + [1] + [0] * 7 + [2.0]]],
+             "stats": [["cache", "hits", 3]]}
+    (tmp_path / f"{dead_pid()}.json").write_text(json.dumps(other))
+    alive = {"values": [], "stats": [["cache", "hit_rate", 0.25], ["ratelimit", "enabled", 1]]}
+    (tmp_path / f"{os.getppid()}.json").write_text(json.dumps(alive))
+    here.stats = lambda: {"cache": {"hit_rate": 0.75}, "ratelimit": {"enabled": True}}
+
+    found = samples(here.render())
+    assert found['aime_http_requests_total{route="/api/chat",method="POST",status="200"}'] == 3
+    # Gauges and stats of a worker that has exited are dropped, its counters and histograms kept
+    assert found['aime_http_requests_in_flight{route="/api/chat"}'] == 1
+    assert not any(name.startswith('aime_component_stat{component="cache",stat="hits"') for name in found)
+    # Stats of live workers are labelled with their process: rates and settings are not added up
+    assert found[f'aime_component_stat{{component="cache",stat="hit_rate",pid="{os.getpid()}"}}'] == 0.75
+    assert found[f'aime_component_stat{{component="cache",stat="hit_rate",pid="{os.getppid()}"}}'] == 0.25
+    assert found[f'aime_component_stat{{component="ratelimit",stat="enabled",pid="{os.getppid()}"}}'] == 1
+    assert found['aime_upstream_duration_seconds_bucket{model="gemini-pro",le="0.5"}'] == 1
+    assert found['aime_upstream_duration_seconds_bucket{model="gemini-pro",le="2.5"}'] == 2
+    assert found['aime_upstream_duration_seconds_sum{model="gemini-pro"}'] == 2.3
+
+
+def test_exited_workers_are_folded_into_one_file(tmp_path):
+    tmp_path = tmp_path / "metrics"
+    tmp_path.mkdir()
+    for pid in (dead_pid(), dead_pid()):
+        (tmp_path / f"{pid}.json").write_text(json.dumps({"values": [
+            ["aime_tokens_total", ["gemini-pro", "prompt"], 10], ["aime_upstream_in_flight", ["gemini-pro"], 1]]}))
+        metrics.process_exited(pid, str(tmp_path))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["dead.json"]
+    found = samples(Metrics(str(tmp_path), flush_interval=0).render())
+    assert found['aime_tokens_total{model="gemini-pro",kind="prompt"}'] == 20
+    assert not any(name.startswith("aime_upstream_in_flight") for name in found)
+
+
+def test_asgi_metrics(fake_ai_service):
+    fake_ai_service.reply = lambda path, body: (200, reply("Mock reply", usageMetadata=usage(3, 2)))
+
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+            await client.post("/api/proxy", json={"model": "gemini-pro", "contents": []})
+            return await (await client.get("/metrics")).get_data(as_text=True)
+
+    found = samples(asyncio.run(scenario()))
+    assert found['aime_http_requests_total{route="/api/proxy",method="POST",status="200"}'] == 1
+    assert found['aime_tokens_total{model="gemini-pro",kind="output"}'] == 2
+    assert found['aime_http_requests_in_flight{route="/api/proxy"}'] == 0
+
+
+def test_stats_passed_to_render_are_exported():
+    found = samples(Metrics(directory="").render(lambda: {"pool": {"idle": 3, "sizes": {"max": 10}, "name": "x"}}))
+    assert found[f'aime_component_stat{{component="pool",stat="idle",pid="{os.getpid()}"}}'] == 3
+    assert found[f'aime_component_stat{{component="pool",stat="sizes.max",pid="{os.getpid()}"}}'] == 10
+
+
+def test_per_key_stats_are_summed_over_the_keys():
+    keys = {f"key-{number}": {"active": 1, "admitted": number} for number in range(50)}
+
+    found = samples(Metrics(directory="").render(lambda: {"ratelimit": {"enabled": True, "keys": keys}}))
+
+    stats = [name for name in found if name.startswith('aime_component_stat{component="ratelimit"')]
+    assert len(stats) == 3
+    assert found[f'aime_component_stat{{component="ratelimit",stat="keys.active",pid="{os.getpid()}"}}'] == 50
+    assert found[f'aime_component_stat{{component="ratelimit",stat="keys.admitted",pid="{os.getpid()}"}}'] == 1225
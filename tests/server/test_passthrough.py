@@ -0,0 +1,38 @@
+import gzip
+
+import app as server_app
+
+
+def test_proxy_relays_upstream_bytes_verbatim(fake_ai_service):
+    """
+    The proxy should forward the upstream body untouched: no re-serialization, key order preserved.
+    """
+    raw = b'{"zeta": 1, "alpha": {"bytesBase64Encoded": "iVBORw0KGgo="}}'
+    fake_ai_service.reply = lambda path, body: (200, raw)
+    client = server_app.app.test_client()
+
+    response = client.post("/api/proxy", json={"model": "imagen-3", "instances": []}, headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/json; charset=UTF-8"
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data() == raw
+    assert fake_ai_service.requests[-1]["path"].startswith("/v1beta/models/imagen-3:predict")
+
+
+def test_proxy_compresses_for_accepting_clients(fake_ai_service, monkeypatch):
+    """
+    Clients that accept gzip get a gzip-compressed copy of the same bytes.
+    """
+    monkeypatch.setattr("compression.brotli", None)
+    raw = b'{"candidates": [{"content": {"parts": [{"text": "' + b"lore " * 500 + b'"}]}}]}'
+    fake_ai_service.reply = lambda path, body: (200, raw)
+    client = server_app.app.test_client()
+
+    response = client.post("/api/proxy", json={"contents": []}, headers={"Accept-Encoding": "gzip, deflate"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    compressed = response.get_data()
+    assert len(compressed) < len(raw)
+    assert gzip.decompress(compressed) == raw
@@ -0,0 +1,181 @@
+import ast
+import json
+import os
+
+import pytest
+
+import app as server_app
+import prompts
+from tasks import TaskError, build_task_request
+
+USABILITY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'usability')
+CAPTURE_DIR = os.path.join(USABILITY_DIR, 'generated_prompts')
+
+# capture file -> (template, element type, gems selected when it was captured). The captures come from two
+# revisions of craftSuperPrompt: the older "descriptive" one and the current one. WORLD_prompt.txt is a
+# Philosophy page captured with the current code (the capture script named it after the attached WORLD asset).
+CAPTURES = {
+    'FACTION_prompt.txt': ('descriptive', 'FACTION', ["Mega-corporation", "Rigid Hierarchy", "Benevolent & Philanthropic", "Economic Domination", "Lawful Good"]),
+    'PERSONA_prompt.txt': ('descriptive', 'PERSONA', ["Heroic & Grand", "Morally Ambiguous", "Eloquent & Articulate", "Emphasize Strength/Power", "Emotionally Reserved"]),
+    'PHILOSOPHY_prompt.txt': ('descriptive', 'PHILOSOPHY', ["Strict Hierarchy", "Widely Accepted Mainstream", "Dogmatic & Rigid", "Ancient & Fading"]),
+    'SCENE_prompt.txt': ('descriptive', 'SCENE', ["Tense & Suspenseful", "Emphasize Visuals", "Urgent & Fast-Paced", "Formal & Eloquent", "First Person"]),
+    'SETTING_prompt.txt': ('descriptive', 'SETTING', ["Dense Urban Metropolis", "Gothic & Ornate", "Bustling & Lively", "Sparsely Populated", "Pristine & New"]),
+    'SPECIES_prompt.txt': ('descriptive', 'SPECIES', ["Natural Evolution", "Apex Predator", "Hive-Mind/Collective", "Technologically Advanced", "Aggressive & Territorial"]),
+    'TECHNOLOGY_prompt.txt': ('descriptive', 'TECHNOLOGY', ["Sleek & Minimalist", "Formal Technical Manual", "Flawless & Dependable", "Highly Intuitive"]),
+    'UNIVERSE_prompt.txt': ('descriptive', 'UNIVERSE', ["Fantasy", "Cyberpunk-Noir", "Grimdark", "Single Galaxy", "Hard Magic (Rules-based)", "Ancient"]),
+    'WORLD_prompt.txt': (None, 'PHILOSOPHY', ["Strict Hierarchy", "Widely Accepted Mainstream", "Dogmatic & Rigid", "Ancient & Fading"]),
+}
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def usability_assets():
+    # The two assets the usability workflow uploads before generating
+    return [
+        {"type": "text", "fileName": "test_asset.txt", "content": read(os.path.join(USABILITY_DIR, 'test_asset.txt')), "importance": "Typical"},
+        {"type": "json", "fileName": "test_world.world", "content": read(os.path.join(USABILITY_DIR, 'test_world.world')), "importance": "Typical"},
+    ]
+
+
+def captured_inputs(template, element_type, gems):
+    # The usability workflow fills every input with "Test content for <id>" (the current code left notes empty)
+    compiled = prompts.get_template(element_type, template)
+    return {
+        "elementType": element_type,
+        "fields": {field_id: f"Test content for {field_id}" for field_id in compiled.labels},
+        "notes": "Test content for custom-notes" if template == 'descriptive' else "",
+        "gems": gems,
+        "assets": usability_assets(),
+        "template": template,
+    }
+
+
+@pytest.mark.parametrize("capture", sorted(CAPTURES))
+def test_element_prompt_reproduces_captured_prompts(capture):
+    template, element_type, gems = CAPTURES[capture]
+    inputs = captured_inputs(template, element_type, gems)
+
+    prompt = prompts.build_element_prompt(element_type, inputs["fields"], inputs["notes"], gems, inputs["assets"], template=template,
+                                          asset_format='pretty')
+
+    assert prompt == read(os.path.join(CAPTURE_DIR, capture))
+
+
+def test_templates_cover_the_usability_inventory():
+    """Every form in the usability inventory is covered by a template listing exactly the inputs the workflow fills."""
+    with open(os.path.join(USABILITY_DIR, 'test_full_element_workflow.py'), encoding='utf-8') as f:
+        module = ast.parse(f.read())
+    inventory = next(ast.literal_eval(node.value) for node in module.body
+                     if isinstance(node, ast.Assign) and getattr(node.targets[0], 'id', None) == 'ELEMENT_INVENTORY')
+
+    for details in inventory.values():
+        ids = [field_id for fields in details["tabs"].values() for field_id in fields]
+        ids += [field_id for sub_tabs in details.get("sub_tabs", {}).values() for fields in sub_tabs.values() for field_id in fields]
+        ids += details.get("untabbed_fields", [])
+        # The inventory predates some form redesigns, so it matches either the live form or the descriptive capture
+        candidates = [prompts.TEMPLATES[details["type"]], prompts.DESCRIPTIVE_TEMPLATES.get(details["type"])]
+        assert set(ids) - {'custom-notes'} in [set(compiled.labels) for compiled in candidates if compiled], details["type"]
+
+
+def test_element_prompt_orders_fields_and_skips_blank_ones():
+    prompt = prompts.build_element_prompt('SPECIES', {
+        'unknown-field': 'kept, with its id as label',
+        'species-homeworld': '  Deep trenches  ',
+        'species-name': 'Abyssals',
+        'species-concept': '   ',
+    }, notes='  ')
+
+    traits = prompt.split("--- PRIMARY ELEMENT: SPECIES ---\n", 1)[1].split("\n\n", 1)[0]
+    assert traits == "Species Name: Abyssals\nHomeworld / Plane of Origin: Deep trenches\nunknown-field: kept, with its id as label"
+    assert "CUSTOM NOTES" not in prompt
+
+    empty = prompts.build_element_prompt('SPECIES', {})
+    assert "--- PRIMARY ELEMENT: SPECIES ---\n" + prompts.NO_TRAITS in empty
+
+
+def test_scenario_and_iteration_prompts():
+    npc = prompts.build_element_prompt('NPC', {'npc-name': 'Mara'}, gems=["Grim"])
+    assert npc.startswith("You are AIME, an AI world-building assistant for tabletop RPGs.")
+    assert prompts.SCENARIO_INSTRUCTIONS['NPC'] in npc
+    assert "- Grim\n" in npc
+
+    revised = prompts.build_element_prompt('FACTION', {'faction-name': 'ignored'}, iteration={
+        "existingContent": "<h1>The Guild</h1>", "updateInstructions": "Make it darker"})
+    assert "You are in an iteration loop." in revised
+    assert "--- PREVIOUS CONTENT ---\n<h1>The Guild</h1>\n\n--- USER'S UPDATE INSTRUCTIONS ---\nMake it darker\n\n" in revised
+    assert "PRIMARY ELEMENT" not in revised
+    assert revised.endswith(prompts.CREATIVE_OUTRO)
+
+
+def test_assets_skip_non_informative_and_malformed_entries():
+    section, report = prompts.render_assets([
+        {"type": "json", "fileName": "bad.world", "content": "{not json", "importance": "Typical"},
+        {"type": "text", "fileName": "secret.txt", "content": "hidden", "importance": "Non-Informative"},
+        {"type": "json", "fileName": "plain.json", "content": json.dumps({"scale": 2.0, "tags": ["é"]}), "importance": "Crucial", "annotation": "Canon"},
+        {"type": "image", "fileName": "map.png", "content": "data:image/png;base64,AAAA"},
+    ], fmt='pretty')
+
+    assert section == ("\n--- CONTEXTUAL ASSETS (REFERENCE LORE) ---\n"
+                       "\n[Reference Asset: JSON Data | Importance: Crucial]\n  - Director's Note: Canon\n"
+                       '{\n  "scale": 2,\n  "tags": [\n    "é"\n  ]\n}\n')
+    assert [asset["index"] for asset in report["assets"]] == [2]
+
+
+def test_compact_assets_flatten_json_and_drop_boilerplate():
+    saved = {"assetType": "Species Prompt", "savedAt": "2025-10-01T09:00:00.000Z",
+             "fields": {"species-name": "Abyssals", "species-biology": "Gills\nBioluminescent", "species-diet": "",
+                        "species-castes": ["Warden", "", "Drone"], "species-ranks": [{"title": "Elder", "age": 300.0}],
+                        "species-hive": True, "species-origin": None}}
+
+    section, _ = prompts.render_assets([{"type": "json", "fileName": "abyssals.speciesprompt", "content": json.dumps(saved)}],
+                                       fmt='compact')
+
+    assert section.endswith("\n[Reference Asset: Species Prompt | Importance: Typical]\n"
+                            "species-name: Abyssals\nspecies-biology: Gills\n  Bioluminescent\n"
+                            "species-castes: Warden; Drone\nspecies-ranks[0].title: Elder\nspecies-ranks[0].age: 300\n"
+                            "species-hive: true\n")
+    empty = json.dumps({"assetType": "WORLD", "timestamp": "2025-09-30T10:00:00.000Z", "traits": {"name": ""}})
+    assert prompts.render_assets([{"type": "json", "content": empty}], fmt='compact')[0] == ''
+    assert prompts.render_assets([{"type": "text", "content": "x", "importance": "Non-Informative"}])[0] == ''
+    with pytest.raises(prompts.PromptError):
+        prompts.render_assets([], fmt='yaml')
+
+
+def test_element_task_builds_prompt_on_the_server(fake_ai_service):
+    template, element_type, gems = CAPTURES['WORLD_prompt.txt']
+    inputs = dict(captured_inputs(template, element_type, gems), assetFormat='pretty')
+
+    response = server_app.app.test_client().post("/api/generate", json={"task": "element", "inputs": inputs})
+
+    assert response.status_code == 200
+    assert fake_ai_service.requests[-1]["body"]["contents"][0]["parts"][0]["text"] == read(os.path.join(CAPTURE_DIR, 'WORLD_prompt.txt'))
+
+
+def test_default_prompt_differs_from_the_capture_only_in_its_assets():
+    """
+    By default JSON assets are written compactly and the lore is packed into AIME_CONTEXT_TOKEN_BUDGET, so the
+    live prompt is the captured one with its asset section re-serialized. assetFormat "pretty" restores it.
+    """
+    template, element_type, gems = CAPTURES['WORLD_prompt.txt']
+    inputs = captured_inputs(template, element_type, gems)
+    pretty, _ = prompts.render_assets(inputs["assets"], fmt='pretty')
+    compact, _ = prompts.render_assets(inputs["assets"], fmt='compact')
+    capture = read(os.path.join(CAPTURE_DIR, 'WORLD_prompt.txt'))
+
+    prompt = build_task_request('element', inputs).body["contents"][0]["parts"][0]["text"]
+
+    assert prompts.ASSET_FORMAT == 'compact' and pretty in capture
+    assert prompt == capture.replace(pretty, compact)
+    assert "[Reference Asset: WORLD | Importance: Typical]\nname: Cyberia\ngenre: Cyberpunk\n" in prompt and '"assetType"' not in prompt
+
+
+def test_element_task_rejects_unknown_types_and_templates():
+    with pytest.raises(TaskError):
+        build_task_request('element', {"elementType": "DRAGON", "fields": {}})
+    with pytest.raises(TaskError):
+        build_task_request('scenario', {"elementType": "NPC", "template": "verbose"})
+    with pytest.raises(TaskError):
+        build_task_request('element', {"elementType": "SPECIES", "fields": ["species-name"]})
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import app as server_app
+import ratelimit
+from ratelimit import RateLimited, RateLimiter
+
+
+def test_requests_per_minute_bucket_rejects_fast_with_retry_after():
+    """
+    Once a key's request bucket is empty, a request that would wait past the budget is rejected at once.
+    """
+    limiter = RateLimiter(requests_per_minute=2, max_wait=0.5)
+    limiter.verify("key-a")
+    limiter.verify("key-b")
+    limiter.acquire("key-a").release()
+    limiter.acquire("key-a").release()
+
+    started = time.monotonic()
+    with pytest.raises(RateLimited) as excinfo:
+        limiter.acquire("key-a")
+    assert time.monotonic() - started < 0.1
+    assert excinfo.value.retry_after == 30
+
+    # Other tenants are unaffected
+    limiter.acquire("key-b").release()
+
+
+def test_concurrency_cap_queues_then_admits():
+    """
+    A request over the concurrency cap waits in the queue and starts as soon as a slot is released.
+    """
+    limiter = RateLimiter(max_concurrency=1, queue_size=1, max_wait=2)
+    limiter.verify("key")
+    first = limiter.acquire("key")
+    admitted = []
+
+    waiter = threading.Thread(target=lambda: admitted.append(limiter.acquire("key")))
+    waiter.start()
+    time.sleep(0.05)
+
+    # The queue holds one waiter, so a third request is turned away immediately
+    with pytest.raises(RateLimited):
+        limiter.acquire("key")
+
+    first.release()
+    waiter.join(timeout=1)
+    assert len(admitted) == 1
+    assert limiter.stats()["keys"][RateLimiter.identity("key")]["active"] == 1
+
+
+def test_tokens_per_minute_bucket_counts_prompt_size():
+    """
+    Large prompts drain the tokens/minute bucket even when the request count is low.
+    """
+    limiter = RateLimiter(tokens_per_minute=1000, max_wait=0)
+    limiter.acquire("key", tokens=900).release()
+    with pytest.raises(RateLimited):
+        limiter.acquire("key", tokens=500)
+
+
+def test_routes_answer_429_with_retry_after(fake_ai_service, monkeypatch):
+    """
+    A tenant over its limit gets a JSON 429 with Retry-After instead of reaching the AI service.
+    """
+    monkeypatch.setattr(ratelimit, "_limiter", RateLimiter(requests_per_minute=1, max_wait=0))
+    client = server_app.app.test_client()
+
+    client.post("/api/chat", json={"message": "One"}).close()
+    response = client.post("/api/chat", json={"message": "Two"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+    assert response.get_json() == {"error": "Rate limit exceeded for this API key."}
+    assert len(fake_ai_service.requests) == 1
+
+
+def test_only_accepted_keys_get_limits_of_their_own():
+    """
+    Keys the AI service has not accepted share one set of limits, and at most max_keys idle keys are kept.
+    """
+    limiter = RateLimiter(requests_per_minute=1, max_wait=0, max_keys=2)
+    for key in ("key-a", "key-b", "key-c"):
+        limiter.verify(key)
+    assert set(limiter.stats()["keys"]) == {RateLimiter.identity("key-b"), RateLimiter.identity("key-c"),
+                                            RateLimiter.UNVERIFIED}
+
+    limiter.acquire("made-up-1").release()
+    with pytest.raises(RateLimited):
+        limiter.acquire("made-up-2")
+    limiter.acquire("key-c").release()
+
+
+def test_routes_verify_keys_the_ai_service_accepts(fake_ai_service):
+    """
+    A key gets its own limits once an upstream call made with it succeeds.
+    """
+    client = server_app.app.test_client()
+    headers = {"X-AIME-API-Key": "user-key"}
+    assert RateLimiter.identity("user-key") not in ratelimit.get_rate_limiter().stats()["keys"]
+
+    client.post("/api/chat", json={"message": "Hi"}, headers=headers).close()
+
+    assert ratelimit.get_rate_limiter().stats()["keys"][RateLimiter.identity("user-key")]["admitted"] == 0
+
+
+def test_async_waiters_wake_when_a_slot_is_released():
+    """
+    A coroutine queued for a concurrency slot starts as soon as the slot is released, without polling.
+    """
+    limiter = RateLimiter(max_concurrency=1, max_wait=2)
+
+    async def scenario():
+        first = limiter.acquire("key")
+        waiter = asyncio.ensure_future(limiter.acquire_async("key"))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        started = time.monotonic()
+        threading.Thread(target=first.release).start()
+        lease = await waiter
+        lease.release()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.5
+    assert not limiter._async_waiters
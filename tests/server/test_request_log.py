@@ -0,0 +1,98 @@
+import asyncio
+import contextvars
+import io
+import json
+import logging
+import re
+
+import pytest
+
+import app as server_app
+import asgi
+import request_log
+from request_log import JsonFormatter, phase, start_request
+
+
+@pytest.fixture
+def log_lines():
+    """The JSON lines the "aime" logger writes during the test."""
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    previous = request_log.logger.level
+    request_log.logger.addHandler(handler)
+    request_log.logger.setLevel(logging.INFO)
+    yield lambda: [json.loads(line) for line in stream.getvalue().splitlines()]
+    request_log.logger.removeHandler(handler)
+    request_log.logger.setLevel(previous)
+
+
+def server_timing(header):
+    return {name: float(duration) for name, duration in re.findall(r"(\w+);dur=([\d.]+)", header)}
+
+
+def test_generation_reports_its_phases(fake_ai_service, log_lines):
+    client = server_app.app.test_client()
+    with client.post("/api/generate", json={"task": "chat", "inputs": {"message": "Hi"}}) as response:
+        assert response.status_code == 200
+        request_id = response.headers["X-Request-ID"]
+        timings = server_timing(response.headers["Server-Timing"])
+
+    assert re.fullmatch(r"[0-9a-f]{16}", request_id)
+    assert {"parse", "ratelimit", "prompt", "upstream", "total"} <= set(timings)
+    assert timings["upstream"] <= timings["total"]
+    [line] = [line for line in log_lines() if line["message"] == "request"]
+    assert line["request_id"] == request_id and line["route"] == "/api/generate" and line["status"] == 200
+    assert line["model"] and line["cache"] == "BYPASS"
+    assert set(line["phases_ms"]) == set(timings) - {"total"}
+    assert line["duration_ms"] >= timings["upstream"]
+
+
+def test_request_ids_from_a_proxy_are_kept(fake_ai_service):
+    client = server_app.app.test_client()
+    kept = client.post("/api/chat", json={"message": "Hi"}, headers={"X-Request-ID": "lb-1234abcd"})
+    replaced = client.post("/api/chat", json={"message": "Hi"}, headers={"X-Request-ID": "bad id <script>"})
+
+    assert kept.headers["X-Request-ID"] == "lb-1234abcd"
+    assert re.fullmatch(r"[0-9a-f]{16}", replaced.headers["X-Request-ID"])
+    assert "X-Request-ID" in kept.headers["Access-Control-Expose-Headers"]
+
+
+def test_upstream_failures_are_logged_with_their_status(fake_ai_service, log_lines):
+    fake_ai_service.reply = lambda path, body: (403, {"error": {"message": "Key rejected"}})
+    client = server_app.app.test_client()
+    with client.post("/api/proxy", json={"model": "gemini-pro", "contents": []}) as response:
+        assert response.status_code == 403
+
+    [line] = [line for line in log_lines() if line["message"] == "request"]
+    assert line["status"] == 403 and line["model"] == "gemini-pro" and "upstream" in line["phases_ms"]
+
+
+def test_nested_phases_of_the_same_name_count_once():
+    def handle():
+        timings = start_request()
+        with phase("upstream"):
+            with phase("upstream"):
+                pass
+            with phase("serialize"):
+                pass
+        return timings
+
+    # In a context of its own, like a request, so the test's context is left without a current request
+    timings = contextvars.copy_context().run(handle)
+    assert set(timings.phases) == {"upstream", "serialize"}
+    assert timings.phases["upstream"] >= timings.phases["serialize"]
+    assert not timings.active
+
+
+def test_asgi_reports_phases_and_logs(fake_ai_service, log_lines):
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+            return await client.post("/api/chat", json={"message": "Hi"}, headers={"X-Request-ID": "edge-5678efgh"})
+
+    response = asyncio.run(scenario())
+    assert response.headers["X-Request-ID"] == "edge-5678efgh"
+    assert {"parse", "prompt", "upstream", "serialize", "total"} <= set(server_timing(response.headers["Server-Timing"]))
+    [line] = [line for line in log_lines() if line["message"] == "request"]
+    assert line["request_id"] == "edge-5678efgh" and line["route"] == "/api/chat" and line["status"] == 200
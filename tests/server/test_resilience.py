@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+import app as server_app
+import resilience
+from resilience import Resilience
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_retryable_statuses_are_retried_until_success(fake_ai_service):
+    """
+    A transient 503 from the AI service should be retried and never reach the browser.
+    """
+    statuses = iter([503, 429, 200])
+    fake_ai_service.reply = lambda path, body: (next(statuses), {"candidates": [{"content": {"parts": [{"text": "Recovered"}]}}]})
+    client = server_app.app.test_client()
+
+    response = client.post("/api/chat", json={"message": "Hello"})
+
+    assert response.get_json() == {"reply": "Recovered"}
+    assert len(fake_ai_service.requests) == 3
+    assert resilience.get_resilience().stats()["retries"] == 2
+
+
+def test_retries_stop_at_the_budget_and_respect_the_deadline():
+    """
+    Retries are bounded, discarded responses are closed, and a Retry-After past the deadline ends the loop.
+    """
+    policy = Resilience(deadlines={"proxy": 5}, max_retries=2)
+    sent = []
+
+    def always_unavailable(remaining):
+        sent.append(FakeResponse(503))
+        return sent[-1]
+
+    response = policy.call("proxy", always_unavailable, discard=FakeResponse.close)
+    assert response.status_code == 503
+    assert len(sent) == 3
+    assert all(r.closed for r in sent[:-1])
+
+    sent.clear()
+    started = time.monotonic()
+    response = policy.call("proxy", lambda remaining: FakeResponse(429, {"Retry-After": "30"}))
+    assert response.status_code == 429
+    assert time.monotonic() - started < 0.5
+
+
+def test_transport_errors_are_retried_then_raised():
+    """
+    Connection failures count as retryable; once retries run out the original exception surfaces.
+    """
+    policy = Resilience(max_retries=1)
+    attempts = []
+
+    def refuse(remaining):
+        attempts.append(remaining)
+        raise ConnectionError("refused")
+
+    with pytest.raises(ConnectionError):
+        policy.call("chat", refuse, retry_exceptions=(ConnectionError,))
+    assert len(attempts) == 2
+    assert attempts[0] <= resilience.ROUTE_DEADLINES["chat"]
+
+
+def test_hedged_request_takes_the_faster_response():
+    """
+    Once a call outlives the route's p95, a duplicate is sent and the first response to arrive wins.
+    """
+    policy = Resilience(hedge_enabled=True, hedge_min_samples=5, hedge_min_delay=0.05, hedge_max_ratio=1.0)
+    for _ in range(5):
+        policy.record_latency("proxy", 0.05)
+    release_primary = threading.Event()
+    calls = []
+
+    def send(remaining):
+        calls.append(remaining)
+        if len(calls) == 1:
+            release_primary.wait(2)
+            return FakeResponse(200, {"attempt": "primary"})
+        return FakeResponse(200, {"attempt": "hedge"})
+
+    response = policy.call("proxy", send, hedge=True)
+    release_primary.set()
+
+    assert response.headers["attempt"] == "hedge"
+    assert policy.stats()["hedges"] == 1
+    assert policy.stats()["hedge_wins"] == 1
+
+
+def test_a_failed_hedge_attempt_does_not_win_while_the_other_is_pending():
+    """
+    A 5xx from one attempt is discarded when the other attempt, still in flight, then succeeds.
+    """
+    policy = Resilience(max_retries=0, hedge_enabled=True, hedge_min_samples=5, hedge_min_delay=0.05,
+                        hedge_max_ratio=1.0)
+    for _ in range(5):
+        policy.record_latency("proxy", 0.05)
+    failed = FakeResponse(503, {"attempt": "hedge"})
+    calls = []
+
+    def send(remaining):
+        calls.append(remaining)
+        if len(calls) == 1:
+            time.sleep(0.2)
+            return FakeResponse(200, {"attempt": "primary"})
+        return failed
+
+    response = policy.call("proxy", send, discard=lambda r: r.close(), hedge=True)
+
+    assert response.status_code == 200
+    assert response.headers["attempt"] == "primary"
+    assert failed.closed
+    assert policy.stats()["hedge_wins"] == 0
@@ -0,0 +1,73 @@
+import json
+
+import app as server_app
+import retrieval
+from retrieval import LoreIndex, select_assets
+
+
+def persona(name, faction, description):
+    return {"type": "json", "fileName": f"{name.lower()}.persona", "importance": "Typical",
+            "content": json.dumps({"assetType": "PERSONA", "traits": {"persona-name": name, "genre-faction": faction,
+                                                                      "profile-background": description}})}
+
+
+LIBRARY = [
+    persona("Mara Voss", "Iron Covenant", "A smuggler raised in the flooded docks."),
+    persona("Oren Hale", "Glass Choir", "An archivist who hears the Iron Covenant in his dreams."),
+    persona("Tessel", "Glass Choir", "A choir automaton tending the cathedral organs."),
+    {"type": "text", "fileName": "weather.txt", "importance": "Low", "content": "It rains on the docks every night."},
+]
+
+
+def test_search_ranks_key_fields_and_respects_candidates():
+    index = LoreIndex()
+    for position, asset in enumerate(LIBRARY):
+        index.add(str(position), asset["type"], asset["content"])
+
+    ranked = [ref for ref, _ in index.search("The Iron Covenant moves against the docks", k=4)]
+
+    # The Covenant's own member outranks a persona that only mentions it in a description
+    assert ranked.index("0") < ranked.index("1")
+    assert "2" not in ranked
+    assert [ref for ref, _ in index.search("Iron Covenant", candidates={"1", "2"})] == ["1"]
+
+
+def test_index_updates_incrementally():
+    index = LoreIndex(max_documents=2)
+    index.add("a", "text", "Glass Choir hymns")
+    index.add("b", "text", "Iron Covenant ledgers")
+    index.add("a", "text", "ignored: already indexed")
+    index.add("c", "text", "Glass Choir organs")
+
+    # "b" was least recently used and made room for "c"
+    assert sorted(ref for ref, _ in index.search("choir covenant")) == ["a", "c"]
+    index.remove("a")
+    assert index.stats()["documents"] == 1 and [ref for ref, _ in index.search("hymns")] == []
+
+
+def test_selection_keeps_matches_and_pinned_assets():
+    pinned = dict(LIBRARY[2], importance="High")
+
+    selected = select_assets(LIBRARY[:2] + [pinned, LIBRARY[3]], "Mara Voss of the Iron Covenant", 1, index=LoreIndex())
+
+    assert selected == {0, 2}
+
+
+def test_gateway_sends_only_relevant_assets(fake_ai_service):
+    client = server_app.app.test_client()
+    uploaded = client.post("/api/assets", json={"assets": [{"type": a["type"], "content": a["content"]} for a in LIBRARY]})
+    references = [{**asset, "ref": ref["ref"]} for asset, ref in zip(LIBRARY, uploaded.get_json()["assets"])]
+    for reference in references:
+        del reference["content"]
+    assert retrieval.get_lore_index().stats()["documents"] == 4
+
+    inputs = {"elementType": "FACTION", "fields": {"faction-name": "Glass Choir"}, "assets": references, "retrieve": 2}
+    response = client.post("/api/generate", json={"task": "element", "inputs": inputs})
+
+    assert response.status_code == 200
+    assert json.loads(response.headers["X-AIME-Context"])["unmatched"] == [0, 3]
+    prompt = fake_ai_service.requests[-1]["body"]["contents"][0]["parts"][0]["text"]
+    assert "Tessel" in prompt and "Oren Hale" in prompt
+    assert "Mara Voss" not in prompt and "rains" not in prompt
+    bad = client.post("/api/generate", json={"task": "element", "inputs": dict(inputs, retrieve="all")})
+    assert bad.status_code == 400
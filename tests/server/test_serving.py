@@ -0,0 +1,59 @@
+import os
+import runpy
+from types import SimpleNamespace
+
+import pytest
+
+import app as server_app
+import asgi
+import resilience
+
+SERVER_DIR = os.path.dirname(server_app.__file__)
+
+
+def test_factories_return_the_configured_apps():
+    import wsgi
+
+    assert wsgi.app is server_app.app
+    assert server_app.create_app({"AIME_TEST_FLAG": 1}).config["AIME_TEST_FLAG"] == 1
+    assert asgi.create_app() is asgi.app
+    assert server_app.create_app().test_client().get("/api/stats").status_code == 200
+
+
+def test_gunicorn_config_drains_the_longest_generation(monkeypatch):
+    default = runpy.run_path(os.path.join(SERVER_DIR, "gunicorn.conf.py"))
+    # One worker holds the sessions and rate limits, so it is never recycled unless asked for
+    assert default["workers"] == 1 and default["max_requests"] == 0
+    monkeypatch.setenv("AIME_MAX_REQUESTS", "2000")
+    monkeypatch.setenv("AIME_WORKERS", "3")
+    config = runpy.run_path(os.path.join(SERVER_DIR, "gunicorn.conf.py"))
+
+    assert config["wsgi_app"] == "wsgi:app" and config["chdir"] == SERVER_DIR
+    assert config["workers"] == 3 and config["worker_class"] == "gthread"
+    assert config["preload_app"] is True
+    assert config["max_requests"] > 0 and 0 < config["max_requests_jitter"] < config["max_requests"]
+    assert config["graceful_timeout"] > max(resilience.ROUTE_DEADLINES.values())
+    assert config["timeout"] > config["graceful_timeout"]
+
+
+def test_hypercorn_config_drains_the_longest_generation():
+    hypercorn_config = pytest.importorskip("hypercorn.config")
+
+    config = hypercorn_config.Config.from_toml(os.path.join(SERVER_DIR, "hypercorn.toml"))
+
+    # Sessions and rate limits are per process, so one worker serves everything
+    assert config.workers == 1 and not config.max_requests
+    assert config.graceful_timeout > max(resilience.ROUTE_DEADLINES.values())
+
+
+def test_gunicorn_hooks_keep_counts_of_exited_workers(tmp_path, monkeypatch):
+    tmp_path = tmp_path / "metrics"
+    tmp_path.mkdir()
+    monkeypatch.setenv("AIME_METRICS_DIR", str(tmp_path))
+    config = runpy.run_path(os.path.join(SERVER_DIR, "gunicorn.conf.py"))
+    (tmp_path / "4242.json").write_text('{"values": [["aime_tokens_total", ["gemini-pro", "prompt"], 7]]}')
+
+    config["child_exit"](None, SimpleNamespace(pid=4242))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["dead.json"]
+    config["on_starting"](None)
+    assert list(tmp_path.iterdir()) == []
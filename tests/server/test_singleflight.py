@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+import app as server_app
+import singleflight
+from singleflight import SingleFlight
+
+
+@pytest.fixture
+def flight_group(monkeypatch):
+    group = SingleFlight()
+    monkeypatch.setattr(singleflight, "_group", group)
+    return group
+
+
+def test_concurrent_identical_requests_share_one_upstream_call(fake_ai_service, flight_group):
+    """
+    A double-clicked Generate should reach the AI service once, with both clicks getting the reply.
+    """
+    def slow_reply(path, body):
+        time.sleep(0.3)
+        return 200, {"candidates": [{"content": {"parts": [{"text": "Shared"}]}}]}
+    fake_ai_service.reply = slow_reply
+    payload = {"model": "gemini-pro", "contents": [{"parts": [{"text": "Same prompt"}]}]}
+    results = []
+
+    def click():
+        response = server_app.app.test_client().post("/api/proxy", json=dict(payload))
+        results.append(response.get_json())
+
+    threads = [threading.Thread(target=click) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert len(fake_ai_service.requests) == 1
+    assert all(result["candidates"][0]["content"]["parts"][0]["text"] == "Shared" for result in results)
+    assert flight_group.stats() == {"executed": 1, "coalesced": 2, "in_flight": 0}
+
+
+def test_different_api_keys_do_not_share_calls():
+    """
+    Identical payloads sent with different keys must each make their own call.
+    """
+    group = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_call():
+        started.set()
+        release.wait()
+        return "leader"
+
+    thread = threading.Thread(target=group.do, args=(singleflight.flight_key("k", "key-a"), leader_call))
+    thread.start()
+    started.wait()
+    result, shared = group.do(singleflight.flight_key("k", "key-b"), lambda: "other")
+    release.set()
+    thread.join()
+
+    assert (result, shared) == ("other", False)
+
+
+def test_followers_receive_the_leaders_error():
+    """
+    When the shared call fails, every waiting caller sees the same exception.
+    """
+    group = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def failing_call():
+        release.wait()
+        raise RuntimeError("upstream down")
+
+    def caller():
+        try:
+            group.do("k", failing_call)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=caller) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ["upstream down", "upstream down"]
@@ -0,0 +1,130 @@
+import asyncio
+import gzip
+import os
+import re
+
+import pytest
+
+import app as server_app
+import asgi
+import static_assets
+from static_assets import StaticSite
+
+
+@pytest.fixture
+def site_root(tmp_path):
+    (tmp_path / "pages").mkdir()
+    (tmp_path / "script").mkdir()
+    (tmp_path / "server").mkdir()
+    (tmp_path / "index.html").write_text('<link href="style/app.css"><a href="pages/writer.html">Writer</a>' + "<p>lore</p>" * 200)
+    (tmp_path / "pages" / "writer.html").write_text(
+        '<script src="../script/app.js"></script><a href="https://example.com/script/app.js">x</a>' + "<p>lore</p>" * 200)
+    (tmp_path / "script" / "app.js").write_text("console.log('aime');\n" * 200)
+    (tmp_path / "style").mkdir()
+    (tmp_path / "style" / "logo.svg").write_text("<svg></svg>")
+    (tmp_path / "style" / "app.css").write_text(
+        "body { background: url('logo.svg') } .x { background: url(data:image/png;base64,AA==) }\n" * 40)
+    (tmp_path / "server" / "app.py").write_text("SECRET = 1")
+    (tmp_path / ".env").write_text("GEMINI_API_KEY=secret")
+    return tmp_path
+
+
+def test_pages_load_fingerprinted_assets(site_root):
+    site = StaticSite(str(site_root))
+    hashed = site.manifest["script/app.js"]
+    assert re.fullmatch(r"script/app\.[0-9a-f]{12}\.js", hashed)
+
+    page = site.respond("pages/writer.html")[2].decode()
+    assert f'src="../script/{os.path.basename(hashed)}"' in page
+    # Only references to files of the site are rewritten
+    assert 'href="https://example.com/script/app.js"' in page
+    assert site.respond("")[2].startswith(f'<link href="style/{os.path.basename(site.manifest["style/app.css"])}">'.encode())
+
+
+def test_stylesheets_load_fingerprinted_assets(site_root):
+    site = StaticSite(str(site_root))
+    css = site.respond(site.manifest["style/app.css"])[2].decode()
+    assert f"url('{os.path.basename(site.manifest['style/logo.svg'])}')" in css
+    assert "url(data:image/png;base64,AA==)" in css
+
+    # The stylesheet's own fingerprint follows what it references
+    before = site.manifest["style/app.css"]
+    (site_root / "style" / "logo.svg").write_text("<svg><g/></svg>")
+    site.build()
+    assert site.manifest["style/app.css"] != before
+
+
+def test_fingerprinted_urls_are_immutable_and_pages_revalidate(site_root):
+    site = StaticSite(str(site_root))
+    status, headers, body = site.respond(site.manifest["script/app.js"])
+    assert status == 200 and body == (site_root / "script" / "app.js").read_bytes()
+    assert headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert headers["Content-Type"].startswith("text/javascript")
+
+    status, headers, _ = site.respond("pages/writer.html")
+    assert headers["Cache-Control"] == "no-cache"
+    assert site.respond("pages/writer.html", if_none_match=headers["ETag"])[0] == 304
+    assert site.respond("pages/writer.html", if_none_match='W/"stale"')[0] == 200
+    assert site.stats()["notModified"] == 1
+
+
+def test_precompressed_variants_have_their_own_etags(site_root):
+    site = StaticSite(str(site_root))
+    _, plain, body = site.respond("script/app.js")
+    status, headers, compressed = site.respond("script/app.js", accept_encoding="gzip, deflate")
+    assert status == 200 and headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed) == body
+    assert headers["ETag"] != plain["ETag"] and headers["Vary"] == "Accept-Encoding"
+    # A cached identity copy does not validate the gzip variant
+    assert site.respond("script/app.js", accept_encoding="gzip", if_none_match=plain["ETag"])[0] == 200
+    # Codings refused with q=0 are not sent
+    assert "Content-Encoding" not in site.respond("script/app.js", accept_encoding="gzip;q=0, br;q=0")[1]
+
+
+def test_only_asset_directories_are_served(site_root):
+    site = StaticSite(str(site_root))
+    for path in ("server/app.py", ".env", "../etc/passwd", "script/missing.js"):
+        assert site.respond(path) is None
+
+
+def test_watch_mode_rebuilds_changed_sources(site_root):
+    site = StaticSite(str(site_root), watch=True)
+    before = site.manifest["script/app.js"]
+    script = site_root / "script" / "app.js"
+    script.write_text("console.log('edited');")
+    os.utime(script, (1, 1))
+
+    # The page that loads the script is rebuilt with its new fingerprint
+    page = site.respond("pages/writer.html")[2]
+    assert site.manifest["script/app.js"] != before
+    assert os.path.basename(site.manifest["script/app.js"]).encode() in page
+    assert site.respond(site.manifest["script/app.js"])[2] == b"console.log('edited');"
+
+
+def test_apps_serve_the_site_and_not_the_repository(site_root, monkeypatch):
+    monkeypatch.setattr(static_assets, "_site", StaticSite(str(site_root)))
+    client = server_app.app.test_client()
+
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200 and response.headers["Content-Encoding"] == "gzip"
+    assert client.get("/pages/writer.html", headers={"If-None-Match": response.headers["ETag"]}).status_code == 200
+    assert client.get("/server/app.py").status_code == 404
+    assert client.get("/.env").status_code == 404
+    assert client.get("/api/stats").get_json()["static"]["files"] == 5
+
+
+def test_asgi_serves_the_site(site_root, monkeypatch):
+    site = StaticSite(str(site_root))
+    monkeypatch.setattr(static_assets, "_site", site)
+    etag = site.respond("pages/writer.html")[1]["ETag"]
+
+    async def scenario():
+        async with asgi.app.test_app() as test_app:
+            client = test_app.test_client()
+            response = await client.get("/" + site.manifest["script/app.js"])
+            assert response.status_code == 200
+            assert "immutable" in response.headers["Cache-Control"]
+            assert (await client.get("/pages/writer.html", headers={"If-None-Match": etag})).status_code == 304
+            assert (await client.get("/server/app.py")).status_code == 404
+
+    asyncio.run(scenario())
@@ -0,0 +1,56 @@
+import json
+
+import app as server_app
+
+
+def text_chunk(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+
+def test_proxy_stream_passes_upstream_events_through(fake_ai_service):
+    """
+    {"stream": true} should call streamGenerateContent with alt=sse and relay the events unchanged.
+    """
+    fake_ai_service.reply = lambda path, body: (200, [text_chunk("Once"), text_chunk(" upon")])
+    client = server_app.app.test_client()
+
+    response = client.post("/api/proxy", json={"model": "gemini-pro", "stream": True, "contents": []})
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    upstream = fake_ai_service.requests[-1]
+    assert upstream["path"].startswith("/v1beta/models/gemini-pro:streamGenerateContent")
+    assert "alt=sse" in upstream["path"]
+    assert "stream" not in upstream["body"]
+    events = [json.loads(line[5:]) for line in response.get_data(as_text=True).splitlines() if line.startswith("data:")]
+    assert events == [text_chunk("Once"), text_chunk(" upon")]
+
+
+def test_chat_stream_emits_reply_deltas(fake_ai_service):
+    """
+    A streaming chat should emit each new piece of text as {"reply": ...} and finish with a done event.
+    """
+    fake_ai_service.reply = lambda path, body: (200, [text_chunk("Try "), text_chunk("a twist.")])
+    client = server_app.app.test_client()
+
+    response = client.post("/api/chat", json={"message": "Ideas?", "context": "Draft", "stream": True})
+
+    body = response.get_data(as_text=True)
+    assert body == (
+        'data: {"reply": "Try "}\n\n'
+        'data: {"reply": "a twist."}\n\n'
+        'event: done\ndata: {}\n\n'
+    )
+
+
+def test_stream_errors_before_first_chunk_use_json(fake_ai_service):
+    """
+    An upstream failure before streaming starts keeps the regular JSON error contract.
+    """
+    fake_ai_service.reply = lambda path, body: (503, {"error": {"message": "Overloaded"}})
+    client = server_app.app.test_client()
+
+    response = client.post("/api/proxy", json={"stream": True, "contents": []})
+
+    assert response.status_code == 503
+    assert response.get_json() == {"error": "Overloaded"}
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+import app as server_app
+import upstream
+from upstream import PoolExhausted, UpstreamClient
+
+
+def test_connections_are_reused(fake_ai_service):
+    """
+    Sequential requests through one client should ride a single kept-alive connection.
+    """
+    client = UpstreamClient(pool_size=2)
+    for i in range(5):
+        client.post(fake_ai_service.url, json={"n": i})
+    assert len({r["port"] for r in fake_ai_service.requests}) == 1
+
+    host_stats = client.stats()["hosts"][fake_ai_service.url.split("//")[1]]
+    assert host_stats["requests"] == 5
+    assert host_stats["opened"] == 1
+    assert host_stats["idle"] == 1
+    assert host_stats["in_use"] == 0
+    assert host_stats["waiting"] == 0
+    client.close()
+
+
+def test_a_full_pool_answers_503_instead_of_hanging(fake_ai_service, monkeypatch):
+    """
+    A request that finds every pooled connection busy waits at most the pool timeout, is not retried,
+    and reaches the browser as a 503.
+    """
+    client = UpstreamClient(pool_size=1, pool_timeout=0.1)
+    monkeypatch.setattr(upstream, "_client", client)
+    held = client.post(fake_ai_service.url, json={}, stream=True)
+
+    started = time.monotonic()
+    with pytest.raises(PoolExhausted):
+        client.post(fake_ai_service.url, json={})
+    assert time.monotonic() - started < 1
+
+    response = server_app.app.test_client().post("/api/proxy", json={"contents": []})
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    assert "No upstream connection" in response.get_json()["error"]
+    assert len(fake_ai_service.requests) == 1
+    assert client.stats()["hosts"][fake_ai_service.url.split("//")[1]]["exhausted"] == 2
+
+    held.close()
+    assert client.post(fake_ai_service.url, json={}).status_code == 200
+    client.close()
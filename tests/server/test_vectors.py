@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import vectors  # noqa: E402
+from retrieval import LoreIndex, select_assets  # noqa: E402
+from vectors import HashingEmbedder, VectorIndex, chunk_asset  # noqa: E402
+
+
+def persona(name, role):
+    return json.dumps({"assetType": "PERSONA", "timestamp": "2025-09-30T10:00:00.000Z",
+                       "traits": {"persona-name": name, "persona-role": role, "persona-notes": ""}})
+
+
+def test_elements_are_chunked_per_field_with_their_name():
+    assert chunk_asset("json", persona("Mara Voss", "insurgent commander")) == [
+        "Mara Voss - persona name: Mara Voss", "Mara Voss - persona role: insurgent commander"]
+    assert chunk_asset("text", "First.\n\nSecond.") == ["First.\n\nSecond."]
+
+
+def test_index_persists_and_grows(tmp_path, monkeypatch):
+    monkeypatch.setattr(vectors, "INITIAL_CAPACITY", 4)
+    index = VectorIndex(str(tmp_path), HashingEmbedder(64))
+    for number in range(5):
+        index.add(f"ref-{number}", "json", persona(f"Agent {number}", f"courier of sector {number}"))
+
+    reopened = VectorIndex(str(tmp_path), HashingEmbedder(64))
+
+    assert reopened.stats()["chunks"] == 10 and "ref-4" in reopened
+    assert reopened.search("Agent 4 courier", k=1)[0][0] == "ref-4"
+    assert reopened.search("Agent 4 courier", candidates={"ref-1"}, k=1)[0][0] == "ref-1"
+    # A different embedder cannot reuse the stored vectors
+    assert VectorIndex(str(tmp_path), HashingEmbedder(32)).stats()["chunks"] == 0
+
+
+def test_least_recently_used_assets_are_dropped_past_the_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(vectors, "INITIAL_CAPACITY", 4)
+    index = VectorIndex(str(tmp_path), HashingEmbedder(64), max_chunks=10)
+    for number in range(5):
+        index.add(f"ref-{number}", "json", persona(f"Agent {number}", f"courier of sector {number}"))
+    index.search("courier", candidates={"ref-0"})
+
+    index.add("ref-5", "json", persona("Agent 5", "courier of sector 5"))
+
+    # Two chunks per asset: the least recently used go until ref-5 fits in 90% of the cap (ref-0 was searched)
+    assert [ref for ref in ("ref-0", "ref-1", "ref-2", "ref-3", "ref-4", "ref-5") if ref in index] == ["ref-0", "ref-3", "ref-4", "ref-5"]
+    assert (tmp_path / "vectors.f32").stat().st_size == 8 * 64 * 4
+    reopened = VectorIndex(str(tmp_path), HashingEmbedder(64), max_chunks=10)
+    assert reopened.stats()["chunks"] == 8
+    assert reopened.search("Agent 0 courier", k=1)[0][0] == "ref-0"
+    assert reopened.search("Agent 5 courier", k=1)[0][0] == "ref-5"
+
+
+def test_processes_sharing_the_directory_append_after_each_other(tmp_path):
+    embedder = HashingEmbedder(64)
+    first = VectorIndex(str(tmp_path), embedder, max_chunks=8)
+    second = VectorIndex(str(tmp_path), embedder, max_chunks=8)
+    lore = {f"ref-{name.split()[0]}": persona(name, role) for name, role in (
+        ("Mara Voss", "insurgent commander"), ("Oren Hale", "cathedral archivist"), ("Ilsa Marr", "smuggler queen"),
+        ("Tamsin Rook", "courier"), ("Bram Ostler", "engineer"), ("Cael Dunmore", "envoy"))}
+
+    first.add("ref-Mara", "json", lore["ref-Mara"])
+    second.add("ref-Oren", "json", lore["ref-Oren"])
+    first.add("ref-Oren", "json", lore["ref-Oren"])
+    for ref in ("ref-Tamsin", "ref-Bram", "ref-Cael"):
+        # The third goes past the cap: the compaction rewrites the files under the other index
+        second.add(ref, "json", lore[ref])
+    first.add("ref-Ilsa", "json", lore["ref-Ilsa"])
+
+    reopened = VectorIndex(str(tmp_path), embedder, max_chunks=8)
+    assert reopened.stats()["chunks"] == 8
+    assert "ref-Mara" not in reopened and "ref-Oren" not in reopened
+    for ref in ("ref-Tamsin", "ref-Bram", "ref-Cael", "ref-Ilsa"):
+        stored = reopened._matrix[reopened._rows[ref]]
+        assert np.allclose(stored, embedder.embed(chunk_asset("json", lore[ref])))
+
+
+def test_semantic_matches_word_forms_the_keyword_index_misses(tmp_path):
+    assets = [
+        {"type": "json", "fileName": "mara.persona", "content": persona("Mara Voss", "insurgent commander")},
+        {"type": "json", "fileName": "oren.persona", "content": persona("Oren Hale", "cathedral archivist")},
+    ]
+    query = "The insurgency's leader plans the raid"
+
+    assert select_assets(assets, query, 1, index=LoreIndex(), vectors=VectorIndex(str(tmp_path), HashingEmbedder())) == {0}
+    assert LoreIndex().search(query) == []
@@ -165,14 +165,14 @@ def test_full_ai_workflow_e2e(page: Page):
     }
 
     # --- Setup Routes ---
-    page.route("https://generativelanguage.googleapis.com/**", lambda route: route.fulfill(status=200, json=mock_brainstorm_response))
+    page.route("**/api/generate", lambda route: route.fulfill(status=200, json=mock_brainstorm_response))
 
     # --- 1. Brainstorm ---
     page.locator(".accordion-header", has_text="Generation Controls").click()
     page.wait_for_timeout(500)
     page.locator("#main-prompt").fill("A lost city of crystals")
 
-    with page.expect_response("https://generativelanguage.googleapis.com/**"):
+    with page.expect_response("**/api/generate"):
         page.locator("#generate-button").click()
 
     # Verify brainstorm cards are rendered
@@ -183,11 +183,11 @@ def test_full_ai_workflow_e2e(page: Page):
 
     # --- 2. Outline ---
     # Update route for the next API call
-    page.unroute("https://generativelanguage.googleapis.com/**")
-    page.route("https://generativelanguage.googleapis.com/**", lambda route: route.fulfill(status=200, json=mock_outline_response))
+    page.unroute("**/api/generate")
+    page.route("**/api/generate", lambda route: route.fulfill(status=200, json=mock_outline_response))
 
     # Click "Develop Outline" on the first card
-    with page.expect_response("https://generativelanguage.googleapis.com/**"):
+    with page.expect_response("**/api/generate"):
         page.locator(".brainstorm-card", has_text="The Crystal City").locator(".develop-outline-btn").click()
 
     # Verify tab switch and outline rendering
@@ -199,11 +199,11 @@ def test_full_ai_workflow_e2e(page: Page):
 
     # --- 3. Draft ---
     # Update route for the final API call
-    page.unroute("https://generativelanguage.googleapis.com/**")
-    page.route("https://generativelanguage.googleapis.com/**", lambda route: route.fulfill(status=200, json=mock_draft_response))
+    page.unroute("**/api/generate")
+    page.route("**/api/generate", lambda route: route.fulfill(status=200, json=mock_draft_response))
 
     # Click "Create Treatment"
-    with page.expect_response("https://generativelanguage.googleapis.com/**"):
+    with page.expect_response("**/api/generate"):
         page.locator("#create-treatment-from-outline-btn").click()
 
     # Verify tab switch and draft content
@@ -152,12 +152,14 @@ def run_test(playwright):
     def handle_route(route):
         request = route.request
         try:
+            # Element pages send their form state to the server's /api/generate gateway, which builds the prompt
             payload = request.post_data_json
-            prompt_text = payload.get("contents", [{}])[0].get("parts", [{}])[0].get("text", "")
+            inputs = payload.get("inputs", {})
+            prompt_text = json.dumps(inputs, indent=2, ensure_ascii=False)
 
             element_type = "UNKNOWN"
             for key, value in ELEMENT_INVENTORY.items():
-                if f'"{value["type"]}"' in prompt_text:
+                if inputs.get("elementType") == value["type"]:
                     element_type = value["type"]
                     break
 
@@ -177,7 +179,7 @@ def run_test(playwright):
             print(f"Error handling route: {e}")
             route.abort()
 
-    page.route("**/models/*:generateContent*", handle_route)
+    page.route("**/api/generate", handle_route)
 
     # Set up the dialog handler once, outside the loop.
     page.on("dialog", lambda dialog: dialog.accept())
@@ -264,7 +266,7 @@ def run_test(playwright):
 
             # 4. Generate and trigger interception
             print("Generating content...")
-            with page.expect_response("**/models/*:generateContent*") as response_info:
+            with page.expect_response("**/api/generate") as response_info:
                 page.locator("#generate-button").click(force=True)
 
             response = response_info.value
@@ -129,10 +129,9 @@ def test_persona_usability(playwright):
 
     # --- 7. Test Generation ---
     # Mock the API response to avoid a real API call and ensure a consistent test.
-    # The application calls the Google Generative AI API directly. We use a glob
-    # pattern to catch the correct URL regardless of the exact model or API key.
+    # The page generates through the AIME server's /api/generate gateway, which is intercepted here.
     page.route(
-        "**/models/*:generateContent*",
+        "**/api/generate",
         lambda route: route.fulfill(
             status=200,
             headers={"Content-Type": "application/json"},
@@ -100,9 +100,8 @@ def run_test(playwright):
             })
         )
 
-    # Intercept network requests to the Google AI API
-    # The URL must match the one constructed in writer-bundle.js
-    page.route("**/models/*:generateContent*", handle_api_request)
+    # Intercept the generation requests writer-bundle.js sends to the AIME server's gateway
+    page.route("**/api/generate", handle_api_request)
 
     # Fill the main prompt and click the generate button
     page.locator("#main-prompt").fill(WRITER_PROMPT)